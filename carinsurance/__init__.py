@@ -1,33 +1,123 @@
 import os
+import queue
 import logging
-from logging.handlers import RotatingFileHandler
+import threading
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 
 from carinsurance.config import CONFIG
 
 LOGS_DIR = os.path.join(CONFIG['project'], CONFIG['logs'])
 LOGS_PATH = os.path.join(LOGS_DIR, 'logs.log')
+LOGGING_CONFIG = CONFIG.get('logging', dict())
 
-logger = logging.getLogger()
-logger.setLevel(logging.INFO)
-
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-
-stream_handler = logging.StreamHandler()
-stream_handler.setFormatter(formatter)
-stream_handler.setLevel(logging.INFO)
-logger.addHandler(stream_handler)
-
-try:
-    if not os.path.exists(LOGS_DIR):
-        os.makedirs(LOGS_DIR, exist_ok=True)
-
-    file_handler = RotatingFileHandler(os.path.join(LOGS_DIR, 'logs.log'))
-    file_handler.setLevel(logging.DEBUG)
-    file_handler.setFormatter(formatter)
-    logger.addHandler(file_handler)
-except (OSError, IOError, PermissionError): # Don't create logs if no rights are given for writing
-    logger.info('Logs won\'t be saved on files due to permission errors')
-except Exception as e:
-    logger.error('Unexpected exception for logging rotating file handler')
-    logger.error(str(e))
-    raise e
+_logger = None
+
+
+class _QueueHandler(QueueHandler):
+    '''Handler putting records in a bounded queue emptied by a listener thread
+
+    Formatting and I/O happen in the listener, so logging never blocks the calling
+    thread: when the queue is full, records are dropped and counted instead. The
+    listener is started on first record of each process, since threads do not
+    survive the fork of gunicorn workers, and forks wait for the record being
+    written so that children never inherit a half-held file.
+    '''
+    def __init__(self, handlers, queue_size=10000):
+        super().__init__(queue.Queue(queue_size))
+        self.handlers = handlers
+        self.queue_size = queue_size
+        self.dropped = 0
+        self._pid = None
+        self._listener = None
+        self._start_lock = threading.Lock()
+        os.register_at_fork(before=self._acquire_handlers, after_in_parent=self._release_handlers)
+
+    def _acquire_handlers(self):
+        for handler in self.handlers:
+            handler.acquire()
+
+    def _release_handlers(self):
+        for handler in self.handlers: # children get new handler locks from logging itself
+            handler.release()
+
+    def _start(self):
+        with self._start_lock:
+            if self._pid != os.getpid():
+                self.queue = queue.Queue(self.queue_size) # records queued by the parent are not ours
+                self._listener = QueueListener(self.queue, *self.handlers, respect_handler_level=True)
+                self._listener.start()
+                self._pid = os.getpid()
+
+    def prepare(self, record):
+        return record # the listener shares memory, it formats messages and tracebacks itself
+
+    def enqueue(self, record):
+        if self._pid != os.getpid():
+            self._start()
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+    def close(self):
+        if (self._listener is not None) and (self._pid == os.getpid()):
+            self._listener.stop() # writes records still queued
+            self._listener = None
+        super().close()
+
+
+def get_logger():
+    '''Get the root logger, configured with stream and rotating file handlers on first call
+    Logging is not configured at import so that importing carinsurance stays cheap.
+    Handlers are fed by a queue (see _QueueHandler), and the file is rotated after
+    max_bytes keeping backup_count files (logging section of the configuration)
+
+    Returns
+    -------
+    logging.Logger
+        configured root logger
+
+    '''
+    global _logger
+    if _logger is not None:
+        return _logger
+
+    logger = logging.getLogger()
+    logger.setLevel(logging.INFO)
+
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(formatter)
+    stream_handler.setLevel(logging.INFO)
+    handlers, saved = [stream_handler], True
+
+    try:
+        if not os.path.exists(LOGS_DIR):
+            os.makedirs(LOGS_DIR, exist_ok=True)
+
+        file_handler = RotatingFileHandler(LOGS_PATH, maxBytes=LOGGING_CONFIG.get('max_bytes', 10 * 1024 * 1024),
+                                           backupCount=LOGGING_CONFIG.get('backup_count', 5))
+        file_handler.setLevel(logging.DEBUG)
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+    except (OSError, IOError, PermissionError): # Don't create logs if no rights are given for writing
+        saved = False
+    except Exception as e:
+        logger.addHandler(stream_handler)
+        logger.error('Unexpected exception for logging rotating file handler')
+        logger.error(str(e))
+        raise e
+
+    logger.addHandler(_QueueHandler(handlers, queue_size=LOGGING_CONFIG.get('queue_size', 10000)))
+    if not saved:
+        logger.info('Logs won\'t be saved on files due to permission errors')
+
+    _logger = logger
+    return _logger
+
+
+def __getattr__(name):
+    if name == 'logger': # from carinsurance import logger configures logging when needed
+        return get_logger()
+    raise AttributeError(f'module {__name__} has no attribute {name}')
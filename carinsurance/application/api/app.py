@@ -1,17 +1,139 @@
 import os
-import pickle
+import time
 
+from carinsurance import get_logger
 from carinsurance.config import CONFIG
-from carinsurance.interface.application import get_app_from
+from carinsurance.domain.modelling.trees import TreeEnsemble
+from carinsurance.domain.preprocessing.compiled import CompiledPipeline
+from carinsurance.helpers.metrics import Metrics
+from carinsurance.infrastructure.artifacts import load_object, get_fingerprint, get_artifact_path
+from carinsurance.interface.application import get_app_from, get_predictions
+from carinsurance.interface.cache import PredictionCache
+from carinsurance.interface.registry import ModelRegistry, ModelVersion
+from carinsurance.interface.bundle import load_bundle
+from carinsurance.interface.access import AccessLogger
+from carinsurance.interface.schema import decode
+from carinsurance.domain.preprocessing.pipeline import get_schema
 
 
-MODEL_PATH = os.path.join(CONFIG['project'], CONFIG['models'], 'model.pkl')
-PIPELINE_PATH = os.path.join(CONFIG['project'], CONFIG['models'], 'pipeline.pkl')
+MODELS_PATH = os.path.join(CONFIG['project'], CONFIG['models'])
+MODEL_PATH = get_artifact_path(MODELS_PATH, 'model')
+PIPELINE_PATH = get_artifact_path(MODELS_PATH, 'pipeline')
 
-with open(MODEL_PATH, 'rb') as f:
-    MODEL = pickle.load(f)
+WARM_UP_EXAMPLE = {
+    'Id': [0], 'Age': [40], 'Job': ['management'], 'Marital': ['married'], 'Education': ['tertiary'],
+    'Default': [0], 'Balance': [1000], 'HHInsurance': [1], 'CarLoan': [0], 'Communication': ['cellular'],
+    'LastContactDay': [15], 'LastContactMonth': ['may'], 'NoOfContacts': [1], 'DaysPassed': [-1],
+    'PrevAttempts': [0], 'Outcome': [''], 'CallStart': ['12:00:00'], 'CallEnd': ['12:05:00'],
+}
 
-with open(PIPELINE_PATH, 'rb') as f:
-    PIPELINE = pickle.load(f)
+STARTUP = dict() # seconds spent in each startup step
 
-app = get_app_from(__name__, PIPELINE, MODEL)
+
+def _timed(step, function, *args, **kwargs):
+    start = time.perf_counter()
+    result = function(*args, **kwargs)
+    STARTUP[step] = time.perf_counter() - start
+    return result
+
+
+LOGGER = _timed('logging', get_logger)
+API_CONFIG = CONFIG.get('api', dict())
+
+
+def load_version(path):
+    '''Load the compiled pipeline and the model of a directory of artifacts
+    With bundle enabled, they come from the serving bundle of the directory, which
+    every worker memory-maps instead of holding its own copy. Pickles saved by former
+    versions (model.pkl and pipeline.pkl) are loaded when artifacts are missing
+
+    Parameters
+    ----------
+    path : str
+        directory of the artifacts
+
+    Returns
+    -------
+    CompiledPipeline, sklearn model API or TreeEnsemble
+        compiled pipeline and model
+
+    '''
+    model_path, pipeline_path = get_artifact_path(path, 'model'), get_artifact_path(path, 'pipeline')
+    if not (model_path.endswith('.artifact') and pipeline_path.endswith('.artifact')):
+        LOGGER.warning(f'Pickles of {path} saved by a former version are loaded, retrain to save artifacts')
+
+    native = API_CONFIG.get('native', False)
+    if API_CONFIG.get('bundle', False):
+        try:
+            return load_bundle(path, native=native, logger=LOGGER)
+        except OSError as e: # read-only file system without an up to date bundle
+            LOGGER.warning(f'Serving bundle of {path} could not be built, artifacts are loaded instead: {e}')
+
+    model = load_object(model_path)
+    pipeline = CompiledPipeline(load_object(pipeline_path))
+    if native:
+        try:
+            model = TreeEnsemble.from_estimator(model)
+        except ValueError as e: # not a tree-based model, served as it is
+            LOGGER.warning(f'Model of {path} is not converted to native trees: {e}')
+    return pipeline, model
+
+
+PIPELINE, MODEL = _timed('artifacts', load_version, MODELS_PATH)
+
+CACHE = None
+if API_CONFIG.get('cache') is not None:
+    version = _timed('fingerprint', get_fingerprint, MODEL_PATH, PIPELINE_PATH)
+    CACHE = PredictionCache(version=version, **API_CONFIG['cache'])
+
+METRICS = Metrics() if API_CONFIG.get('metrics', True) else None
+ACCESS = AccessLogger(**API_CONFIG['access_log']) if API_CONFIG.get('access_log') is not None else None
+
+
+def get_version_name(path):
+    return get_fingerprint(get_artifact_path(path, 'model'), get_artifact_path(path, 'pipeline'))
+
+
+def check_version(version):
+    '''Predict the warm up example with a version before it is swapped in, raising if it fails'''
+    get_predictions(decode(WARM_UP_EXAMPLE, get_schema()), version.pipeline, version.model,
+                    threshold=API_CONFIG.get('threshold', .5), logger=LOGGER)
+
+
+REGISTRY = None
+if API_CONFIG.get('registry') is not None:
+    REGISTRY = ModelRegistry(load_version, get_version_name, warm_up=check_version,
+                             interval=API_CONFIG['registry'].get('interval'), logger=LOGGER)
+    if CACHE is not None: # answers of a former version are never served by a new one
+        REGISTRY.on_swap.append(lambda version: CACHE.set_version(version.name))
+    name = CACHE.version if CACHE is not None else _timed('fingerprint', get_version_name, MODELS_PATH)
+    REGISTRY.set_current(ModelVersion(name, MODELS_PATH, PIPELINE, MODEL))
+
+    candidate = API_CONFIG['registry'].get('candidate')
+    if candidate is not None:
+        _timed('candidate', REGISTRY.set_candidate, os.path.join(CONFIG['project'], candidate['path']),
+               mode=candidate.get('mode', 'canary'), fraction=candidate.get('fraction', .1))
+
+app = _timed('app', get_app_from, __name__, PIPELINE, MODEL, threshold=API_CONFIG.get('threshold', .5),
+             logger=LOGGER, batching=API_CONFIG.get('batching'), cache=CACHE,
+             chunk_size=API_CONFIG.get('chunk_size', 1000), metrics=METRICS, registry=REGISTRY, access=ACCESS,
+             precision=API_CONFIG.get('precision'))
+
+
+def warm_up():
+    '''Run a dummy prediction through the API route before taking traffic
+    First calls pay for lazy initializations (numpy and pandas code paths, batching
+    thread, memory-mapped pages of artifacts), which should not be paid by a client
+
+    Returns
+    -------
+    dict
+        answer of the API for the dummy example
+
+    '''
+    answer = _timed('warm_up', lambda: app.test_client().post('/api/', json=WARM_UP_EXAMPLE).get_json())
+    if answer['status'] != 0:
+        LOGGER.warning(f'Warm up prediction failed: {answer["message"]}')
+    if METRICS is not None: # the warm up call is not representative of traffic
+        METRICS.clear()
+    return answer
@@ -0,0 +1,10 @@
+from carinsurance.application.api.app import PIPELINE, MODEL, CACHE, METRICS, REGISTRY, ACCESS, LOGGER, API_CONFIG, STARTUP, WARM_UP_EXAMPLE
+from carinsurance.interface.asgi import get_asgi_app_from
+
+
+app = get_asgi_app_from(PIPELINE, MODEL, threshold=API_CONFIG.get('threshold', .5), logger=LOGGER,
+                        batching=API_CONFIG.get('batching'), cache=CACHE, example=WARM_UP_EXAMPLE,
+                        chunk_size=API_CONFIG.get('chunk_size', 1000), metrics=METRICS, registry=REGISTRY,
+                        access=ACCESS, precision=API_CONFIG.get('precision'), **API_CONFIG.get('asgi', dict()))
+
+LOGGER.info('Startup times: ' + ', '.join(f'{step} {seconds:.3f}s' for step, seconds in STARTUP.items()))
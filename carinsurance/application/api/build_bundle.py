@@ -0,0 +1,15 @@
+import os
+
+from carinsurance import logger
+from carinsurance.config import CONFIG
+from carinsurance.interface.bundle import save_bundle
+
+
+def build_bundle(config, logger):
+    models_path = os.path.join(config['project'], config['models'])
+    fingerprint = save_bundle(models_path, native=config.get('api', dict()).get('native', False))
+    logger.info(f'Serving bundle of version {fingerprint} saved into {models_path}')
+
+
+if __name__ == '__main__':
+    build_bundle(CONFIG, logger)
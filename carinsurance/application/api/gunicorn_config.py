@@ -0,0 +1,22 @@
+'''Gunicorn settings of the API, used with gunicorn -c
+
+Artifacts are loaded once by the master before forking workers (preload), so workers
+share their memory-mapped pages. Objects created by the master are then frozen out of
+garbage collection, so that collections in workers never write to (and copy) their
+pages. Every worker runs a dummy prediction before taking traffic so that no client
+request pays for cold start.
+'''
+
+import gc
+
+preload_app = True
+
+
+def when_ready(server):
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    from carinsurance.application.api.app import warm_up, LOGGER, STARTUP
+    warm_up()
+    LOGGER.info(f'Worker {worker.pid} warmed up in {STARTUP["warm_up"]:.3f}s')
@@ -1,4 +1,11 @@
-from carinsurance.application.api.app import app
+import time
+
+start = time.perf_counter()
+
+from carinsurance.application.api.app import app, LOGGER, STARTUP
+
+STARTUP['imports'] = time.perf_counter() - start - sum(STARTUP.values())
+LOGGER.info('Startup times: ' + ', '.join(f'{step} {seconds:.3f}s' for step, seconds in STARTUP.items()))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,261 @@
+import os
+import glob
+import json
+import time
+import random
+import argparse
+import datetime
+import threading
+import subprocess
+import http.client
+from urllib.parse import urlsplit
+
+import numpy as np
+
+from carinsurance import logger
+from carinsurance.config import CONFIG
+
+
+CONCURRENCIES = (1, 2, 4, 8, 16, 32, 50) # 50 is max_concurrent_requests of app.yaml
+DURATION = 10. # seconds of load per concurrency level
+TIMEOUT = 30. # seconds before a request is counted as an error
+GUNICORN_CONFIG = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'api', 'gunicorn_config.py')
+
+
+def get_bodies(config):
+    '''Get the bodies of the online and batch examples created by create_test_examples
+
+    Parameters
+    ----------
+    config : dict
+        configuration with project and data paths
+
+    Returns
+    -------
+    tuple of (list of bytes, bytes)
+        bodies of every online example and body of the batch example
+
+    '''
+    examples_path = os.path.join(config['project'], config['data'], 'examples')
+    online = list()
+    for path in sorted(glob.glob(os.path.join(examples_path, 'online', 'online_*.json'))):
+        with open(path, 'rb') as f:
+            online.append(f.read())
+    with open(os.path.join(examples_path, 'batch', 'batch.json'), 'rb') as f:
+        batch = f.read()
+    if not online:
+        raise ValueError(f'No online examples found in {examples_path}, run create_test_examples first')
+    return online, batch
+
+
+def _post(connection, path, body):
+    '''Post a JSON body on a kept-alive connection, return True if the API answered without error'''
+    connection.request('POST', path, body=body, headers={'Content-Type': 'application/json'})
+    response = connection.getresponse()
+    answer = response.read()
+    return (response.status == 200) and (json.loads(answer)['status'] == 0)
+
+
+def run_load(url, online, batch, concurrency, duration=DURATION, rate=None, batch_ratio=0.,
+             timeout=TIMEOUT, random_state=None):
+    '''Send requests from concurrent clients for a given duration and summarize latencies
+
+    Each client keeps its own connection alive and the duration starts once every
+    client is ready, so that no request is sent before it. Without rate, clients send
+    their next request as soon as they get an answer (closed loop). With rate, requests are
+    scheduled at fixed intervals shared by clients (open loop) and latency is counted
+    from the scheduled time, so that requests delayed because every client was
+    waiting are not hidden from the percentiles.
+
+    Parameters
+    ----------
+    url : str
+        URL of the /api/ route
+    online : list of bytes
+        bodies of online requests, picked at random
+    batch : bytes
+        body of the batch request
+    concurrency : int
+        number of concurrent clients
+    duration : float, optional, default is DURATION
+        seconds during which requests are sent
+    rate : float or NoneType, optional, default is None
+        requests per second sent by all clients together, if None clients send back-to-back
+    batch_ratio : float, optional, default is 0.
+        probability that a request is the batch example instead of an online example
+    timeout : float, optional, default is TIMEOUT
+        seconds after which a request is counted as an error
+    random_state : int or NoneType, optional, default is None
+        seed used to pick examples
+
+    Returns
+    -------
+    dict
+        concurrency, rate, requests, errors, error_rate, throughput (answered
+        requests per second) and p50, p95, p99 and max latencies in milliseconds
+
+    '''
+    assert concurrency >= 1
+    assert 0 <= batch_ratio <= 1
+    parts = urlsplit(url)
+    latencies, errors = list(), 0
+    lock = threading.Lock()
+    scheduled = iter(range(1 << 62)) # request positions, shared by clients in open loop
+    timing = dict()
+
+    def begin():
+        timing['start'] = time.perf_counter()
+        timing['deadline'] = timing['start'] + duration
+
+    ready = threading.Barrier(concurrency, action=begin) # no request is sent before start
+
+    def client(seed):
+        nonlocal errors
+        generator = random.Random(seed)
+        connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=timeout)
+        ready.wait()
+        start, deadline = timing['start'], timing['deadline']
+        while True:
+            if rate is None:
+                sent = time.perf_counter()
+            else:
+                with lock:
+                    sent = start + next(scheduled) / rate
+                time.sleep(max(sent - time.perf_counter(), 0))
+            if sent >= deadline:
+                break
+
+            body = batch if generator.random() < batch_ratio else generator.choice(online)
+            try:
+                ok = _post(connection, parts.path or '/', body)
+            except (OSError, http.client.HTTPException, ValueError):
+                ok = False
+                connection.close() # reconnects on next request
+            latency = time.perf_counter() - sent
+            with lock:
+                latencies.append(latency)
+                errors += int(not ok)
+        connection.close()
+
+    seed = random.Random(random_state).random()
+    clients = [threading.Thread(target=client, args=(seed + position,)) for position in range(concurrency)]
+    for thread in clients:
+        thread.start()
+    for thread in clients:
+        thread.join()
+    elapsed = time.perf_counter() - timing['start']
+
+    percentiles = np.percentile(latencies, [50, 95, 99]) * 1e3 if latencies else [None] * 3
+    return {
+        'concurrency': concurrency,
+        'rate': rate,
+        'requests': len(latencies),
+        'errors': errors,
+        'error_rate': errors / len(latencies) if latencies else None,
+        'throughput': (len(latencies) - errors) / elapsed,
+        'p50': percentiles[0],
+        'p95': percentiles[1],
+        'p99': percentiles[2],
+        'max': max(latencies) * 1e3 if latencies else None,
+    }
+
+
+def start_server(url, workers, threads, logger, online, timeout=120.):
+    '''Start gunicorn serving the API locally and wait until it answers
+
+    Parameters
+    ----------
+    url : str
+        URL of the /api/ route, giving host and port to bind
+    workers : int
+        number of gunicorn workers
+    threads : int
+        number of threads per worker
+    logger : logging.Logger
+        logger used to log message
+    online : list of bytes
+        bodies of online requests, the first one is used to check the server answers
+    timeout : float, optional, default is 120.
+        seconds to wait for the server
+
+    Returns
+    -------
+    subprocess.Popen
+        gunicorn process, to terminate once done
+
+    '''
+    parts = urlsplit(url)
+    command = ['gunicorn', '-c', GUNICORN_CONFIG, '-b', f'{parts.hostname}:{parts.port or 80}',
+               '--workers', str(workers), '--threads', str(threads), 'carinsurance.application.api.wsgi:app']
+    logger.info(f'Starting {" ".join(command)}...')
+    server = subprocess.Popen(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+    deadline = time.perf_counter() + timeout
+    while time.perf_counter() < deadline:
+        if server.poll() is not None:
+            raise ValueError(f'gunicorn exited with code {server.returncode}')
+        try:
+            connection = http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=5)
+            if _post(connection, parts.path or '/', online[0]):
+                connection.close()
+                return server
+        except (OSError, http.client.HTTPException, ValueError):
+            time.sleep(.5)
+    server.terminate()
+    raise ValueError(f'API did not answer at {url} within {timeout}s')
+
+
+def load_test(config, logger, url, concurrencies=CONCURRENCIES, duration=DURATION, rate=None, batch_ratio=0.,
+              workers=None, threads=1):
+    online, batch = get_bodies(config)
+    server = None
+    if workers is not None:
+        server = start_server(url, workers, threads, logger, online)
+
+    results = list()
+    try:
+        for concurrency in concurrencies:
+            logger.info(f'Sending requests from {concurrency} clients during {duration}s...')
+            result = run_load(url, online, batch, concurrency, duration=duration, rate=rate,
+                              batch_ratio=batch_ratio, random_state=concurrency)
+            results.append(result)
+            if result['requests']:
+                logger.info(f'{result["requests"]} requests, {result["throughput"]:.1f} req/s, '
+                            f'p50 {result["p50"]:.1f}ms, p95 {result["p95"]:.1f}ms, p99 {result["p99"]:.1f}ms, '
+                            f'{100 * result["error_rate"]:.1f}% errors')
+    finally:
+        if server is not None:
+            server.terminate()
+            server.wait()
+    return results
+
+
+def _get_arguments():
+    parser = argparse.ArgumentParser(description='Replay API examples against a local server at several concurrencies')
+    parser.add_argument('--url', default='http://localhost:8080/api/', help='URL of the /api/ route')
+    parser.add_argument('--concurrencies', type=int, nargs='+', default=CONCURRENCIES, help='numbers of concurrent clients')
+    parser.add_argument('--duration', type=float, default=DURATION, help='seconds of load per concurrency')
+    parser.add_argument('--rate', type=float, default=None,
+                        help='requests per second of all clients together, default sends back-to-back')
+    parser.add_argument('--batch-ratio', type=float, default=0., help='share of requests sending batch.json')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='start gunicorn locally with this number of workers, default uses a running server')
+    parser.add_argument('--threads', type=int, default=1, help='number of threads per gunicorn worker')
+    parser.add_argument('--output', default=None, help='path of the JSON results, default is results/load/')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = _get_arguments()
+    started = datetime.datetime.now()
+    results = load_test(CONFIG, logger, arguments.url, concurrencies=arguments.concurrencies,
+                        duration=arguments.duration, rate=arguments.rate, batch_ratio=arguments.batch_ratio,
+                        workers=arguments.workers, threads=arguments.threads)
+
+    report = {'started': started.isoformat(timespec='seconds'), 'parameters': vars(arguments), 'results': results}
+    output = arguments.output or os.path.join(CONFIG['project'], CONFIG['results'], 'load',
+                                              f'load_{started:%Y%m%d_%H%M%S}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=4)
+    logger.info(f'Load test results saved into {output}')
@@ -0,0 +1,194 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import datetime
+import warnings
+
+import numpy as np
+import pandas as pd
+import sklearn
+import flask
+
+from carinsurance import logger
+from carinsurance.config import CONFIG
+from carinsurance.domain.modelling.model import Model
+from carinsurance.domain.preprocessing.pipeline import get_pipeline
+from carinsurance.domain.preprocessing.compiled import CompiledPipeline
+from carinsurance.domain.preprocessing.transformers import TargetSplitter
+from carinsurance.infrastructure.synthetic import get_synthetic_dataset, get_payload
+from carinsurance.interface.application import get_app_from
+
+
+SCALES = (1, 100, 10000, 1000000)
+TRAIN_ROWS = 4000 # about the size of the Kaggle train dataset
+API_MAX_ROWS = 10000 # larger JSON payloads mostly benchmark the JSON parser
+MIN_SECONDS = 1. # each benchmark is repeated until it ran at least this long...
+MAX_REPEATS = 100 # ...or this many times
+
+
+def _measure(function, min_seconds, max_repeats):
+    '''Call function until it ran min_seconds or max_repeats times, at least once'''
+    timings = list()
+    while (not timings) or ((sum(timings) < min_seconds) and (len(timings) < max_repeats)):
+        start = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+def _get_environment():
+    return {
+        'python': sys.version.split()[0],
+        'platform': platform.platform(),
+        'processor': platform.processor(),
+        'cpu_count': os.cpu_count(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'sklearn': sklearn.__version__,
+        'flask': flask.__version__,
+    }
+
+
+def _check_answer(response):
+    answer = response.get_json()
+    if answer['status'] != 0:
+        raise ValueError(f'API answered with an error: {answer["message"]}')
+
+
+def run_benchmarks(config, logger, scales=SCALES, train_rows=TRAIN_ROWS, api_max_rows=API_MAX_ROWS,
+                   min_seconds=MIN_SECONDS, max_repeats=MAX_REPEATS, random_state=0):
+    results = list()
+
+    def record(benchmark, rows, function):
+        try:
+            timings = _measure(function, min_seconds, max_repeats)
+        except Exception as e: # a failing benchmark is reported, not fatal (e.g. fitting on a single row)
+            logger.error(f'{benchmark} on {rows} rows failed: {type(e).__name__}: {e}')
+            results.append({'benchmark': benchmark, 'rows': rows, 'error': f'{type(e).__name__}: {e}'})
+            return
+
+        median = float(np.median(timings))
+        results.append({
+            'benchmark': benchmark,
+            'rows': rows,
+            'repeats': len(timings),
+            'min': min(timings),
+            'median': median,
+            'mean': float(np.mean(timings)),
+            'rows_per_second': rows / median if median > 0 else None,
+        })
+        logger.info(f'{benchmark} on {rows} rows: median {median * 1e3:.3f}ms over {len(timings)} runs')
+
+    logger.info(f'Fitting pipeline and models on {train_rows} synthetic rows...')
+    splitter = TargetSplitter(column='CarInsurance', copy=False)
+    train, target = splitter.transform(get_synthetic_dataset(train_rows, random_state=random_state))
+    pipeline = get_pipeline()
+    values = pipeline.fit_transform(train).to_numpy()
+    compiled = CompiledPipeline(pipeline)
+
+    models = dict()
+    for name in Model.MODELS.keys():
+        models[name] = Model(name=name)
+        models[name].train(values, np.asarray(target).reshape(-1))
+
+    app = get_app_from(__name__, compiled, models['RandomForest'].model, logger=logger)
+    client = app.test_client()
+
+    for rows in scales:
+        logger.info(f'Generating {rows} synthetic rows...')
+        data = get_synthetic_dataset(rows, random_state=random_state + 1, target=False)
+
+        record('pipeline.fit_transform', rows, lambda: get_pipeline().fit_transform(data))
+        record('pipeline.transform', rows, lambda: pipeline.transform(data))
+        record('compiled.transform', rows, lambda: compiled.transform(data))
+
+        matrix = compiled.transform(data)
+        for name, model in models.items():
+            record(f'model.{name}.predict', rows, lambda: model.predict(matrix))
+
+        if rows <= api_max_rows:
+            body = json.dumps(get_payload(data))
+            record('api', rows, lambda: _check_answer(client.post('/api/', data=body, content_type='application/json')))
+
+    return results
+
+
+def compare_benchmarks(previous, current):
+    '''Get the ratio of median timings between two benchmark runs
+
+    Parameters
+    ----------
+    previous : dict
+        content of the JSON file of a former run
+    current : dict
+        content of the JSON file of the new run
+
+    Returns
+    -------
+    list of dict
+        benchmark, rows, both medians and their ratio (above 1 when slower)
+        for each benchmark and scale which succeeded in both runs
+
+    '''
+    medians = {(r['benchmark'], r['rows']): r['median'] for r in previous['results'] if 'median' in r}
+    comparison = list()
+    for result in current['results']:
+        key = (result['benchmark'], result['rows'])
+        if (key in medians) and ('median' in result):
+            comparison.append({
+                'benchmark': result['benchmark'],
+                'rows': result['rows'],
+                'previous': medians[key],
+                'current': result['median'],
+                'ratio': result['median'] / medians[key] if medians[key] > 0 else None,
+            })
+    return comparison
+
+
+def _get_arguments():
+    parser = argparse.ArgumentParser(description='Benchmark preprocessing, models and API on synthetic rows')
+    parser.add_argument('--scales', type=int, nargs='+', default=SCALES, help='numbers of rows benchmarked')
+    parser.add_argument('--train-rows', type=int, default=TRAIN_ROWS, help='number of rows used to fit pipeline and models')
+    parser.add_argument('--api-max-rows', type=int, default=API_MAX_ROWS, help='largest number of rows sent to the API')
+    parser.add_argument('--min-seconds', type=float, default=MIN_SECONDS, help='minimal time spent per benchmark')
+    parser.add_argument('--max-repeats', type=int, default=MAX_REPEATS, help='maximal number of runs per benchmark')
+    parser.add_argument('--output', default=None, help='path of the JSON results, default is results/benchmarks/')
+    parser.add_argument('--compare', default=None, help='path of the JSON results of a former run to compare with')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = _get_arguments()
+    warnings.simplefilter('ignore') # convergence warnings of models fitted on random rows
+
+    started = datetime.datetime.now()
+    results = run_benchmarks(CONFIG, logger, scales=arguments.scales, train_rows=arguments.train_rows,
+                             api_max_rows=arguments.api_max_rows, min_seconds=arguments.min_seconds,
+                             max_repeats=arguments.max_repeats)
+    report = {
+        'started': started.isoformat(timespec='seconds'),
+        'environment': _get_environment(),
+        'parameters': {
+            'scales': list(arguments.scales), 'train_rows': arguments.train_rows,
+            'api_max_rows': arguments.api_max_rows, 'min_seconds': arguments.min_seconds,
+            'max_repeats': arguments.max_repeats,
+        },
+        'results': results,
+    }
+
+    output = arguments.output or os.path.join(CONFIG['project'], CONFIG['results'], 'benchmarks',
+                                              f'benchmarks_{started:%Y%m%d_%H%M%S}.json')
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=4)
+    logger.info(f'Benchmarks saved into {output}')
+
+    if arguments.compare is not None:
+        with open(arguments.compare, 'r') as f:
+            previous = json.load(f)
+        for line in compare_benchmarks(previous, report):
+            logger.info(f'{line["benchmark"]} on {line["rows"]} rows: {line["ratio"]:.2f}x '
+                        f'({line["previous"] * 1e3:.3f}ms -> {line["current"] * 1e3:.3f}ms)')
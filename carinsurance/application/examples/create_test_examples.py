@@ -6,6 +6,7 @@ import pandas as pd
 
 from carinsurance import logger
 from carinsurance.config import CONFIG
+from carinsurance.domain.preprocessing.pipeline import get_schema
 
 
 def _get_dataset_from(raw_path, logger):
@@ -40,18 +41,27 @@ def _create_online_examples_from(dataset, integers, floats):
     return examples
 
 
+def _create_stream_example_from(dataset, integers, floats):
+    for record in dataset.to_dict(orient='records'):
+        for column, value in record.items():
+            if column in integers:
+                record[column] = int(value)
+            elif column in floats:
+                record[column] = float(value)
+        yield json.dumps(record) + '\n'
+
+
 def create_test_examples_from(config, logger):
     raw_path = os.path.join(config['project'], config['data'], 'raw')
     examples_path = os.path.join(config['project'], config['data'], 'examples')
     batch_path = os.path.join(examples_path, 'batch')
     online_path = os.path.join(examples_path, 'online')
+    stream_path = os.path.join(examples_path, 'stream')
 
     identifier_column = 'Id'
-    integers = [
-        'Id', 'Age', 'Default', 'Balance', 'HHInsurance', 'CarLoan',
-        'LastContactDay', 'NoOfContacts', 'DaysPassed', 'PrevAttempts'
-    ]
-    floats = []
+    schema = get_schema()
+    integers = [c for c, (dtype, _) in schema.items() if np.issubdtype(dtype, np.integer)]
+    floats = [c for c, (dtype, _) in schema.items() if np.issubdtype(dtype, np.floating)]
 
     if not os.path.exists(batch_path):
         logger.info('Create batch directory...')
@@ -61,6 +71,10 @@ def create_test_examples_from(config, logger):
         logger.info('Create online directory...')
         os.makedirs(online_path, exist_ok=True)
 
+    if not os.path.exists(stream_path):
+        logger.info('Create stream directory...')
+        os.makedirs(stream_path, exist_ok=True)
+
     logger.info('Get test dataset...')
     dataset = _get_dataset_from(raw_path, logger)
     logger.info('Create batch example...')
@@ -72,6 +86,10 @@ def create_test_examples_from(config, logger):
     with open(os.path.join(batch_path, 'batch.json'), 'w') as f:
         json.dump(batch, f, indent=4)
 
+    logger.info('Save stream example...')
+    with open(os.path.join(stream_path, 'stream.ndjson'), 'w') as f:
+        f.writelines(_create_stream_example_from(dataset, integers=integers, floats=floats))
+
     logger.info('Save online examples...')
     for online in onlines:
         identifier = online[identifier_column][0]
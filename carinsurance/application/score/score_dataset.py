@@ -0,0 +1,133 @@
+import os
+import argparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from carinsurance import logger
+from carinsurance.config import CONFIG
+from carinsurance.domain.preprocessing.compiled import CompiledPipeline
+from carinsurance.infrastructure.artifacts import load_object, get_artifact_path
+
+
+CHUNK_SIZE = 20000
+
+_ARTIFACTS = dict() # artifacts loaded once by each worker process
+
+
+def _load_artifacts(model_path, pipeline_path):
+    _ARTIFACTS['model'] = load_object(model_path) # pickles saved by former versions are loaded as well
+    _ARTIFACTS['pipeline'] = CompiledPipeline(load_object(pipeline_path))
+
+
+def _score_rows(chunk):
+    '''Get probabilities of rows, those of rows which cannot be scored being NaN
+
+    A failing chunk is split in halves scored again, down to single rows, so that
+    a malformed row only costs its own score.
+    '''
+    pipeline, model = _ARTIFACTS['pipeline'], _ARTIFACTS['model']
+    try:
+        return model.predict_proba(pipeline.transform(chunk))[:, 1], None
+    except Exception as e: # a faulty row should not stop the whole scoring
+        if len(chunk) <= 1:
+            return np.full(len(chunk), np.nan), f'{type(e).__name__}: {e}'
+    middle = len(chunk) // 2
+    first, message = _score_rows(chunk.iloc[:middle])
+    second, other = _score_rows(chunk.iloc[middle:])
+    return np.concatenate([first, second]), message or other
+
+
+def _score_chunk(chunk, threshold):
+    identifiers = _ARTIFACTS['pipeline'].get_index(chunk)
+    probabilities, message = _score_rows(chunk)
+    failed = np.isnan(probabilities)
+    predictions = pd.array((probabilities > threshold).astype(int), dtype='Int64')
+    predictions[failed] = None
+
+    scores = pd.DataFrame({'probability': probabilities, 'prediction': predictions}, index=identifiers)
+    scores.index.name = _ARTIFACTS['pipeline'].index or 'index'
+    return scores, int(failed.sum()), message
+
+
+def _read_chunks(path, chunk_size):
+    if path.endswith('.parquet'):
+        import pyarrow.parquet as pq # only imported for parquet files, iter_batches requires pyarrow 3.0
+        for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_size):
+            yield batch.to_pandas()
+    else:
+        yield from pd.read_csv(path, chunksize=chunk_size)
+
+
+def _write_chunks(path, chunks):
+    if path.endswith('.parquet'):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        writer = None
+        for chunk in chunks:
+            table = pa.Table.from_pandas(chunk.reset_index(), preserve_index=False)
+            writer = writer or pq.ParquetWriter(path, table.schema)
+            writer.write_table(table)
+        if writer is not None:
+            writer.close()
+    else:
+        for position, chunk in enumerate(chunks):
+            chunk.to_csv(path, mode='w' if position == 0 else 'a', header=position == 0)
+
+
+def _score_in_order(executor, chunks, threshold, max_pending):
+    '''Score chunks in the pool, yielding scores in input order with a bounded number of pending chunks'''
+    pending = deque()
+    for position, chunk in enumerate(chunks):
+        pending.append((position, executor.submit(_score_chunk, chunk, threshold)))
+        while len(pending) >= max_pending:
+            yield pending.popleft()
+    yield from pending
+
+
+def score_dataset(config, logger, input_path, output_path, chunk_size=CHUNK_SIZE, workers=None, threshold=None):
+    models_path = os.path.join(config['project'], config['models'])
+    model_path = get_artifact_path(models_path, 'model')
+    pipeline_path = get_artifact_path(models_path, 'pipeline')
+    workers = workers or os.cpu_count()
+    threshold = config.get('api', dict()).get('threshold', .5) if threshold is None else threshold
+
+    if not (model_path.endswith('.artifact') and pipeline_path.endswith('.artifact')):
+        logger.warning(f'Pickles of {models_path} saved by a former version are loaded, retrain to save artifacts')
+    logger.info(f'Scoring {input_path} by chunks of {chunk_size} rows with {workers} workers...')
+    rows, failures = 0, 0 # failures are rows which could not be scored
+    with ProcessPoolExecutor(max_workers=workers, initializer=_load_artifacts,
+                             initargs=(model_path, pipeline_path)) as executor:
+        def scores():
+            nonlocal rows, failures
+            for position, future in _score_in_order(executor, _read_chunks(input_path, chunk_size),
+                                                    threshold, max_pending=2 * workers):
+                chunk, failed, message = future.result()
+                if failed:
+                    logger.error(f'{failed} rows of chunk {position} could not be scored (first error: {message})')
+                    failures += failed
+                rows += len(chunk)
+                logger.debug(f'Chunk {position} scored...')
+                yield chunk
+
+        _write_chunks(output_path, scores())
+
+    logger.info(f'{rows} rows scored into {output_path} ({failures} rows failed)')
+
+
+def _get_arguments():
+    parser = argparse.ArgumentParser(description='Score a CSV or Parquet file of customers')
+    parser.add_argument('input', help='path of the CSV or Parquet file to score')
+    parser.add_argument('output', help='path of the CSV or Parquet file where scores are written')
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE, help='number of rows scored at once')
+    parser.add_argument('--workers', type=int, default=None, help='number of processes, default is the number of cores')
+    parser.add_argument('--threshold', type=float, default=None, help='threshold of predictions, default is the API one')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    arguments = _get_arguments()
+    score_dataset(CONFIG, logger, arguments.input, arguments.output, chunk_size=arguments.chunk_size,
+                  workers=arguments.workers, threshold=arguments.threshold)
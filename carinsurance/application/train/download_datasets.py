@@ -1,11 +1,14 @@
 import os
 
 from carinsurance import logger
-from carinsurance.config import CONFIG
-from carinsurance.infrastructure.dataset import CarInsuranceDataset
+from carinsurance.config import CONFIG, populate_environment
 
 
 def download_datasets(config, logger):
+    if config.get('keypath') is not None:
+        populate_environment(config['keypath'])
+    from carinsurance.infrastructure.dataset import CarInsuranceDataset # kaggle authenticates when imported
+
     project_path = config['project']
     data_path = os.path.join(project_path, config['data'])
     raw_path = os.path.join(data_path, 'raw')
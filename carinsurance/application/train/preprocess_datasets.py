@@ -1,5 +1,4 @@
 import os
-import pickle
 
 import pandas as pd
 from sklearn.model_selection import train_test_split
@@ -8,9 +7,12 @@ from carinsurance import logger
 from carinsurance.config import CONFIG
 from carinsurance.domain.preprocessing.pipeline import get_pipeline
 from carinsurance.domain.preprocessing.transformers import TargetSplitter
+from carinsurance.helpers.metrics import Metrics, measure_pipeline
+from carinsurance.infrastructure.artifacts import save_artifact, save_frame
 
 
 VALIDATION_SPLIT = .2
+SPLIT_SEED = 42
 
 
 def preprocess_datasets(config, logger):
@@ -30,28 +32,31 @@ def preprocess_datasets(config, logger):
     train = pd.read_csv(os.path.join(raw_path, 'train.csv'))
 
     logger.info('Splitting target...')
-    splitter = TargetSplitter(column='CarInsurance')
+    splitter = TargetSplitter(column='CarInsurance', copy=False)
     train, target = splitter.transform(train)
 
     logger.info('Splitting dataset into train and validation...')
-    train, validation, y_train, y_validation = train_test_split(train, target, test_size=VALIDATION_SPLIT)
+    train, validation, y_train, y_validation = train_test_split(train, target, test_size=VALIDATION_SPLIT,
+                                                                    random_state=SPLIT_SEED)
 
     logger.info('Getting pipeline...')
-    pipeline = get_pipeline()
+    pipeline = get_pipeline(inplace=True)
+    metrics = Metrics()
+    measured = measure_pipeline(pipeline, metrics)
     logger.info('Fitting pipeline on train...')
-    train = pipeline.fit_transform(train)
+    train = measured.fit_transform(train)
     logger.info('Transforming validation with pipeline...')
-    validation = pipeline.transform(validation)
+    validation = measured.transform(validation)
+    logger.info('Pipeline steps metrics:\n' + metrics.format_summary())
 
     logger.info('Saving datasets...')
-    train.to_csv(os.path.join(clean_path, 'train.csv'), index=False)
-    validation.to_csv(os.path.join(clean_path, 'validation.csv'), index=False)
-    y_train.to_csv(os.path.join(clean_path, 'y_train.csv'), index=False)
-    y_validation.to_csv(os.path.join(clean_path, 'y_validation.csv'), index=False)
+    save_frame(train, os.path.join(clean_path, 'train.artifact'))
+    save_frame(validation, os.path.join(clean_path, 'validation.artifact'))
+    save_frame(y_train, os.path.join(clean_path, 'y_train.artifact'))
+    save_frame(y_validation, os.path.join(clean_path, 'y_validation.artifact'))
 
     logger.info('Saving pipeline...')
-    with open(os.path.join(models_path, 'pipeline.pkl'), 'wb') as f:
-        pickle.dump(pipeline, f)
+    save_artifact(pipeline, os.path.join(models_path, 'pipeline.artifact'))
 
     logger.info('Preprocessing done!')
 
@@ -0,0 +1,97 @@
+import os
+import argparse
+
+from carinsurance import logger
+from carinsurance.config import CONFIG
+from carinsurance.helpers.stages import Stage, StageRunner
+
+
+STAGES = ('dataset', 'preprocessing', 'training', 'bundle', 'examples')
+
+
+def get_stages(config, logger):
+    data_path = os.path.join(config['project'], config['data'])
+    raw_path = os.path.join(data_path, 'raw')
+    clean_path = os.path.join(data_path, 'clean')
+    examples_path = os.path.join(data_path, 'examples')
+    models_path = os.path.join(config['project'], config['models'])
+    results_path = os.path.join(config['project'], config['results'])
+
+    # stage functions are imported when run, so that up to date stages import nothing (Kaggle client)
+    def download():
+        from carinsurance.application.train.download_datasets import download_datasets
+        download_datasets(config, logger)
+
+    def preprocess():
+        from carinsurance.application.train.preprocess_datasets import preprocess_datasets
+        preprocess_datasets(config, logger)
+
+    def train():
+        from carinsurance.application.train.train_model import train_model
+        train_model(config, logger)
+
+    def bundle():
+        from carinsurance.application.api.build_bundle import build_bundle
+        build_bundle(config, logger)
+
+    def create_examples():
+        from carinsurance.application.examples.create_test_examples import create_test_examples_from
+        create_test_examples_from(config, logger)
+
+    clean = [os.path.join(clean_path, f'{name}.artifact') for name in ('train', 'validation', 'y_train', 'y_validation')]
+    return [
+        Stage(
+            'dataset', download,
+            outputs=[os.path.join(raw_path, 'train.csv'), os.path.join(raw_path, 'test.csv')],
+        ),
+        Stage(
+            'preprocessing', preprocess,
+            inputs=[os.path.join(raw_path, 'train.csv')],
+            outputs=clean + [os.path.join(models_path, 'pipeline.artifact')],
+            modules=[
+                'carinsurance.application.train.preprocess_datasets',
+                'carinsurance.domain.preprocessing.pipeline',
+                'carinsurance.domain.preprocessing.transformers',
+                'carinsurance.infrastructure.preprocessing.transformers',
+                'carinsurance.helpers.preprocessing',
+            ],
+        ),
+        Stage(
+            'training', train,
+            inputs=clean,
+            outputs=[os.path.join(models_path, 'model.artifact'), os.path.join(results_path, 'report.txt')],
+            parameters=config.get('model', dict()),
+            modules=['carinsurance.application.train.train_model', 'carinsurance.domain.modelling.model'],
+        ),
+        Stage(
+            'bundle', bundle,
+            inputs=[os.path.join(models_path, 'model.artifact'), os.path.join(models_path, 'pipeline.artifact')],
+            outputs=[os.path.join(models_path, 'serving.artifact')],
+            parameters={'native': config.get('api', dict()).get('native', False)},
+            modules=['carinsurance.interface.bundle', 'carinsurance.domain.modelling.trees',
+                     'carinsurance.domain.preprocessing.compiled'],
+        ),
+        Stage(
+            'examples', create_examples,
+            inputs=[os.path.join(raw_path, 'test.csv')],
+            outputs=[os.path.join(examples_path, 'batch', 'batch.json'),
+                     os.path.join(examples_path, 'stream', 'stream.ndjson')],
+            modules=['carinsurance.application.examples.create_test_examples', 'carinsurance.domain.preprocessing.pipeline'],
+        ),
+    ]
+
+
+def run_pipeline(config, logger, force=()):
+    runner = StageRunner(os.path.join(config['project'], '.stages.json'), logger=logger)
+    ran = runner.run(get_stages(config, logger), force=force)
+    logger.info(f'Stages run: {", ".join(ran) or "none"}')
+
+
+def _get_arguments():
+    parser = argparse.ArgumentParser(description='Run dataset, preprocessing, training and examples stages when needed')
+    parser.add_argument('--force', nargs='*', choices=STAGES, default=(), help='stages to run even if up to date')
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    run_pipeline(CONFIG, logger, force=_get_arguments().force)
@@ -1,14 +1,17 @@
 import os
-import pickle
+import time
+import argparse
 
 import pandas as pd
 
 from carinsurance import logger
 from carinsurance.config import CONFIG
 from carinsurance.domain.modelling.model import Model
+from carinsurance.helpers.metrics import Metrics
+from carinsurance.infrastructure.artifacts import load_frame
 
 
-def train_model(config, logger):
+def train_model(config, logger, search=None, n_candidates=10, metric='roc_auc', workers=None):
     clean_path = os.path.join(config['project'], config['data'], 'clean')
     models_path = os.path.join(config['project'], config['models'])
     results_path = os.path.join(config['project'], config['results'])
@@ -18,25 +21,55 @@ def train_model(config, logger):
         os.makedirs(results_path, exist_ok=True)
 
     logger.info('Reading train dataset...')
-    X_train = pd.read_csv(os.path.join(clean_path, 'train.csv'))
-    y_train = pd.read_csv(os.path.join(clean_path, 'y_train.csv'))
+    X_train = load_frame(os.path.join(clean_path, 'train.artifact'))
+    y_train = load_frame(os.path.join(clean_path, 'y_train.artifact'))
 
     logger.info('Reading validation dataset...')
-    X_validation = pd.read_csv(os.path.join(clean_path, 'validation.csv'))
-    y_validation = pd.read_csv(os.path.join(clean_path, 'y_validation.csv'))
+    X_validation = load_frame(os.path.join(clean_path, 'validation.artifact'))
+    y_validation = load_frame(os.path.join(clean_path, 'y_validation.artifact'))
+
+    name = config.get('model', dict()).get('name', 'RandomForest')
+    params = config.get('model', dict()).get('params', dict())
+    random_state = config.get('model', dict()).get('random_state')
+    if search is not None:
+        from carinsurance.domain.modelling.search import get_candidates, search_models
+        candidates = get_candidates(search=search, n_candidates=n_candidates, random_state=random_state)
+        logger.info(f'Searching best model among {len(candidates)} candidates...')
+        start = time.perf_counter()
+        results = search_models(X_train, y_train, X_validation, y_validation, candidates,
+                                metric=metric, workers=workers, logger=logger)
+        logger.info(f'Search done in {time.perf_counter() - start:.1f}s')
+        pd.DataFrame(results).to_csv(os.path.join(results_path, 'search.csv'), index=False)
+        name, params = results[0]['name'], results[0]['params']
+        logger.info(f'Best model is {name} {params} with {metric} {results[0]["score"]:.4f}')
 
     logger.info('Creating model...')
-    model = Model(name='RandomForest', results_path=results_path)
+    model = Model(name=name, results_path=results_path, **Model.seed_params(name, params, random_state))
+    metrics = Metrics()
     logger.info('Training model...')
-    model.train(X_train, y_train.values.reshape(-1))
+    metrics.call('model.train', model.train, X_train, y_train.values.reshape(-1))
     logger.info('Save report on validation...')
-    model.compute_report_using(X_validation, y_validation.values.reshape(-1), threshold=.5)
+    metrics.call('model.report', model.compute_report_using, X_validation, y_validation.values.reshape(-1), threshold=.5)
+    logger.info('Model metrics:\n' + metrics.format_summary())
 
     logger.info('Saving model...')
-    model.save(os.path.join(models_path), model_name='model.pkl')
+    model.save(os.path.join(models_path), model_name='model.artifact')
 
     logger.info('Model trained!')
 
 
+def _get_arguments():
+    parser = argparse.ArgumentParser(description='Train the model, optionally searching the best one')
+    parser.add_argument('--search', choices=('grid', 'random'), default=None,
+                        help='search among all models and hyperparameters, default trains a RandomForest')
+    parser.add_argument('--candidates', type=int, default=10, help='number of candidates per model of random search')
+    parser.add_argument('--metric', choices=('roc_auc', 'f1', 'accuracy'), default='roc_auc',
+                        help='validation metric used to choose the best candidate')
+    parser.add_argument('--workers', type=int, default=None, help='number of processes, default is the number of cores')
+    return parser.parse_args()
+
+
 if __name__ == '__main__':
-    train_model(CONFIG, logger)
+    arguments = _get_arguments()
+    train_model(CONFIG, logger, search=arguments.search, n_candidates=arguments.candidates,
+                metric=arguments.metric, workers=arguments.workers)
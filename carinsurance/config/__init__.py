@@ -2,7 +2,8 @@ import os
 import json
 
 
-def _populate_environment(keypath):
+def populate_environment(keypath):
+    '''Export the Kaggle credentials of a key file, only needed to download datasets'''
     with open(keypath, 'r') as f:
         kaggle_json = json.load(f)
     os.environ['KAGGLE_USERNAME'] = kaggle_json['username']
@@ -22,7 +23,6 @@ with open(filepath, 'r') as f:
 
 if CONFIG.get('keyname') is not None:
     CONFIG['keypath'] = os.path.join(thispath, CONFIG.get('keyname'))
-    _populate_environment(CONFIG['keypath'])
 
 project_path = os.path.abspath(os.path.dirname(os.path.dirname(os.path.dirname(__file__))))
 CONFIG['project'] = CONFIG['project'] or project_path
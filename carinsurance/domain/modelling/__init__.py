@@ -1 +1,7 @@
-import carinsurance.domain.modelling.model as model
+from carinsurance.helpers.lazy import get_lazy_getattr
+
+import carinsurance.domain.modelling.trees as trees
+
+_LAZY_MODULES = ('model', 'search') # imports every scikit-learn estimator, only needed for training
+
+__getattr__ = get_lazy_getattr(__name__, _LAZY_MODULES)
@@ -1,11 +1,13 @@
 import os
-import pickle
 
 from sklearn.tree import DecisionTreeClassifier
 from sklearn.linear_model import LogisticRegression
 from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
 from sklearn.metrics import classification_report
 
+from carinsurance.domain.modelling.trees import TreeEnsemble
+from carinsurance.infrastructure.artifacts import save_artifact, load_object
+
 
 class Model(object):
     '''Model class for fitting a scikit-learn model,
@@ -35,6 +37,9 @@ class Model(object):
         - RandomForestClassifier
         - LogisticRegression
         - GradientBoostingClassifier
+    predictor : TreeEnsemble or NoneType
+        flattened version of model used for predictions when set with set_native,
+        if None the scikit-learn model is used
 
     '''
     MODELS = {
@@ -49,6 +54,30 @@ class Model(object):
         self.name = name
         self.results_path = results_path
         self.model = self.MODELS[name](**modelargs)
+        self.predictor = None
+
+    @classmethod
+    def seed_params(cls, name, params, random_state=None):
+        '''Get keyword arguments of a model with its random_state set, so that training is reproducible
+
+        Parameters
+        ----------
+        name : str
+            name of scikit-learn model, see MODELS
+        params : dict
+            keyword arguments of the scikit-learn model
+        random_state : int or NoneType, optional, default is None
+            seed of the model, used unless params already holds one or the model has no randomness
+
+        Returns
+        -------
+        dict
+            keyword arguments of the scikit-learn model
+
+        '''
+        if (random_state is None) or ('random_state' not in cls.MODELS[name]().get_params()):
+            return dict(params)
+        return {'random_state': random_state, **params}
 
     def train(self, data, target, **fitargs):
         '''Fit the data with the model
@@ -64,6 +93,21 @@ class Model(object):
 
         '''
         self.model.fit(data, target, **fitargs)
+        if self.predictor is not None:
+            self.set_native()
+
+    def set_native(self, native=True):
+        '''Switch predictions between the scikit-learn model and its flattened
+        TreeEnsemble version, faster on the small batches served by the API
+
+        Parameters
+        ----------
+        native : bool, optional, default is True
+            if True, predictions are computed by a TreeEnsemble built from the fitted model,
+            must be a DecisionTree, a RandomForest or a GradientBoosting
+
+        '''
+        self.predictor = TreeEnsemble.from_estimator(self.model) if native else None
 
     def predict(self, data, **predictargs):
         '''Predict the probabilities on the given data
@@ -80,6 +124,8 @@ class Model(object):
             probabilities computed for every class
 
         '''
+        if self.predictor is not None:
+            return self.predictor.predict_proba(data)
         if hasattr(self.model, 'predict_proba'):
             return self.model.predict_proba(data, **predictargs)
         return self.model.predict(data, **predictargs)
@@ -117,7 +163,8 @@ class Model(object):
         return report
 
     def save(self, models_path, model_name=None):
-        '''Save the model to given path with pickle dump method
+        '''Save the model to given path in the compact artifact format,
+        where fitted arrays (such as tree nodes) are stored as memory-mappable buffers
 
         Parameters
         ----------
@@ -125,15 +172,15 @@ class Model(object):
             directory path where the model will be saved
         model_name : str or NoneType, optional, default is None
             filename used for saving the model, if None use name attribute
-            followed by ".pkl" extension
+            followed by ".artifact" extension
 
         '''
-        model_name = model_name or f'{self.name}.pkl'
-        with open(os.path.join(models_path, model_name), 'wb') as f:
-            pickle.dump(self.model, f)
+        model_name = model_name or f'{self.name}.artifact'
+        save_artifact(self.model, os.path.join(models_path, model_name), metadata={'name': self.name})
 
     def load(self, model_path):
-        '''Load the model from a given filepath with pickle load method. 
+        '''Load the model from a given filepath, either an artifact saved with save method
+        or a model pickled by former versions
 
         Parameters
         ----------
@@ -141,8 +188,8 @@ class Model(object):
             filepath where the given model is storaged
 
         '''
-        with open(model_path, 'rb') as f:
-            model = pickle.load(f)
+        model = load_object(model_path)
         name = type(model).__name__.replace('Classifier', '')
         assert name in self.MODELS.keys()
         self.model, self.name = model, name
+        self.predictor = None
@@ -0,0 +1,154 @@
+'''Parallel search of the best model and hyperparameters among Model.MODELS'''
+
+import os
+import time
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+from sklearn.metrics import roc_auc_score, f1_score, accuracy_score
+from sklearn.model_selection import ParameterGrid, ParameterSampler
+
+from carinsurance.domain.modelling.model import Model
+from carinsurance.infrastructure.artifacts import save_artifact, load_artifact
+
+
+SEARCH_SPACES = {
+    'RandomForest': {
+        'n_estimators': [100, 300],
+        'max_depth': [None, 10, 20],
+        'min_samples_leaf': [1, 5],
+    },
+    'LogisticRegression': {
+        'C': [.01, .1, 1., 10.],
+        'max_iter': [1000],
+    },
+    'DecisionTree': {
+        'max_depth': [None, 5, 10, 20],
+        'min_samples_leaf': [1, 5, 20],
+    },
+    'GradientBoosting': {
+        'n_estimators': [100, 300],
+        'learning_rate': [.05, .1],
+        'max_depth': [3, 5],
+    },
+}
+
+METRICS = {
+    'roc_auc': roc_auc_score,
+    'f1': f1_score,
+    'accuracy': accuracy_score,
+}
+
+_DATA = dict() # train and validation data shared read-only by each worker process
+
+
+def get_candidates(search='grid', n_candidates=10, spaces=None, random_state=None):
+    '''Get candidates of models and hyperparameters to evaluate
+
+    Parameters
+    ----------
+    search : str, optional, default is "grid"
+        either "grid" (every combination of hyperparameters)
+        or "random" (n_candidates combinations sampled per model)
+    n_candidates : int, optional, default is 10
+        number of combinations sampled per model, only used for random search
+    spaces : dict or NoneType, optional, default is None
+        hyperparameters values for each model name, if None use SEARCH_SPACES
+    random_state : int or NoneType, optional, default is None
+        seed used to sample combinations and set to every candidate model using one,
+        so that a search can be reproduced
+
+    Returns
+    -------
+    list of (str, dict)
+        pairs of model name and keyword arguments of the scikit-learn model
+
+    '''
+    assert search in ('grid', 'random')
+    spaces = spaces or SEARCH_SPACES
+    candidates = list()
+    for name, space in spaces.items():
+        assert name in Model.MODELS.keys()
+        if search == 'grid':
+            combinations = ParameterGrid(space)
+        else:
+            n_combinations = len(ParameterGrid(space))
+            combinations = ParameterSampler(space, n_iter=min(n_candidates, n_combinations), random_state=random_state)
+        candidates += [(name, Model.seed_params(name, params, random_state)) for params in combinations]
+    return candidates
+
+
+def _load_data(path):
+    _DATA.update(load_artifact(path))
+
+
+def _evaluate(name, params, metric, threshold):
+    start = time.perf_counter()
+    model = Model(name=name, **params)
+    model.train(_DATA['train'], _DATA['y_train'])
+    probabilities = model.predict(_DATA['validation'])[:, 1]
+    if metric == 'roc_auc':
+        score = METRICS[metric](_DATA['y_validation'], probabilities)
+    else:
+        score = METRICS[metric](_DATA['y_validation'], (probabilities > threshold).astype(int))
+    return score, time.perf_counter() - start
+
+
+def search_models(train, y_train, validation, y_validation, candidates, metric='roc_auc',
+                  threshold=.5, workers=None, logger=None):
+    '''Train every candidate in a process pool and score it on validation data
+
+    Train and validation data are written once in a temporary artifact which every
+    worker memory-maps, so that data are shared read-only instead of being copied
+    for each candidate.
+
+    Parameters
+    ----------
+    train : array-like of shape (n_samples, n_features)
+        training data
+    y_train : array-like of shape (n_samples,)
+        training target
+    validation : array-like of shape (n_validation_samples, n_features)
+        validation data used to score candidates
+    y_validation : array-like of shape (n_validation_samples,)
+        validation target used to score candidates
+    candidates : list of (str, dict)
+        pairs of model name and keyword arguments, see get_candidates
+    metric : str, optional, default is "roc_auc"
+        validation metric, should be either "roc_auc", "f1" or "accuracy", higher is better
+    threshold : float, optional, default is .5
+        threshold used for splitting the class, only used for "f1" and "accuracy"
+    workers : int or NoneType, optional, default is None
+        number of processes, if None use the number of cores
+    logger : logging.Logger or NoneType, optional, default is None
+        logger used to log score and wall time of each candidate
+
+    Returns
+    -------
+    list of dict
+        name, params, score and seconds of each candidate, best candidate first
+
+    '''
+    assert metric in METRICS.keys()
+    data = {
+        'train': np.asarray(train, dtype=np.float64),
+        'y_train': np.asarray(y_train).reshape(-1),
+        'validation': np.asarray(validation, dtype=np.float64),
+        'y_validation': np.asarray(y_validation).reshape(-1),
+    }
+
+    results = list()
+    with tempfile.TemporaryDirectory() as directory:
+        path = os.path.join(directory, 'data.artifact')
+        save_artifact(data, path)
+        with ProcessPoolExecutor(max_workers=workers or os.cpu_count(), initializer=_load_data,
+                                 initargs=(path,)) as executor:
+            futures = [executor.submit(_evaluate, name, params, metric, threshold) for name, params in candidates]
+            for (name, params), future in zip(candidates, futures):
+                score, seconds = future.result()
+                if logger is not None:
+                    logger.info(f'{name} {params}: {metric} {score:.4f} in {seconds:.1f}s')
+                results.append({'name': name, 'params': params, 'score': score, 'seconds': seconds})
+
+    return sorted(results, key=lambda result: result['score'], reverse=True)
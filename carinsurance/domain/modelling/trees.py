@@ -0,0 +1,235 @@
+'''Vectorized evaluation of flattened scikit-learn tree ensembles'''
+
+import numpy as np
+
+
+class TreeEnsemble(object):
+    '''Predictor which evaluates all trees of a fitted ensemble at once with numpy
+
+    Nodes of every tree are concatenated into contiguous arrays where leaves point
+    to themselves, so that a batch of rows goes down all the trees together in
+    depth iterations of vectorized indexing, without any per-tree or thread overhead.
+
+    Parameters
+    ----------
+    children : np.ndarray of shape (n_nodes, 2)
+        global index of left and right children of each node, leaves point to themselves
+    feature : np.ndarray of shape (n_nodes,)
+        feature used for splitting each node
+    threshold : np.ndarray of shape (n_nodes,)
+        threshold used for splitting each node, rows go left if feature <= threshold
+    value : np.ndarray of shape (n_nodes, n_outputs)
+        contribution of each node when it is the leaf reached by a row
+    roots : np.ndarray of shape (n_trees,)
+        global index of the root node of each tree
+    depth : int
+        maximum depth among trees
+    classes : np.ndarray of shape (n_classes,)
+        classes of the fitted estimator
+    kind : str, optional, default is "average"
+        how leaf values are combined, should be either "average" (mean of leaf
+        probabilities), "binomial", "exponential" or "multinomial" (boosting raw predictions)
+    init : np.ndarray of shape (n_outputs,) or NoneType, optional, default is None
+        raw prediction added to tree contributions for boosting kinds
+
+    Attributes
+    ----------
+    children, feature, threshold, value, roots, depth, kind, init
+        see parameters
+    classes_ : np.ndarray of shape (n_classes,)
+        classes of the fitted estimator, named as in scikit-learn for compatibility
+
+    '''
+    KINDS = ('average', 'binomial', 'exponential', 'multinomial')
+    CHUNK_SIZE = 4096
+    COMPACTION_PERIOD = 4
+
+    def __init__(self, children, feature, threshold, value, roots, depth, classes, kind='average', init=None):
+        assert kind in self.KINDS
+        self.children = children
+        self.feature = feature
+        self.threshold = threshold
+        self.value = value
+        self.roots = roots
+        self.depth = depth
+        self.classes_ = classes
+        self.kind = kind
+        self.init = init
+
+    @staticmethod
+    def _flatten(trees, values):
+        '''Concatenate sklearn Tree objects and their per-node values into global arrays'''
+        left, right, feature, threshold, roots = list(), list(), list(), list(), list()
+        offset = 0
+        for tree in trees:
+            nodes = np.arange(tree.node_count)
+            leaves = tree.children_left == -1
+            left.append(np.where(leaves, nodes, tree.children_left) + offset)
+            right.append(np.where(leaves, nodes, tree.children_right) + offset)
+            feature.append(np.where(leaves, 0, tree.feature))
+            threshold.append(tree.threshold)
+            roots.append(offset)
+            offset += tree.node_count
+
+        return dict(
+            children=np.column_stack([np.concatenate(left), np.concatenate(right)]).astype(np.intp),
+            feature=np.concatenate(feature).astype(np.intp),
+            threshold=np.concatenate(threshold).astype(np.float64),
+            value=np.concatenate(values).astype(np.float64),
+            roots=np.array(roots, dtype=np.intp),
+            depth=max(tree.max_depth for tree in trees),
+        )
+
+    @staticmethod
+    def _get_probabilities_from(tree, n_classes):
+        '''Get leaf probabilities of a classification tree as predict_proba computes them'''
+        if tree.n_outputs != 1:
+            raise ValueError('Only single output trees can be flattened')
+        probabilities = tree.value[:, 0, :n_classes].copy()
+        normalizer = probabilities.sum(axis=1)[:, np.newaxis]
+        normalizer[normalizer == 0.] = 1.
+        return probabilities / normalizer
+
+    @classmethod
+    def from_estimator(cls, estimator):
+        '''Build a TreeEnsemble from a fitted scikit-learn tree-based classifier
+
+        Parameters
+        ----------
+        estimator : DecisionTreeClassifier, RandomForestClassifier or GradientBoostingClassifier
+            fitted estimator to flatten
+
+        Returns
+        -------
+        TreeEnsemble
+            predictor giving the same probabilities as the estimator up to float tolerance
+
+        Raises
+        ------
+        ValueError
+            arises when the estimator (or its init estimator) cannot be flattened
+
+        '''
+        from sklearn.tree import DecisionTreeClassifier # scikit-learn is not needed to evaluate trees
+        from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+
+        if isinstance(estimator, DecisionTreeClassifier):
+            trees = [estimator.tree_]
+        elif isinstance(estimator, RandomForestClassifier):
+            trees = [e.tree_ for e in estimator.estimators_]
+        elif isinstance(estimator, GradientBoostingClassifier):
+            return cls._from_boosting(estimator)
+        else:
+            raise ValueError(f'{type(estimator).__name__} cannot be flattened')
+
+        n_classes = len(estimator.classes_)
+        values = [cls._get_probabilities_from(tree, n_classes) for tree in trees]
+        return cls(classes=estimator.classes_, kind='average', **cls._flatten(trees, values))
+
+    @classmethod
+    def _from_boosting(cls, estimator):
+        from sklearn.dummy import DummyClassifier
+
+        if not ((estimator.init_ == 'zero') or isinstance(estimator.init_, DummyClassifier)):
+            raise ValueError('Only constant init estimators can be flattened')
+
+        n_features = getattr(estimator, 'n_features_in_', None) or estimator.n_features_
+        init = estimator._raw_predict_init(np.zeros((1, n_features), dtype=np.float32))[0]
+
+        n_stages, n_outputs = estimator.estimators_.shape
+        trees, values = list(), list()
+        for stage in range(n_stages):
+            for k in range(n_outputs):
+                tree = estimator.estimators_[stage, k].tree_
+                value = np.zeros((tree.node_count, n_outputs))
+                value[:, k] = estimator.learning_rate * tree.value[:, 0, 0]
+                trees.append(tree)
+                values.append(value)
+
+        if estimator.loss == 'exponential':
+            kind = 'exponential'
+        else:
+            kind = 'binomial' if n_outputs == 1 else 'multinomial'
+        return cls(classes=estimator.classes_, kind=kind, init=init, **cls._flatten(trees, values))
+
+    def _get_leaves(self, data):
+        '''Get the global index of the leaf reached by each row in each tree
+
+        (row, tree) pairs are handled as a flat array, from which pairs having
+        reached a leaf are removed every COMPACTION_PERIOD levels.
+        '''
+        n_rows, n_features = data.shape
+        n_trees = len(self.roots)
+        values = data.ravel()
+
+        leaves = np.tile(self.roots, n_rows)
+        active = np.arange(n_rows * n_trees)
+        offsets = np.repeat(np.arange(n_rows) * n_features, n_trees)
+        nodes = leaves.copy()
+
+        for level in range(self.depth):
+            go_right = values[offsets + self.feature[nodes]] > self.threshold[nodes]
+            children = self.children[nodes, go_right.astype(np.intp)]
+
+            if (level + 1) % self.COMPACTION_PERIOD == 0:
+                moving = children != nodes
+                leaves[active[~moving]] = nodes[~moving]
+                active, children, offsets = active[moving], children[moving], offsets[moving]
+            nodes = children
+            if not len(active):
+                break
+
+        leaves[active] = nodes
+        return leaves.reshape(n_rows, n_trees)
+
+    def _predict_chunk(self, data):
+        leaves = self._get_leaves(data)
+        scores = self.value[leaves].sum(axis=1)
+
+        if self.kind == 'average':
+            return scores / len(self.roots)
+
+        raw = scores + self.init
+        if self.kind == 'multinomial':
+            raw = np.exp(raw - raw.max(axis=1, keepdims=True))
+            return raw / raw.sum(axis=1, keepdims=True)
+
+        raw = raw[:, 0] * (2. if self.kind == 'exponential' else 1.)
+        positives = 1. / (1. + np.exp(-raw))
+        return np.column_stack([1. - positives, positives])
+
+    def predict_proba(self, data):
+        '''Predict class probabilities of data
+
+        Parameters
+        ----------
+        data : array-like of shape (n_samples, n_features)
+            data on which probabilities must be computed
+
+        Returns
+        -------
+        np.ndarray of shape (n_samples, n_classes)
+            probabilities computed for every class
+
+        '''
+        data = np.asarray(data, dtype=np.float32) # trees compare features as float32
+        chunks = [self._predict_chunk(data[i:i + self.CHUNK_SIZE]) for i in range(0, len(data), self.CHUNK_SIZE)]
+        if not chunks:
+            return np.empty((0, len(self.classes_)))
+        return np.concatenate(chunks)
+
+    def predict(self, data):
+        '''Predict classes of data
+
+        Parameters
+        ----------
+        data : array-like of shape (n_samples, n_features)
+            data on which classes must be predicted
+
+        Returns
+        -------
+        np.ndarray of shape (n_samples,)
+            class with the highest probability for each instance
+
+        '''
+        return self.classes_[np.argmax(self.predict_proba(data), axis=1)]
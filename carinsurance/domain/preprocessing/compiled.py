@@ -0,0 +1,288 @@
+'''Array-based inference path compiled from a fitted preprocessing pipeline'''
+
+import time
+import numbers
+
+import numpy as np
+import pandas as pd
+from sklearn.preprocessing import StandardScaler, MinMaxScaler
+
+from carinsurance.helpers.preprocessing import Transformer
+from carinsurance.helpers.metrics import get_size
+from carinsurance.domain.preprocessing.transformers import DurationTransformer, Scaler, MedianImputer
+from carinsurance.infrastructure.preprocessing.transformers import (ColumnsRemover, NullValuesFiller,
+    ModalitiesReplacement, DatetimeConverter, Dummifier, Indexer, ColumnsSorter
+)
+
+
+def _get_arrays_from(data):
+    '''Get one numpy array per column from a dataframe or a mapping of column values'''
+    if isinstance(data, pd.DataFrame):
+        return {column: data[column].to_numpy() for column in data.columns}
+
+    arrays = dict()
+    for column, values in data.items():
+        values = np.asarray(values)
+        if values.dtype.kind == 'U':
+            values = values.astype(object)
+        arrays[column] = values
+    return arrays
+
+
+def _fill(values, mask, value):
+    '''Get a copy of values where masked elements are replaced by value'''
+    if (values.dtype.kind == 'O') or not isinstance(value, numbers.Number):
+        values = values.astype(object)
+        values[mask] = value
+        return values
+    return np.where(mask, value, values)
+
+
+def _index(step, arrays):
+    arrays.pop(step.column)
+
+
+def _fill_nulls(step, arrays):
+    for column in step.columns:
+        mask = pd.isna(arrays[column])
+        if mask.any():
+            arrays[column] = _fill(arrays[column], mask, step.value)
+
+
+def _replace_modalities(step, arrays):
+    values = arrays[step.column].astype(object)
+    codes, uniques = pd.factorize(values)
+    replaced = np.empty(len(uniques), dtype=object)
+    replaced[:] = [step.replacement.get(u, u) for u in uniques]
+
+    missing = codes < 0
+    values[~missing] = replaced.take(codes[~missing])
+    arrays[step.column] = values
+
+
+def _impute_medians(step, arrays):
+    for column, median in step.medians.items():
+        mask = pd.isna(arrays[column])
+        if mask.any():
+            arrays[column] = _fill(arrays[column], mask, median)
+
+
+def _convert_datetimes(step, arrays):
+    for column in step.columns:
+        arrays[column] = step.convert(arrays[column], column)
+
+
+def _compute_duration(step, arrays):
+    duration = step.get_duration(arrays[step.start], arrays[step.end])
+    if duration is not None:
+        arrays[step.column] = duration
+
+
+def _remove_columns(step, arrays):
+    for column in step.columns:
+        del arrays[column]
+
+
+def _scale(step, values):
+    scaler = step.scaler
+    if isinstance(scaler, StandardScaler):
+        if scaler.with_mean:
+            values -= scaler.mean_
+        if scaler.with_std:
+            values /= scaler.scale_
+    elif isinstance(scaler, MinMaxScaler):
+        values *= scaler.scale_
+        values += scaler.min_
+        if getattr(scaler, 'clip', False):
+            np.clip(values, scaler.feature_range[0], scaler.feature_range[1], out=values)
+    else:
+        raise ValueError(f'Unsupported scaler {type(scaler).__name__}')
+
+
+class CompiledPipeline(Transformer):
+    '''Transformer which runs a fitted preprocessing pipeline on numpy arrays
+
+    Steps are split in three stages: column steps working on one array per column,
+    layout steps (Dummifier, ColumnsSorter) resolved once during compilation into
+    the final column order, and matrix steps (Scaler) applied in place on a single
+    preallocated float64 matrix. No intermediate dataframe is built during transform.
+
+    Parameters
+    ----------
+    pipeline : sklearn.pipeline.Pipeline
+        fitted pipeline to compile, steps must be among the ones used in get_pipeline
+    metrics : Metrics or NoneType, optional, default is None
+        metrics where each step of transform is recorded under pipeline.<step name>,
+        layout steps being recorded together with the filling of the matrix,
+        if None nothing is recorded
+
+    Attributes
+    ----------
+    pipeline : sklearn.pipeline.Pipeline
+        fitted pipeline compiled
+    metrics : Metrics or NoneType
+        metrics where each step of transform is recorded
+    columns : pd.Index or NoneType
+        columns of the transformed data in final order,
+        if None the order is the one of the remaining columns after column steps
+    index : str or NoneType
+        column used as index by the pipeline, if None the data index is kept
+
+    '''
+    COLUMN_STEPS = {
+        Indexer: _index,
+        NullValuesFiller: _fill_nulls,
+        ModalitiesReplacement: _replace_modalities,
+        MedianImputer: _impute_medians,
+        DatetimeConverter: _convert_datetimes,
+        DurationTransformer: _compute_duration,
+        ColumnsRemover: _remove_columns,
+    }
+    LAYOUT_STEPS = (Dummifier, ColumnsSorter)
+    MATRIX_STEPS = {
+        Scaler: _scale,
+    }
+
+    def __init__(self, pipeline, metrics=None):
+        self.pipeline = pipeline
+        self.metrics = metrics
+        self.columns = None
+        self.index = None
+
+        self._column_steps, layout_steps, self._matrix_steps = list(), list(), list()
+        layout_names = list()
+        for name, step in pipeline.steps:
+            kind = type(step)
+            if kind in self.COLUMN_STEPS and not (layout_steps or self._matrix_steps):
+                self._column_steps.append((f'pipeline.{name}', self.COLUMN_STEPS[kind], step))
+            elif kind in self.LAYOUT_STEPS and not self._matrix_steps:
+                layout_steps.append(step)
+                layout_names.append(name)
+            elif kind in self.MATRIX_STEPS:
+                self._matrix_steps.append((f'pipeline.{name}', self.MATRIX_STEPS[kind], step))
+            else:
+                raise ValueError(f'Step {name} ({kind.__name__}) cannot be compiled at this position')
+
+            if isinstance(step, Indexer):
+                self.index = step.column
+
+        self._layout_name = 'pipeline.' + '+'.join(layout_names or ['matrix'])
+        self._dummifier = None
+        self._passthrough, self._remap = list(), None
+        if layout_steps:
+            self._compile_layout(layout_steps)
+
+    def _compile_layout(self, steps):
+        '''Resolve layout steps into final positions of passthrough and dummy columns'''
+        first, others = steps[0], steps[1:]
+        if first.columns is None:
+            raise ValueError(f'{type(first).__name__} must be fitted before compilation')
+
+        encoded = set()
+        if isinstance(first, Dummifier):
+            self._dummifier = first
+            encoded = set(p for lookup in first.lookups.values() for p in lookup.values())
+        sources = list(range(len(first.columns)))
+
+        for step in others:
+            if not isinstance(step, ColumnsSorter):
+                raise ValueError(f'{type(step).__name__} cannot follow another layout step')
+            positions = {first.columns[source]: source for source in sources}
+            sources = [positions[column] for column in step.columns]
+
+        self._remap = np.full(len(first.columns) + 1, -1, dtype=np.intp)
+        for position, source in enumerate(sources):
+            if source in encoded:
+                self._remap[source] = position
+            else:
+                self._passthrough.append((position, first.columns[source]))
+        self.columns = first.columns[sources]
+
+    def _fill_matrix(self, arrays, n_rows):
+        '''Get the preallocated float64 matrix filled with arrays in final column order'''
+        if self.columns is None:
+            values = np.empty((n_rows, len(arrays)))
+            for position, column in enumerate(arrays.values()):
+                values[:, position] = column
+            return values
+
+        values = np.zeros((n_rows, len(self.columns)))
+        for position, column in self._passthrough:
+            if column in arrays:
+                values[:, position] = arrays[column]
+            elif self._dummifier is None:
+                raise KeyError(column)
+
+        if self._dummifier is not None:
+            for categorical in self._dummifier.categoricals:
+                positions = self._remap[self._dummifier.get_positions(categorical, arrays[categorical])]
+                rows = np.flatnonzero(positions >= 0)
+                values[rows, positions[rows]] = 1.
+
+        return values
+
+    def transform(self, data):
+        '''Preprocess data the same way the compiled pipeline transform does
+
+        Parameters
+        ----------
+        data : pd.DataFrame or dict
+            data to preprocess, either as dataframe or as mapping
+            from column name to list-like of values
+
+        Returns
+        -------
+        np.ndarray of shape (n_samples, n_features)
+            float64 matrix equal to the values of the pipeline transform
+
+        '''
+        arrays = _get_arrays_from(data)
+        n_rows = len(data) if isinstance(data, pd.DataFrame) else len(next(iter(arrays.values()), ()))
+
+        if self.metrics is not None:
+            return self._measured_transform(arrays, n_rows)
+
+        for _, function, step in self._column_steps:
+            function(step, arrays)
+
+        values = self._fill_matrix(arrays, n_rows)
+        for _, function, step in self._matrix_steps:
+            function(step, values)
+        return values
+
+    def _measured_transform(self, arrays, n_rows):
+        '''Same as transform, recording each step in metrics'''
+        for name, function, step in self._column_steps:
+            start = time.perf_counter()
+            function(step, arrays)
+            self.metrics.observe(name, time.perf_counter() - start, n_rows, n_rows, get_size(arrays))
+
+        start = time.perf_counter()
+        values = self._fill_matrix(arrays, n_rows)
+        self.metrics.observe(self._layout_name, time.perf_counter() - start, n_rows, n_rows, values.nbytes)
+
+        for name, function, step in self._matrix_steps:
+            start = time.perf_counter()
+            function(step, values)
+            self.metrics.observe(name, time.perf_counter() - start, n_rows, n_rows, values.nbytes)
+        return values
+
+    def get_index(self, data):
+        '''Get the index the pipeline transform would set on data
+
+        Parameters
+        ----------
+        data : pd.DataFrame or dict
+            data to preprocess
+
+        Returns
+        -------
+        np.ndarray or pd.Index
+            values of the index column or data index when no Indexer is compiled
+
+        '''
+        if self.index is not None:
+            return np.asarray(data[self.index])
+        if isinstance(data, pd.DataFrame):
+            return data.index
+        return pd.RangeIndex(len(next(iter(data.values()), ())))
@@ -1,15 +1,23 @@
+import numpy as np
 import pandas as pd
 from sklearn.pipeline import Pipeline
 
+from carinsurance.helpers.preprocessing import set_inplace
 from carinsurance.domain.preprocessing.transformers import DurationTransformer, Scaler, MedianImputer
 from carinsurance.infrastructure.preprocessing.transformers import (ColumnsRemover, NullValuesFiller,
     ModalitiesReplacement, DatetimeConverter, Dummifier, Indexer, ColumnsSorter
 )
 
 
-def get_pipeline():
+def get_pipeline(inplace=False):
     '''Get feature processing pipeline for ML tasks
 
+    Parameters
+    ----------
+    inplace : bool, optional, default is False
+        if True, only the first step copies the given data and
+        the next steps work in place on this copy
+
     Returns
     -------
     sklearn.pipeline.Pipeline
@@ -26,11 +34,44 @@ def get_pipeline():
         ('JobAggregator', ModalitiesReplacement(column='Job', replacement=job_replacement)),
         ('EducationEncoding', ModalitiesReplacement(column='Education', replacement=education_replacement)),
         ('EducationImputer', MedianImputer(columns=['Education'])),
-        ('DatetimeConverter', DatetimeConverter(columns=['CallStart', 'CallEnd'])),
+        ('DatetimeConverter', DatetimeConverter(columns=['CallStart', 'CallEnd'], format='%H:%M:%S', representation='seconds')),
         ('CallDuration', DurationTransformer(start='CallStart', end='CallEnd')),
         ('TimeColumnsRemover', ColumnsRemover(columns=['CallStart', 'CallEnd', 'LastContactMonth', 'LastContactDay'])),
         ('Dummifier', Dummifier(categoricals=categorical_features)),
         ('ColumnsSorter', ColumnsSorter()),
         ('StandardScaler', Scaler(name='standard'))
     ])
-    return pipeline
+    return set_inplace(pipeline, inplace=inplace)
+
+
+def get_schema():
+    '''Get input schema expected by the feature processing pipeline
+
+    Returns
+    -------
+    dict
+        expected columns where keys are column names and values are pairs of
+        numpy dtype and a boolean telling whether null values are allowed
+
+    '''
+    schema = {
+        'Id': (np.int64, False),
+        'Age': (np.int64, False),
+        'Job': (object, True),
+        'Marital': (object, False),
+        'Education': (object, True),
+        'Default': (np.int64, False),
+        'Balance': (np.int64, False),
+        'HHInsurance': (np.int64, False),
+        'CarLoan': (np.int64, False),
+        'Communication': (object, True),
+        'LastContactDay': (np.int64, False),
+        'LastContactMonth': (object, False),
+        'NoOfContacts': (np.int64, False),
+        'DaysPassed': (np.int64, False),
+        'PrevAttempts': (np.int64, False),
+        'Outcome': (object, True),
+        'CallStart': (object, False),
+        'CallEnd': (object, False),
+    }
+    return schema
@@ -1,26 +1,33 @@
 '''Transformers using business knowledge'''
 
+import numpy as np
 import pandas as pd
 from sklearn.preprocessing import StandardScaler, MinMaxScaler
 
 from carinsurance.helpers.preprocessing import Transformer
 
 
+SECONDS_PER_DAY = 86400
+NANOSECONDS_PER_SECOND = 10 ** 9
+
+
 class DurationTransformer(Transformer):
     '''Transformer which computes duration between datetime columns
 
     Parameters
     ----------
     start : str
-        start column name
+        start column name, either datetime or seconds since midnight
     end : str
-        end column name
+        end column name, either datetime or seconds since midnight
     column : str, optional, default is "duration"
         column name used for duration
     representation : str, optional, default is "minute"
         representation used for duration, should be either "second", "minute" or "hour"
     rounding : bool, optional, default is True
         if true, rounds up the duration
+    copy : bool, optional, default is True
+        if False, data is changed in place instead of being copied first
 
     Attributes
     ----------
@@ -34,16 +41,58 @@ class DurationTransformer(Transformer):
         representation used for duration, should be either "second", "minute" or "hour"
     rounding : bool, optional, default is True
         if true, rounds up the duration
+    copy : bool
+        if False, data is changed in place instead of being copied first
 
     '''
     REPRESENTATIONS = ('second', 'minute', 'hour')
-    def __init__(self, start, end, column='duration', representation='minute', rounding=True):
+    def __init__(self, start, end, column='duration', representation='minute', rounding=True, copy=True):
         assert representation in self.REPRESENTATIONS
         self.start = start
         self.end = end
         self.column = column
         self.representation = representation
         self.rounding = rounding
+        self.copy = copy
+
+    def get_duration(self, start, end):
+        '''Get duration between start and end values, wrapped around a day like timedelta seconds
+
+        Parameters
+        ----------
+        start : np.ndarray of shape (n_samples,)
+            start values, either datetime64 or seconds since midnight
+        end : np.ndarray of shape (n_samples,)
+            end values, either datetime64 or seconds since midnight
+
+        Returns
+        -------
+        np.ndarray of shape (n_samples,) or NoneType
+            duration in representation unit, None if rounding is False
+
+        '''
+        if np.issubdtype(start.dtype, np.datetime64):
+            delta = end - start
+            missing = np.isnat(delta)
+            seconds = (delta.astype(np.int64) // NANOSECONDS_PER_SECOND) % SECONDS_PER_DAY
+            if missing.any():
+                seconds = seconds.astype(float)
+                seconds[missing] = np.nan
+        else:
+            seconds = np.floor(end - start) % SECONDS_PER_DAY
+
+        if self.representation == 'minute':
+            seconds = seconds / 60
+        elif self.representation == 'hour':
+            seconds = seconds / 3600
+
+        if not self.rounding:
+            return None
+
+        seconds = np.round(seconds)
+        if np.isnan(seconds).any():
+            raise ValueError('Cannot convert non-finite values (NA or inf) to integer')
+        return seconds.astype(int)
 
     def transform(self, data):
         '''Creates duration between start and end
@@ -59,16 +108,11 @@ class DurationTransformer(Transformer):
             data with duration computed
 
         '''
-        data = data.copy()
-        duration = (data[self.end] - data[self.start]).dt.seconds
+        data = self._get_data_from(data)
+        duration = self.get_duration(data[self.start].to_numpy(), data[self.end].to_numpy())
 
-        if self.representation == 'minute':
-            duration /= 60
-        elif self.representation == 'hour':
-            duration /= 3600
-
-        if self.rounding:
-            data[self.column] = duration.round().astype(int)
+        if duration is not None:
+            data[self.column] = duration
 
         return data
 
@@ -80,15 +124,20 @@ class TargetSplitter(Transformer):
     ----------
     column : str
         target column to split
+    copy : bool, optional, default is True
+        if False, data is changed in place instead of being copied first
 
     Attributes
     ----------
     column : str
         target column to split
+    copy : bool
+        if False, data is changed in place instead of being copied first
 
     '''
-    def __init__(self, column):
+    def __init__(self, column, copy=True):
         self.column = column
+        self.copy = copy
 
     def transform(self, data):
         '''Splits target from data
@@ -104,7 +153,7 @@ class TargetSplitter(Transformer):
             pair of dataframe without target and target series
 
         '''
-        data = data.copy()
+        data = self._get_data_from(data)
         target = data.pop(self.column)
         return data, target
 
@@ -116,8 +165,11 @@ class Scaler(Transformer):
     ----------
     name : str, optional, default is "standard"
         scaler name to use for fitting, must be either "standard" or "minmax"
+    copy : bool, optional, default is True
+        if False, data is scaled in place instead of being copied first,
+        forwarded to the copy parameter of the scaler
     **scalerargs
-        keyword arguments for scaler
+        keyword arguments for scaler, except copy
 
     Attributes
     ----------
@@ -125,22 +177,39 @@ class Scaler(Transformer):
         scaler name to use for fitting, must be either "standard" or "minmax"
     scaler : sklearn.preprocessing.StandardScaler or MinMaxScaler
         scaler to use for fitting
+    copy : bool
+        if False, data is scaled in place instead of being copied first
 
     '''
 
     SCALERS = ('standard', 'minmax')
 
-    def __init__(self, name='standard', **scalerargs):
+    def __init__(self, name='standard', copy=True, **scalerargs):
         assert name in self.SCALERS
 
         self.name = name
+        self.copy = copy
         if name == 'standard':
-            self.scaler = StandardScaler(**scalerargs)
+            self.scaler = StandardScaler(copy=copy, **scalerargs)
         elif name == 'minmax':
-            self.scaler = MinMaxScaler(**scalerargs)
+            self.scaler = MinMaxScaler(copy=copy, **scalerargs)
         else:
             raise ValueError(f'name should be in {self.SCALERS}')
 
+    def set_params(self, **params):
+        '''Set parameters of the transformer, copy being forwarded to the scaler
+
+        Returns
+        -------
+        object
+            Scaler instance
+
+        '''
+        super().set_params(**params)
+        if 'copy' in params:
+            self.scaler.set_params(copy=self.copy)
+        return self
+
     def fit(self, data):
         '''Get scaling attributes from data
 
@@ -155,7 +224,6 @@ class Scaler(Transformer):
             Scaler instance fitted
 
         '''
-        data = data.copy()
         self.scaler.fit(data)
         return self
 
@@ -173,8 +241,7 @@ class Scaler(Transformer):
             data scaled with scaler
 
         '''
-        data = data.copy()
-        values = self.scaler.transform(data)
+        values = self.scaler.transform(data) # copied by the scaler unless copy is False
         return pd.DataFrame(values, columns=data.columns, index=data.index)
 
 
@@ -185,6 +252,8 @@ class MedianImputer(Transformer):
     ----------
     columns : list-like of str
         columns for which null values will be imputed by median
+    copy : bool, optional, default is True
+        if False, data is changed in place instead of being copied first
 
     Attributes
     ----------
@@ -193,11 +262,14 @@ class MedianImputer(Transformer):
     medians : dict
         medians found during fitting for imputation where keys are columns 
         and values are medians
+    copy : bool
+        if False, data is changed in place instead of being copied first
 
     '''
-    def __init__(self, columns):
+    def __init__(self, columns, copy=True):
         self.columns = columns
         self.medians = None
+        self.copy = copy
 
     def fit(self, data):
         '''Get medians from data columns
@@ -213,7 +285,7 @@ class MedianImputer(Transformer):
             MedianImputer instance fitted
 
         '''
-        data = data.copy()
+        data = self._get_data_from(data)
         self.medians = {c: data[c].median().astype(int) for c in self.columns}
         return self
 
@@ -231,6 +303,6 @@ class MedianImputer(Transformer):
             data with null values on columns replaced by medians
 
         '''
-        data = data.copy()
+        data = self._get_data_from(data)
         data.fillna(self.medians, inplace=True)
         return data
@@ -1 +1,7 @@
-import carinsurance.helpers.preprocessing as preprocessing
+import carinsurance.helpers.lazy as lazy
+import carinsurance.helpers.metrics as metrics
+import carinsurance.helpers.stages as stages
+
+_LAZY_MODULES = ('preprocessing',) # imports scikit-learn, not needed to run stages
+
+__getattr__ = lazy.get_lazy_getattr(__name__, _LAZY_MODULES)
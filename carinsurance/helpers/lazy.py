@@ -0,0 +1,27 @@
+'''Helper functions for importing submodules of a package only when they are used'''
+
+import importlib
+
+
+def get_lazy_getattr(package, modules):
+    '''Get the module __getattr__ function of a package importing some submodules on first use
+
+    Parameters
+    ----------
+    package : str
+        name of the package (__name__ of its __init__ module)
+    modules : tuple of str
+        names of the submodules imported when first accessed as attributes of the package
+
+    Returns
+    -------
+    callable
+        function to assign to __getattr__ in the __init__ module of the package
+
+    '''
+    def __getattr__(name):
+        if name in modules:
+            return importlib.import_module(f'{package}.{name}')
+        raise AttributeError(f'module {package} has no attribute {name}')
+
+    return __getattr__
@@ -0,0 +1,359 @@
+'''Helper classes and functions for measuring steps with low-overhead histograms'''
+
+import time
+import bisect
+import threading
+
+
+SECONDS_BOUNDS = tuple(2. ** power for power in range(-20, 8)) # from about 1µs to 128s
+ROWS_BOUNDS = tuple(2 ** power for power in range(0, 25)) # from 1 to about 16M rows
+BYTES_BOUNDS = tuple(2 ** power for power in range(6, 37)) # from 64B to 64GB
+
+
+def get_rows(data):
+    '''Get the number of rows of data, without copying it
+
+    Parameters
+    ----------
+    data : pd.DataFrame, np.ndarray, dict, tuple or list
+        data given to or returned by a step, a mapping from column name to
+        array or a tuple of (probabilities, predictions) is counted by its first element
+
+    Returns
+    -------
+    int or NoneType
+        number of rows, None if it cannot be known
+
+    '''
+    if hasattr(data, 'shape'):
+        return data.shape[0] if len(data.shape) else 1
+    if isinstance(data, dict):
+        return get_rows(next(iter(data.values()), ()))
+    if isinstance(data, tuple) and data:
+        return get_rows(data[0])
+    if isinstance(data, list):
+        return len(data)
+    return None
+
+
+def get_size(data):
+    '''Get the number of bytes held by data, without copying it
+    Arrays and series report their exact buffer size; dataframes are estimated from
+    their shape with 8 bytes per item (64 bits numbers or object pointers) since
+    computing their memory usage costs more than most steps
+
+    Parameters
+    ----------
+    data : pd.DataFrame, np.ndarray, dict, tuple or list
+        data returned by a step
+
+    Returns
+    -------
+    int or NoneType
+        number of bytes, None if it cannot be known
+
+    '''
+    if hasattr(data, 'nbytes'):
+        return int(data.nbytes)
+    if hasattr(data, 'shape'):
+        rows, columns = data.shape
+        return 8 * rows * columns
+    if isinstance(data, (dict, tuple)):
+        sizes = [get_size(values) for values in (data.values() if isinstance(data, dict) else data)]
+        return sum(sizes) if sizes and (None not in sizes) else None
+    if isinstance(data, list):
+        return 8 * len(data)
+    return None
+
+
+class Histogram(object):
+    '''Class counting observations in fixed buckets, cheap enough for every request
+
+    Observing a value is a binary search among bounds and a few additions, the
+    memory used does not grow with the number of observations. Quantiles are
+    estimated by the upper bound of the bucket they fall in.
+
+    Parameters
+    ----------
+    bounds : tuple of float
+        sorted upper bounds of buckets, values above the last one go in an overflow bucket
+
+    Attributes
+    ----------
+    bounds : tuple of float
+        sorted upper bounds of buckets
+    counts : list of int
+        number of observations per bucket, the last one being the overflow bucket
+    count : int
+        number of observations
+    total : float
+        sum of observations
+    maximum : float or NoneType
+        greatest observation, None if nothing was observed
+
+    '''
+    def __init__(self, bounds):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.count = 0
+        self.total = 0
+        self.maximum = None
+
+    def observe(self, value):
+        '''Add a value to the histogram
+
+        Parameters
+        ----------
+        value : float
+            observed value
+
+        '''
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.total += value
+        if (self.maximum is None) or (value > self.maximum):
+            self.maximum = value
+
+    def get_quantile(self, q):
+        '''Get an upper estimate of a quantile of observations
+
+        Parameters
+        ----------
+        q : float
+            quantile to estimate, between 0 and 1
+
+        Returns
+        -------
+        float or NoneType
+            upper bound of the bucket of the quantile, capped by the maximum,
+            None if nothing was observed
+
+        '''
+        assert 0 <= q <= 1
+        if self.count == 0:
+            return None
+        rank, seen = q * self.count, 0
+        for position, count in enumerate(self.counts):
+            seen += count
+            if (seen >= rank) and (count > 0):
+                break
+        if position == len(self.bounds):
+            return self.maximum
+        return min(self.bounds[position], self.maximum)
+
+    def get_summary(self):
+        '''Get count, mean, quantiles and maximum of observations
+
+        Returns
+        -------
+        dict
+            keys are count, mean, p50, p90, p99 and max
+
+        '''
+        return {
+            'count': self.count,
+            'mean': self.total / self.count if self.count else None,
+            'p50': self.get_quantile(.5),
+            'p90': self.get_quantile(.9),
+            'p99': self.get_quantile(.99),
+            'max': self.maximum,
+        }
+
+
+class Metrics(object):
+    '''Class recording wall time, rows in, rows out and output bytes of named steps
+
+    Each name gets four histograms. Recording takes a lock so that a single
+    instance can be shared by the threads serving requests; values are kept
+    per process, thus each worker of a server reports its own metrics. Between
+    start_tracking and stop_tracking, wall times recorded by the calling thread
+    are also summed per name, giving the timings of a single request.
+
+    Attributes
+    ----------
+    histograms : dict
+        histograms of seconds, rows_in, rows_out and output_bytes per step name
+
+    '''
+    def __init__(self):
+        self.histograms = dict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def observe(self, name, seconds, rows_in=None, rows_out=None, output_bytes=None):
+        '''Record one call of a step
+
+        Parameters
+        ----------
+        name : str
+            name of the step
+        seconds : float
+            wall time of the call
+        rows_in : int or NoneType, optional, default is None
+            number of rows given to the step, not recorded if None
+        rows_out : int or NoneType, optional, default is None
+            number of rows returned by the step, not recorded if None
+        output_bytes : int or NoneType, optional, default is None
+            number of bytes held by what the step returns (not what it allocates
+            meanwhile), see get_size, not recorded if None
+
+        '''
+        tracked = getattr(self._local, 'seconds', None)
+        if tracked is not None:
+            tracked[name] = tracked.get(name, 0.) + seconds
+
+        with self._lock:
+            histograms = self.histograms.get(name)
+            if histograms is None:
+                histograms = self.histograms[name] = {
+                    'seconds': Histogram(SECONDS_BOUNDS),
+                    'rows_in': Histogram(ROWS_BOUNDS),
+                    'rows_out': Histogram(ROWS_BOUNDS),
+                    'output_bytes': Histogram(BYTES_BOUNDS),
+                }
+            histograms['seconds'].observe(seconds)
+            for key, value in (('rows_in', rows_in), ('rows_out', rows_out), ('output_bytes', output_bytes)):
+                if value is not None:
+                    histograms[key].observe(value)
+
+    def call(self, name, function, data, *args, **kwargs):
+        '''Call function on data and record its wall time, rows in, rows out and output bytes
+
+        Parameters
+        ----------
+        name : str
+            name of the step
+        function : callable
+            function called as function(data, *args, **kwargs)
+        data : pd.DataFrame, np.ndarray, dict, tuple or list
+            data given to the function
+
+        Returns
+        -------
+        object
+            what function returns
+
+        '''
+        rows_in = get_rows(data)
+        start = time.perf_counter()
+        result = function(data, *args, **kwargs)
+        seconds = time.perf_counter() - start
+        self.observe(name, seconds, rows_in=rows_in, rows_out=get_rows(result), output_bytes=get_size(result))
+        return result
+
+    def start_tracking(self):
+        '''Start summing wall times recorded by the calling thread, see stop_tracking'''
+        self._local.seconds = dict()
+
+    def stop_tracking(self):
+        '''Stop summing wall times recorded by the calling thread
+
+        Returns
+        -------
+        dict
+            mapping from step name to seconds recorded since start_tracking,
+            steps run by other threads (e.g. a micro-batcher) are not included
+
+        '''
+        tracked, self._local.seconds = getattr(self._local, 'seconds', None), None
+        return tracked or dict()
+
+    def clear(self):
+        '''Remove every recorded value'''
+        with self._lock:
+            self.histograms.clear()
+
+    def get_summary(self):
+        '''Get the summary of each histogram of each step
+
+        Returns
+        -------
+        dict
+            mapping from step name to a mapping from seconds, rows_in, rows_out
+            and output_bytes to their summary, see Histogram.get_summary
+
+        '''
+        with self._lock:
+            return {name: {key: histogram.get_summary() for key, histogram in histograms.items()}
+                    for name, histograms in self.histograms.items()}
+
+    def format_summary(self):
+        '''Get a readable table of the summary, one line per step
+
+        Returns
+        -------
+        str
+            calls, mean and p99 wall time, mean rows in and out and mean output bytes per step
+
+        '''
+        def mean(summary, scale=1):
+            return '-' if summary['mean'] is None else f'{summary["mean"] * scale:.0f}'
+
+        lines = [f'{"step":<40} {"calls":>7} {"mean ms":>9} {"p99 ms":>9} {"rows in":>9} {"rows out":>9} {"kB out":>9}']
+        for name, summary in self.get_summary().items():
+            seconds = summary['seconds']
+            lines.append(f'{name:<40} {seconds["count"]:>7} {seconds["mean"] * 1e3:>9.3f} {seconds["p99"] * 1e3:>9.3f} '
+                         f'{mean(summary["rows_in"]):>9} {mean(summary["rows_out"]):>9} {mean(summary["output_bytes"], 1e-3):>9}')
+        return '\n'.join(lines)
+
+
+class MeasuredStep(object):
+    '''Class wrapping a pipeline step so that its fit and transform calls are recorded
+
+    Parameters
+    ----------
+    name : str
+        name under which the step is recorded
+    step : sklearn transformer
+        step to wrap, fitted in place by fit
+    metrics : Metrics
+        metrics where calls are recorded
+
+    Attributes
+    ----------
+    name, step, metrics
+        see parameters
+
+    '''
+    def __init__(self, name, step, metrics):
+        self.name = name
+        self.step = step
+        self.metrics = metrics
+
+    def fit(self, data, y=None, **fitargs):
+        '''Fit the wrapped step, recorded as <name>.fit'''
+        args = () if y is None else (y,) # steps of this repository only take data
+        self.metrics.call(f'{self.name}.fit', self.step.fit, data, *args, **fitargs)
+        return self
+
+    def transform(self, data):
+        '''Transform data with the wrapped step, recorded as <name>'''
+        return self.metrics.call(self.name, self.step.transform, data)
+
+    def fit_transform(self, data, y=None, **fitargs):
+        '''Fit the wrapped step then transform data'''
+        return self.fit(data, y, **fitargs).transform(data)
+
+
+def measure_pipeline(pipeline, metrics, prefix='pipeline'):
+    '''Get a pipeline calling the same steps, recording each of them in metrics
+    Steps are shared and not copied: fitting the measured pipeline fits the given one,
+    which is the one to save (the measured pipeline holds the metrics)
+
+    Parameters
+    ----------
+    pipeline : sklearn.pipeline.Pipeline
+        pipeline whose named steps are measured
+    metrics : Metrics
+        metrics where calls are recorded
+    prefix : str, optional, default is "pipeline"
+        prefix of the recorded names, followed by a dot and the step name
+
+    Returns
+    -------
+    sklearn.pipeline.Pipeline
+        pipeline of MeasuredStep
+
+    '''
+    from sklearn.pipeline import Pipeline # imported here so that metrics stay cheap to import
+    return Pipeline([(name, MeasuredStep(f'{prefix}.{name}', step, metrics)) for name, step in pipeline.steps])
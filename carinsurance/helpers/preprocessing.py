@@ -4,7 +4,48 @@ from sklearn.base import BaseEstimator, TransformerMixin
 
 
 class Transformer(BaseEstimator, TransformerMixin):
-    '''Base class for transformers used in pipeline (add a default fit function)'''
+    '''Base class for transformers used in pipeline (add a default fit function)
+
+    Attributes added after artifacts were pickled are missing once they are loaded,
+    thus unpickling sets the ones of DEFAULTS to the value reproducing former behavior
+    '''
+    DEFAULTS = {'copy': True}
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        for name, value in self.DEFAULTS.items():
+            self.__dict__.setdefault(name, value)
+
     def fit(self, data, **fitargs):
         '''Method used for compatibility with sklearn.pipeline.Pipeline'''
         return self
+
+    def _get_data_from(self, data):
+        '''Get data to work on, copied unless copy attribute was set to False'''
+        if getattr(self, 'copy', True):
+            return data.copy()
+        return data
+
+
+def set_inplace(pipeline, inplace=True):
+    '''Set the ownership mode of a pipeline made of Transformer steps
+
+    In place mode, the first step copies the caller data once and the next steps
+    change this owned copy in place instead of copying it again.
+
+    Parameters
+    ----------
+    pipeline : sklearn.pipeline.Pipeline
+        pipeline for which ownership mode must be set
+    inplace : bool, optional, default is True
+        if False, every step copies its data before changing it (default mode)
+
+    Returns
+    -------
+    sklearn.pipeline.Pipeline
+        pipeline with copy parameter set on every step
+
+    '''
+    for position, (_, step) in enumerate(pipeline.steps):
+        step.set_params(copy=(position == 0) or not inplace)
+    return pipeline
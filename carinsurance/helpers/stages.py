@@ -0,0 +1,218 @@
+'''Helper classes and functions for running stages only when their inputs changed'''
+
+import os
+import json
+import hashlib
+import logging
+import importlib.util
+
+
+def get_source_path(module):
+    '''Get the path of the source file of a module without importing it (nor its packages)
+
+    Parameters
+    ----------
+    module : str
+        dotted name of the module
+
+    Returns
+    -------
+    str
+        path of the module file, or of the package __init__ file
+
+    '''
+    package, *parts = module.split('.')
+    path = os.path.join(importlib.util.find_spec(package).submodule_search_locations[0], *parts)
+    return f'{path}.py' if os.path.exists(f'{path}.py') else os.path.join(path, '__init__.py')
+
+
+class Stage(object):
+    '''Class describing a step of a workflow by what it depends on and what it produces
+
+    The fingerprint of a stage is a hash of its parameters, of the content of its
+    input files and of the source code of the modules defining it. A stage is up to
+    date when its fingerprint did not change since it last ran and its outputs were
+    not changed since then. A stage without inputs is a source (such as a download),
+    it is up to date as soon as its outputs exist.
+
+    Parameters
+    ----------
+    name : str
+        name of the stage
+    run : callable
+        function called without arguments to run the stage
+    inputs : list of str, optional, default is ()
+        paths of files read by the stage, usually outputs of previous stages
+    outputs : list of str, optional, default is ()
+        paths of files written by the stage
+    parameters : dict or NoneType, optional, default is None
+        JSON-serializable values changing the result of the stage (model arguments, seeds...)
+    modules : list of str, optional, default is ()
+        names of modules whose source code defines the stage, they are not imported
+
+    Attributes
+    ----------
+    name, run, inputs, outputs, parameters, modules
+        see parameters
+
+    '''
+    def __init__(self, name, run, inputs=(), outputs=(), parameters=None, modules=()):
+        self.name = name
+        self.run = run
+        self.inputs = list(inputs)
+        self.outputs = list(outputs)
+        self.parameters = parameters or dict()
+        self.modules = list(modules)
+
+
+class StageRunner(object):
+    '''Class running stages in order, skipping the ones which are up to date
+
+    Fingerprints are kept in a JSON manifest, along with a cache of file hashes keyed
+    on file size and modification time so that unchanged files are not hashed again.
+
+    Parameters
+    ----------
+    manifest_path : str
+        path of the JSON manifest storing fingerprints of stages
+    logger : logging.Logger or NoneType, optional, default is None
+        logger used to log message, if None use default logging logger
+
+    Attributes
+    ----------
+    manifest_path : str
+        path of the JSON manifest storing fingerprints of stages
+    logger : logging.Logger
+        logger used to log message
+    manifest : dict
+        fingerprints of stages and cache of file hashes
+
+    '''
+    def __init__(self, manifest_path, logger=None):
+        self.manifest_path = manifest_path
+        self.logger = logger or logging.getLogger()
+        self.manifest = {'stages': dict(), 'files': dict()}
+        if os.path.exists(manifest_path):
+            with open(manifest_path, 'r') as f:
+                self.manifest = json.load(f)
+
+    def _save(self):
+        temporary = f'{self.manifest_path}.tmp'
+        with open(temporary, 'w') as f:
+            json.dump(self.manifest, f, indent=4, sort_keys=True)
+        os.replace(temporary, self.manifest_path)
+
+    def get_file_hash(self, path):
+        '''Get the hash of the content of a file, cached on its size and modification time
+
+        Parameters
+        ----------
+        path : str
+            path of the file
+
+        Returns
+        -------
+        str or NoneType
+            hexadecimal digest of the file, None if the file does not exist
+
+        '''
+        if not os.path.exists(path):
+            return None
+        stat = os.stat(path)
+        key = [stat.st_size, stat.st_mtime_ns]
+        cached = self.manifest['files'].get(path)
+        if (cached is not None) and (cached[:2] == key):
+            return cached[2]
+
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        self.manifest['files'][path] = key + [digest.hexdigest()]
+        return digest.hexdigest()
+
+    def get_fingerprint(self, stage):
+        '''Get the fingerprint of the parameters, inputs and code of a stage
+
+        Parameters
+        ----------
+        stage : Stage
+            stage to fingerprint
+
+        Returns
+        -------
+        str
+            hexadecimal digest of the stage
+
+        '''
+        sources = [self.get_file_hash(get_source_path(module)) for module in stage.modules]
+        description = {
+            'name': stage.name,
+            'parameters': stage.parameters,
+            'inputs': {path: self.get_file_hash(path) for path in stage.inputs},
+            'modules': dict(zip(stage.modules, sources)),
+        }
+        return hashlib.blake2b(json.dumps(description, sort_keys=True, default=repr).encode('utf-8'),
+                               digest_size=16).hexdigest()
+
+    def is_up_to_date(self, stage):
+        '''Check if a stage does not need to run again
+
+        Parameters
+        ----------
+        stage : Stage
+            stage to check
+
+        Returns
+        -------
+        bool
+            True if inputs, parameters and code did not change and outputs are untouched
+
+        '''
+        if not stage.inputs:
+            return all(os.path.exists(path) for path in stage.outputs)
+
+        record = self.manifest['stages'].get(stage.name)
+        if (record is None) or (record['fingerprint'] != self.get_fingerprint(stage)):
+            return False
+        return all(self.get_file_hash(path) == record['outputs'].get(path) for path in stage.outputs)
+
+    def run(self, stages, force=()):
+        '''Run stages in order, skipping those which are up to date
+
+        Since outputs of a stage are inputs of the next ones, a stage which runs again
+        makes the next ones run again only if its outputs changed.
+
+        Parameters
+        ----------
+        stages : list of Stage
+            stages to run, in dependency order
+        force : list of str, optional, default is ()
+            names of stages to run even if they are up to date
+
+        Returns
+        -------
+        list of str
+            names of stages which ran
+
+        '''
+        ran = list()
+        for stage in stages:
+            if (stage.name not in force) and self.is_up_to_date(stage):
+                self.logger.info(f'Stage {stage.name} is up to date, skipping it...')
+                continue
+
+            self.logger.info(f'Running stage {stage.name}...')
+            fingerprint = self.get_fingerprint(stage)
+            stage.run()
+            missing = [path for path in stage.outputs if not os.path.exists(path)]
+            if missing:
+                raise ValueError(f'Stage {stage.name} did not write {missing}')
+
+            self.manifest['stages'][stage.name] = {
+                'fingerprint': fingerprint,
+                'outputs': {path: self.get_file_hash(path) for path in stage.outputs},
+            }
+            self._save()
+            ran.append(stage.name)
+        return ran
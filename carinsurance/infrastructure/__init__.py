@@ -1,2 +1,9 @@
+from carinsurance.helpers.lazy import get_lazy_getattr
+
 import carinsurance.infrastructure.preprocessing as preprocessing
-import carinsurance.infrastructure.dataset as dataset
+import carinsurance.infrastructure.artifacts as artifacts
+import carinsurance.infrastructure.synthetic as synthetic
+
+_LAZY_MODULES = ('dataset',) # imports the Kaggle client, only needed to download datasets
+
+__getattr__ = get_lazy_getattr(__name__, _LAZY_MODULES)
@@ -0,0 +1,340 @@
+'''Compact artifact format storing numeric arrays in flat memory-mappable buffers
+
+An artifact is a single file made of a magic string, a JSON header and a data section.
+Python objects are pickled without their numeric numpy arrays, which are written
+as raw aligned buffers in the data section instead. When loading, these buffers are
+memory-mapped read-only: arrays held as numpy arrays (frames, TreeEnsemble, compiled
+pipelines) are neither read nor copied when loading, and several processes reading
+the same artifact share their memory pages. Objects rebuilding their own arrays when
+unpickled do not benefit from it, e.g. scikit-learn trees copy their nodes into
+private memory, so only their pickling is faster.
+'''
+
+import io
+import os
+import ast
+import json
+import mmap
+import pickle
+import struct
+import hashlib
+
+import numpy as np
+import pandas as pd
+
+
+MAGIC = b'CIART\x00\x01\x00'
+ALIGNMENT = 64
+
+
+def _align(position):
+    return (position + ALIGNMENT - 1) // ALIGNMENT * ALIGNMENT
+
+
+class _ArrayPickler(pickle.Pickler):
+    '''Pickler which keeps numeric numpy arrays aside instead of pickling them'''
+    def __init__(self, file, arrays):
+        super().__init__(file, protocol=pickle.HIGHEST_PROTOCOL)
+        self.arrays = arrays
+        self._positions = dict()
+
+    def persistent_id(self, obj):
+        if isinstance(obj, np.ndarray) and not obj.dtype.hasobject:
+            key = id(obj)
+            if key not in self._positions:
+                self._positions[key] = len(self.arrays)
+                self.arrays.append(obj)
+            return ('ndarray', self._positions[key])
+        return None
+
+
+class _ArrayUnpickler(pickle.Unpickler):
+    '''Unpickler which gets back numpy arrays kept aside from the data section'''
+    def __init__(self, file, arrays):
+        super().__init__(file)
+        self.arrays = arrays
+
+    def persistent_load(self, pid):
+        kind, position = pid
+        if kind != 'ndarray':
+            raise pickle.UnpicklingError(f'Unsupported persistent id {kind}')
+        return self.arrays[position]
+
+
+def is_artifact(path):
+    '''Check if a file is an artifact
+
+    Parameters
+    ----------
+    path : str
+        path of the file to check
+
+    Returns
+    -------
+    bool
+        True if the file starts with the artifact magic string
+
+    '''
+    with open(path, 'rb') as f:
+        return f.read(len(MAGIC)) == MAGIC
+
+
+def save_artifact(obj, path, metadata=None):
+    '''Save a python object into an artifact file
+
+    The file is written next to path then renamed, so that readers (including
+    processes memory-mapping the previous artifact) never see a partial file.
+
+    Parameters
+    ----------
+    obj : any
+        picklable object to save, its numeric numpy arrays are stored as flat buffers
+    path : str
+        path of the artifact file
+    metadata : dict or NoneType, optional, default is None
+        JSON-serializable information stored in the header
+
+    '''
+    arrays = list()
+    payload = io.BytesIO()
+    _ArrayPickler(payload, arrays).dump(obj)
+    payload = payload.getvalue()
+
+    entries, position = list(), _align(len(payload))
+    arrays = [np.ascontiguousarray(array) for array in arrays]
+    for array in arrays:
+        entries.append({
+            'descr': repr(np.lib.format.dtype_to_descr(array.dtype)),
+            'shape': list(array.shape),
+            'offset': position,
+        })
+        position = _align(position + array.nbytes)
+
+    header = json.dumps({
+        'metadata': metadata or dict(),
+        'pickle': [0, len(payload)],
+        'arrays': entries,
+    }).encode('utf-8')
+    start = _align(len(MAGIC) + 8 + len(header))
+
+    temporary = f'{path}.{os.getpid()}.tmp' # processes saving the same path never share a file
+    with open(temporary, 'wb') as f:
+        f.write(MAGIC)
+        f.write(struct.pack('<Q', len(header)))
+        f.write(header)
+        f.write(b'\x00' * (start - f.tell()))
+        f.write(payload)
+        for entry, array in zip(entries, arrays):
+            f.write(b'\x00' * (start + entry['offset'] - f.tell()))
+            f.write(array.tobytes())
+    os.replace(temporary, path)
+
+
+def _read_header(f):
+    if f.read(len(MAGIC)) != MAGIC:
+        raise ValueError(f'{f.name} is not an artifact file')
+    length, = struct.unpack('<Q', f.read(8))
+    header = json.loads(f.read(length).decode('utf-8'))
+    return header, _align(len(MAGIC) + 8 + length)
+
+
+def load_metadata(path):
+    '''Load the metadata stored in an artifact header without loading the object
+
+    Parameters
+    ----------
+    path : str
+        path of the artifact file
+
+    Returns
+    -------
+    dict
+        metadata given when saving the artifact
+
+    '''
+    with open(path, 'rb') as f:
+        header, _ = _read_header(f)
+    return header['metadata']
+
+
+def get_fingerprint(*paths):
+    '''Get a fingerprint of the content of files, used as a version of artifacts
+
+    Parameters
+    ----------
+    *paths : str
+        paths of the files to fingerprint
+
+    Returns
+    -------
+    str
+        hexadecimal digest changing whenever the content of any file changes
+
+    '''
+    digest = hashlib.blake2b(digest_size=16)
+    for path in paths:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def load_artifact(path, mmap_mode=True):
+    '''Load a python object from an artifact file
+
+    Parameters
+    ----------
+    path : str
+        path of the artifact file
+    mmap_mode : bool, optional, default is True
+        if True, arrays are read-only views on the memory-mapped file,
+        otherwise the file is read in memory and arrays are writable
+
+    Returns
+    -------
+    any
+        object saved in the artifact
+
+    Raises
+    ------
+    ValueError
+        arises when the file is not an artifact
+
+    '''
+    with open(path, 'rb') as f:
+        header, start = _read_header(f)
+        if mmap_mode:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        else:
+            f.seek(0)
+            buffer = bytearray(f.read())
+
+    arrays = list()
+    for entry in header['arrays']:
+        dtype = np.lib.format.descr_to_dtype(ast.literal_eval(entry['descr']))
+        shape = tuple(entry['shape'])
+        if int(np.prod(shape)) * dtype.itemsize == 0:
+            arrays.append(np.empty(shape, dtype=dtype))
+        else:
+            arrays.append(np.ndarray(shape, dtype=dtype, buffer=buffer, offset=start + entry['offset']))
+
+    offset, length = header['pickle']
+    payload = memoryview(buffer)[start + offset:start + offset + length]
+    return _ArrayUnpickler(io.BytesIO(payload), arrays).load()
+
+
+def save_frame(frame, path):
+    '''Save a dataframe with numeric columns into an artifact file
+    Columns sharing a dtype are stored together as a column-major matrix, so that each
+    column is a contiguous buffer and the dataframe can be mapped back without copy
+
+    Parameters
+    ----------
+    frame : pd.DataFrame or pd.Series
+        data to save, with numeric or boolean columns and index
+    path : str
+        path of the artifact file
+
+    Raises
+    ------
+    ValueError
+        arises when a column or the index is not numeric
+
+    '''
+    if isinstance(frame, pd.Series):
+        frame = frame.to_frame()
+    dtypes = [frame[column].dtype for column in frame.columns] if frame.columns.is_unique else list(frame.dtypes)
+    if any(dtype.kind not in 'biuf' for dtype in dtypes) or (frame.index.dtype.kind not in 'biuf'):
+        raise ValueError('Only numeric columns and index can be saved as frames')
+
+    blocks = dict()
+    for position, dtype in enumerate(dtypes):
+        blocks.setdefault(dtype.str, list()).append(position)
+
+    data = {
+        'index': np.asarray(frame.index),
+        'blocks': [np.asfortranarray(frame.iloc[:, positions].values) for positions in blocks.values()],
+    }
+    schema = {
+        'columns': [str(column) for column in frame.columns],
+        'dtypes': [dtype.str for dtype in dtypes],
+        'index': frame.index.name,
+        'blocks': list(blocks.values()),
+    }
+    save_artifact(data, path, metadata={'frame': schema})
+
+
+def load_frame(path, mmap_mode=True):
+    '''Load a dataframe saved with save_frame without parsing it
+
+    Parameters
+    ----------
+    path : str
+        path of the artifact file
+    mmap_mode : bool, optional, default is True
+        if True, columns are read-only views on the memory-mapped file, see load_artifact
+
+    Returns
+    -------
+    pd.DataFrame
+        saved dataframe, with its index and dtypes
+
+    '''
+    schema = load_metadata(path)['frame']
+    data = load_artifact(path, mmap_mode=mmap_mode)
+    index = pd.Index(data['index'], name=schema['index'])
+
+    columns = schema['columns']
+    frames = list()
+    for positions, block in zip(schema['blocks'], data['blocks']):
+        frames.append(pd.DataFrame(block, index=index, columns=[columns[p] for p in positions], copy=False))
+
+    if len(frames) == 1:
+        return frames[0]
+    frame = pd.concat(frames, axis=1, copy=False)
+    return frame if list(frame.columns) == columns else frame[columns]
+
+
+def load_object(path, mmap_mode=True):
+    '''Load a python object from an artifact file or from a pickle saved by former versions
+
+    Parameters
+    ----------
+    path : str
+        path of the artifact or pickle file
+    mmap_mode : bool, optional, default is True
+        see load_artifact, only used for artifacts
+
+    Returns
+    -------
+    any
+        object saved in the file
+
+    '''
+    if is_artifact(path):
+        return load_artifact(path, mmap_mode=mmap_mode)
+    with open(path, 'rb') as f:
+        return pickle.load(f)
+
+
+def get_artifact_path(directory, name):
+    '''Get the path of an artifact of a directory, or of the pickle former versions saved instead
+
+    Parameters
+    ----------
+    directory : str
+        directory of the artifact
+    name : str
+        name of the artifact without extension (e.g. "model")
+
+    Returns
+    -------
+    str
+        path of name.artifact, or of name.pkl when only the latter exists
+
+    '''
+    path = os.path.join(directory, f'{name}.artifact')
+    former = os.path.join(directory, f'{name}.pkl')
+    if (not os.path.exists(path)) and os.path.exists(former):
+        return former
+    return path
@@ -1,5 +1,8 @@
 '''Transformers with no business knowledge'''
 
+from datetime import datetime
+
+import numpy as np
 import pandas as pd
 
 from carinsurance.helpers.preprocessing import Transformer
@@ -12,15 +15,20 @@ class Indexer(Transformer):
     ----------
     column : str
         column to transform as index
+    copy : bool, optional, default is True
+        if False, data is changed in place instead of being copied first
 
     Attributes
     ----------
     column : str
         column to transform as index
+    copy : bool
+        if False, data is changed in place instead of being copied first
 
     '''
-    def __init__(self, column):
+    def __init__(self, column, copy=True):
         self.column = column
+        self.copy = copy
 
     def transform(self, data):
         '''Use the column set during initialization as index for given data
@@ -36,7 +44,7 @@ class Indexer(Transformer):
             data with column set as index
 
         '''
-        data = data.copy()
+        data = self._get_data_from(data)
         data.set_index(self.column, inplace=True)
         return data
 
@@ -48,15 +56,125 @@ class DatetimeConverter(Transformer):
     ----------
     columns : list-like
         columns to convert into datetime
+    format : str or NoneType, optional, default is None
+        strftime format of the columns, if None the format is detected during fitting
+        among FORMATS and inferred by pandas on every call when detection fails
+    representation : str, optional, default is "datetime"
+        representation used for converted columns, should be either "datetime"
+        or "seconds" (seconds since midnight)
+    copy : bool, optional, default is True
+        if False, data is changed in place instead of being copied first
 
     Attributes
     ----------
     columns : list-like
         columns to convert into datetime
+    format : str or NoneType
+        strftime format of the columns declared during initialization
+    representation : str
+        representation used for converted columns, should be either "datetime" or "seconds"
+    formats : dict or NoneType
+        formats used for conversion where keys are columns and values are formats,
+        declared or detected during fitting
+    copy : bool
+        if False, data is changed in place instead of being copied first
 
     '''
-    def __init__(self, columns):
+    FORMATS = ('%H:%M:%S', '%H:%M', '%Y-%m-%d %H:%M:%S', '%Y-%m-%d')
+    REPRESENTATIONS = ('datetime', 'seconds')
+    SAMPLE_SIZE = 100
+    DEFAULTS = {'copy': True, 'format': None, 'representation': 'datetime', 'formats': None} # pandas inference
+
+    def __init__(self, columns, format=None, representation='datetime', copy=True):
+        assert representation in self.REPRESENTATIONS
         self.columns = columns
+        self.format = format
+        self.representation = representation
+        self.formats = None
+        self.copy = copy
+
+    @classmethod
+    def _detect_format(cls, values):
+        '''Get the first format of FORMATS matching a sample of values, None if none matches'''
+        sample = [v for v in values[:cls.SAMPLE_SIZE] if isinstance(v, str)]
+        for fmt in cls.FORMATS:
+            try:
+                for value in sample:
+                    datetime.strptime(value, fmt)
+            except ValueError:
+                continue
+            if sample:
+                return fmt
+        return None
+
+    @staticmethod
+    def _parse_clock(values):
+        '''Get seconds since midnight from "HH:MM:SS" strings, None if any value does not match'''
+        try:
+            raw = np.asarray(values, dtype='S')
+        except (UnicodeEncodeError, ValueError, TypeError):
+            return None
+        if (raw.ndim != 1) or (raw.dtype.itemsize != 8):
+            return None
+
+        digits = raw.view(np.uint8).reshape(-1, 8).astype(np.int64) - ord('0')
+        numbers = digits[:, [0, 1, 3, 4, 6, 7]]
+        if not ((digits[:, [2, 5]] == ord(':') - ord('0')).all() and (numbers >= 0).all() and (numbers <= 9).all()):
+            return None
+
+        hours, minutes, seconds = (numbers[:, 0] * 10 + numbers[:, 1], numbers[:, 2] * 10 + numbers[:, 3],
+                                   numbers[:, 4] * 10 + numbers[:, 5])
+        if (hours > 23).any() or (minutes > 59).any() or (seconds > 59).any():
+            return None
+        return hours * 3600 + minutes * 60 + seconds
+
+    def fit(self, data):
+        '''Get formats of columns, declared during initialization or detected from data
+
+        Parameters
+        ----------
+        data : pd.DataFrame
+            data with columns to convert as datetime format
+
+        Returns
+        -------
+        object
+            DatetimeConverter instance fitted
+
+        '''
+        self.formats = {c: self.format or self._detect_format(data[c].dropna().to_numpy()) for c in self.columns}
+        return self
+
+    def convert(self, values, column=None):
+        '''Convert values of a column using the format found for this column
+
+        Parameters
+        ----------
+        values : array-like of shape (n_samples,)
+            datetime-like values encoded as string
+        column : str or NoneType, optional, default is None
+            column from which values come, used to get the format found during fitting
+
+        Returns
+        -------
+        np.ndarray of shape (n_samples,)
+            datetime64 values or seconds since midnight depending on representation
+
+        '''
+        fmt = self.format if self.formats is None else self.formats.get(column, self.format)
+        if (self.representation == 'seconds') and (fmt == '%H:%M:%S'):
+            seconds = self._parse_clock(values)
+            if seconds is not None:
+                return seconds
+
+        datetimes = pd.DatetimeIndex(pd.to_datetime(np.asarray(values), format=fmt))
+        if self.representation == 'datetime':
+            return datetimes.to_numpy()
+
+        seconds = (datetimes - datetimes.normalize()).total_seconds().to_numpy()
+        if not np.isnan(seconds).any():
+            seconds = seconds.astype(np.int64)
+        return seconds
 
     def transform(self, data):
         '''Convert the columns set during initialization as datetime format for given data
@@ -72,9 +190,9 @@ class DatetimeConverter(Transformer):
             data with columns converted to datetime format
 
         '''
-        data = data.copy()
+        data = self._get_data_from(data)
         for column in self.columns:
-            data[column] = pd.to_datetime(data[column])
+            data[column] = self.convert(data[column].to_numpy(), column)
         return data
 
 
@@ -88,6 +206,8 @@ class ModalitiesReplacement(Transformer):
     replacement : dict, optional, default is dict()
         replacement pattern where keys are original modalities and
         value is replacement
+    copy : bool, optional, default is True
+        if False, data is changed in place instead of being copied first
 
     Attributes
     ----------
@@ -96,11 +216,14 @@ class ModalitiesReplacement(Transformer):
     replacement : dict
         replacement pattern where keys are original modalities and
         value is replacement
+    copy : bool
+        if False, data is changed in place instead of being copied first
 
     '''
-    def __init__(self, column, replacement=dict()):
+    def __init__(self, column, replacement=dict(), copy=True):
         self.column = column
         self.replacement = replacement
+        self.copy = copy
 
     def transform(self, data):
         '''Replace modalities present in data column with replacement set during initialization
@@ -116,7 +239,7 @@ class ModalitiesReplacement(Transformer):
             data with modalities replaced
 
         '''
-        data = data.copy()
+        data = self._get_data_from(data)
         data[self.column] = data[self.column].astype(object)
         data[self.column].replace(to_replace=self.replacement, inplace=True)
         return data
@@ -129,6 +252,8 @@ class Dummifier(Transformer):
     ----------
     categoricals : list-like of str
         categorical columns to dummify
+    copy : bool, optional, default is True
+        if False, data is changed in place instead of being copied first
 
     Attributes
     ----------
@@ -136,11 +261,18 @@ class Dummifier(Transformer):
         categorical columns to dummify
     columns :  pd.Index
         columns present after dummification fitting
+    lookups : dict
+        positions in columns found during fitting where keys are categorical columns
+        and values are dict mapping each kept modality to its output column position
+    copy : bool
+        if False, data is changed in place instead of being copied first
 
     '''
-    def __init__(self, categoricals):
+    def __init__(self, categoricals, copy=True):
         self.categoricals = categoricals
         self.columns = None
+        self.lookups = None
+        self.copy = copy
 
     def fit(self, data, drop_last=True):
         '''Get dummies columns present
@@ -166,8 +298,45 @@ class Dummifier(Transformer):
                 dummies.drop(f'{c}_{last}', axis=1, inplace=True)
 
         self.columns = dummies.columns
+
+        positions = {column: position for position, column in enumerate(self.columns)}
+        self.lookups = dict()
+        for c in self.categoricals:
+            modalities = data[c].dropna().unique()
+            self.lookups[c] = {m: positions[f'{c}_{m}'] for m in modalities if f'{c}_{m}' in positions}
         return self
 
+    def __setstate__(self, state):
+        '''Rebuild lookups from columns names for Dummifier pickled before lookups existed'''
+        super().__setstate__(state)
+        if (self.__dict__.get('lookups') is None) and (self.columns is not None):
+            self.lookups = dict()
+            for c in self.categoricals:
+                prefix = f'{c}_'
+                self.lookups[c] = {column[len(prefix):]: position for position, column in enumerate(self.columns)
+                                   if column.startswith(prefix)}
+
+    def get_positions(self, categorical, values):
+        '''Get output column positions of categorical values based on lookups found during fitting
+
+        Parameters
+        ----------
+        categorical : str
+            categorical column from which values come
+        values : array-like of shape (n_samples,)
+            modalities to look up
+
+        Returns
+        -------
+        np.ndarray of shape (n_samples,)
+            output column position of each value, -1 for null, unseen or dropped modalities
+
+        '''
+        codes, uniques = pd.factorize(values)
+        lookup = self.lookups[categorical]
+        positions = np.array([lookup.get(u, -1) for u in uniques] + [-1], dtype=np.intp)
+        return positions[codes]
+
     def transform(self, data):
         '''Dummify data based on modalities seen during fit
 
@@ -182,9 +351,22 @@ class Dummifier(Transformer):
             data dummified based on modalities seen during fitting
 
         '''
-        data = data.copy()
-        frame = pd.get_dummies(data, columns=self.categoricals)
-        return frame.reindex(columns=self.columns, fill_value=0)
+        dummies = np.zeros((len(data), len(self.columns)), dtype=np.uint8)
+        for c in self.categoricals:
+            positions = self.get_positions(c, data[c])
+            rows = np.flatnonzero(positions >= 0)
+            dummies[rows, positions[rows]] = 1
+
+        encoded = set(p for lookup in self.lookups.values() for p in lookup.values())
+        columns = dict()
+        for position, column in enumerate(self.columns):
+            if (column in data.columns) and (column not in self.categoricals):
+                columns[column] = data[column].to_numpy()
+            elif position in encoded:
+                columns[column] = dummies[:, position]
+            else:
+                columns[column] = np.zeros(len(data), dtype=int)
+        return pd.DataFrame(columns, index=data.index)
 
 
 class NullValuesFiller(Transformer):
@@ -196,6 +378,8 @@ class NullValuesFiller(Transformer):
         columns on which null values will be replaced
     value : any, optional, default is 0
         value used in place of null values
+    copy : bool, optional, default is True
+        if False, data is changed in place instead of being copied first
 
     Attributes
     ----------
@@ -203,11 +387,14 @@ class NullValuesFiller(Transformer):
         columns on which null values will be replaced
     value : any
         value used in place of null values
+    copy : bool
+        if False, data is changed in place instead of being copied first
 
     '''
-    def __init__(self, columns, value=0):
+    def __init__(self, columns, value=0, copy=True):
         self.columns = columns
         self.value = value
+        self.copy = copy
 
     def transform(self, data):
         '''Fill null values with value set during initialization
@@ -223,7 +410,7 @@ class NullValuesFiller(Transformer):
             data with null values in columns replaced by value
 
         '''
-        data = data.copy()
+        data = self._get_data_from(data)
         for column in self.columns:
             data[column].fillna(self.value, inplace=True)
         return data
@@ -236,15 +423,20 @@ class ColumnsRemover(Transformer):
     ----------
     columns : list-like of str
         columns to remove
+    copy : bool, optional, default is True
+        if False, data is changed in place instead of being copied first
 
     Attributes
     ----------
     columns : list-like of str
         columns to remove
+    copy : bool
+        if False, data is changed in place instead of being copied first
 
     '''
-    def __init__(self, columns):
+    def __init__(self, columns, copy=True):
         self.columns = columns
+        self.copy = copy
 
     def transform(self, data):
         '''Remove columns in data
@@ -257,24 +449,34 @@ class ColumnsRemover(Transformer):
         Returns
         -------
         pd.DataFrame
-            data with columns dropped
+            data with columns dropped, the given dataframe itself if copy is False
 
         '''
-        data = data.copy()
-        return data.drop(self.columns, axis=1)
+        if self.copy: # drop already returns a new dataframe, no copy is needed first
+            return data.drop(self.columns, axis=1)
+        data.drop(columns=self.columns, inplace=True)
+        return data
 
 
 class ColumnsSorter(Transformer):
     '''Transformer which sorts columns
 
+    Parameters
+    ----------
+    copy : bool, optional, default is True
+        if False, data is changed in place instead of being copied first
+
     Attributes
     ----------
     columns : list-like of str
         columns sorted during fitting
+    copy : bool
+        if False, data is changed in place instead of being copied first
 
     '''
-    def __init__(self):
+    def __init__(self, copy=True):
         self.columns = None
+        self.copy = copy
 
     def fit(self, data):
         '''Get columns order from data
@@ -295,6 +497,8 @@ class ColumnsSorter(Transformer):
 
     def transform(self, data):
         '''Sort data based on columns order during fitting
+        Selecting columns always builds a new dataframe with pandas, thus data is
+        copied exactly once whatever copy is, and never changed in place
 
         Parameters
         ----------
@@ -307,5 +511,4 @@ class ColumnsSorter(Transformer):
             data with columns sorted and second argument
 
         '''
-        data = data.copy()
         return data[self.columns]
@@ -0,0 +1,92 @@
+'''Synthetic rows following the schema of the Cold Calls Insurance Dataset, used by benchmarks'''
+
+import numpy as np
+import pandas as pd
+
+
+MODALITIES = {
+    'Job': ['management', 'blue-collar', 'technician', 'admin.', 'services', 'retired',
+            'self-employed', 'student', 'unemployed', 'entrepreneur', 'housemaid', None],
+    'Marital': ['married', 'single', 'divorced'],
+    'Education': ['primary', 'secondary', 'tertiary', None],
+    'Communication': ['cellular', 'telephone', None],
+    'LastContactMonth': ['jan', 'feb', 'mar', 'apr', 'may', 'jun', 'jul', 'aug', 'sep', 'oct', 'nov', 'dec'],
+    'Outcome': ['failure', 'success', 'other', None],
+}
+
+
+def _format_times(seconds):
+    '''Get "%H:%M:%S" strings from numbers of seconds since midnight, below one day'''
+    times = np.array([f'{h:02d}:{m:02d}:{s:02d}' for h in range(24) for m in range(60) for s in range(60)],
+                     dtype=object)
+    return times.take(seconds)
+
+
+def get_synthetic_dataset(n_rows, random_state=None, target=True):
+    '''Get random rows with the columns, dtypes and modalities of the raw train dataset
+    Values are drawn independently per column, they are meant to exercise preprocessing
+    and inference at any scale, not to train meaningful models
+
+    Parameters
+    ----------
+    n_rows : int
+        number of rows
+    random_state : int or NoneType, optional, default is None
+        seed of the random generator, same seeds give same rows
+    target : bool, optional, default is True
+        if True, add the CarInsurance target column
+
+    Returns
+    -------
+    pd.DataFrame
+        synthetic dataset with missing values as NaN, as read by pd.read_csv
+
+    '''
+    generator = np.random.default_rng(random_state)
+    starts = generator.integers(9 * 3600, 17 * 3600, n_rows)
+    ends = starts + generator.integers(5, 3000, n_rows)
+
+    def choose(column):
+        return generator.choice(np.array(MODALITIES[column], dtype=object), n_rows)
+
+    dataset = pd.DataFrame({
+        'Id': np.arange(1, n_rows + 1),
+        'Age': generator.integers(18, 96, n_rows),
+        'Job': choose('Job'),
+        'Marital': choose('Marital'),
+        'Education': choose('Education'),
+        'Default': generator.integers(0, 2, n_rows),
+        'Balance': generator.integers(-3000, 100000, n_rows),
+        'HHInsurance': generator.integers(0, 2, n_rows),
+        'CarLoan': generator.integers(0, 2, n_rows),
+        'Communication': choose('Communication'),
+        'LastContactDay': generator.integers(1, 32, n_rows),
+        'LastContactMonth': choose('LastContactMonth'),
+        'NoOfContacts': generator.integers(1, 44, n_rows),
+        'DaysPassed': generator.integers(-1, 855, n_rows),
+        'PrevAttempts': generator.integers(0, 30, n_rows),
+        'Outcome': choose('Outcome'),
+        'CallStart': _format_times(starts),
+        'CallEnd': _format_times(ends),
+    })
+    dataset = dataset.fillna(np.nan)
+    if target:
+        dataset['CarInsurance'] = generator.integers(0, 2, n_rows)
+    return dataset
+
+
+def get_payload(dataset):
+    '''Get the columnar JSON payload of a dataset, as sent to the API by batch requests
+
+    Parameters
+    ----------
+    dataset : pd.DataFrame
+        rows to send, as returned by get_synthetic_dataset
+
+    Returns
+    -------
+    dict
+        mapping from column name to list of Python values, missing values being empty strings
+
+    '''
+    return dataset.astype(object).where(dataset.notna(), '').to_dict(orient='list')
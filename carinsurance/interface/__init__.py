@@ -1,2 +1,10 @@
-import carinsurance.interface.application as application
+from carinsurance.helpers.lazy import get_lazy_getattr
+
 import carinsurance.interface.exceptions as exceptions
+
+_LAZY_MODULES = ( # import flask, numpy or pandas, only the ones a process uses are loaded
+    'application', 'schema', 'batching', 'streaming', 'cache', 'asgi',
+    'registry', 'bundle', 'access', 'serialization',
+)
+
+__getattr__ = get_lazy_getattr(__name__, _LAZY_MODULES)
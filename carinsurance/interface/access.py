@@ -0,0 +1,119 @@
+'''Compact structured access records of the inference API, sampled under load'''
+
+import json
+import time
+import random
+import logging
+import threading
+
+
+class AccessLogger(object):
+    '''Class logging one compact JSON record per answered call
+
+    A record holds the status of the answer, the number of identifiers, the total
+    wall time and the time of each phase (decoding, validation, transform,
+    prediction, thresholding) in milliseconds; answers are serialized after their
+    record is logged, so serialization is only found in metrics. Successful calls are kept with
+    probability sample_rate and at most max_per_second of them are logged per second,
+    failed calls are always logged, so that logging volume stays bounded under load.
+
+    Parameters
+    ----------
+    logger : logging.Logger or NoneType, optional, default is None
+        logger records are sent to, if None use the carinsurance.access logger
+    sample_rate : float, optional, default is 1.
+        probability that a successful call is logged
+    max_per_second : int or NoneType, optional, default is None
+        number of successful calls logged per second beyond which they are skipped,
+        if None there is no limit
+
+    Attributes
+    ----------
+    logger, sample_rate, max_per_second
+        see parameters
+    logged : int
+        number of records logged
+    skipped : int
+        number of successful calls not logged because of sampling
+
+    '''
+    PHASES = {
+        'request.decode': 'decode',
+        'inference.validate': 'validate',
+        'inference.transform': 'transform',
+        'inference.predict': 'predict',
+        'inference.threshold': 'threshold',
+    }
+
+    def __init__(self, logger=None, sample_rate=1., max_per_second=None):
+        assert 0 <= sample_rate <= 1
+        self.logger = logger or logging.getLogger('carinsurance.access')
+        self.sample_rate = sample_rate
+        self.max_per_second = max_per_second
+        self.logged = 0
+        self.skipped = 0
+
+        self._lock = threading.Lock()
+        self._second = None
+        self._count = 0
+
+    def _keep(self, status):
+        '''Tell if a call is logged, counting it in the current second'''
+        if status != 0:
+            return True
+        if (self.sample_rate < 1) and (random.random() >= self.sample_rate):
+            return False
+        if self.max_per_second is None:
+            return True
+
+        second = int(time.monotonic())
+        with self._lock:
+            if second != self._second:
+                self._second, self._count = second, 0
+            self._count += 1
+            return self._count <= self.max_per_second
+
+    def log(self, status, identifiers, seconds, timings=None):
+        '''Log the record of an answered call, unless it is sampled out
+
+        Parameters
+        ----------
+        status : int
+            status of the answer, 0 if no error
+        identifiers : list or NoneType
+            identifiers of the answer, only their number is logged
+        seconds : float
+            wall time of the call
+        timings : dict or NoneType, optional, default is None
+            seconds per step name recorded during the call (see Metrics.stop_tracking),
+            only phases are logged
+
+        '''
+        if not self._keep(status):
+            with self._lock:
+                self.skipped += 1
+            return
+
+        record = {
+            'status': status,
+            'rows': len(identifiers) if isinstance(identifiers, (list, tuple)) else int(identifiers is not None),
+            'ms': round(seconds * 1e3, 3),
+        }
+        for name, phase in self.PHASES.items():
+            if name in (timings or dict()):
+                record[phase] = round(timings[name] * 1e3, 3)
+        self.logger.info(json.dumps(record, separators=(',', ':')))
+        with self._lock:
+            self.logged += 1
+
+    def get_stats(self):
+        '''Get the numbers of logged and skipped records
+
+        Returns
+        -------
+        dict
+            keys are logged and skipped
+
+        '''
+        with self._lock:
+            return {'logged': self.logged, 'skipped': self.skipped}
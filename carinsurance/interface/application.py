@@ -2,31 +2,56 @@
 
 import os
 import json
+import time
 import pickle
 import logging
 
 import numpy as np
 import pandas as pd
-from flask import Flask, request
+from flask import Flask, Response, request, stream_with_context
 from werkzeug.exceptions import BadRequest
 
+from carinsurance.domain.preprocessing.compiled import CompiledPipeline
+from carinsurance.domain.preprocessing.pipeline import get_schema
+from carinsurance.helpers.metrics import measure_pipeline
+from carinsurance.interface.schema import decode, normalize
+from carinsurance.interface.batching import MicroBatcher
+from carinsurance.interface.streaming import MAX_LINE_SIZE, iter_answers, iter_lines
+from carinsurance.interface.registry import ModelVersion
+from carinsurance.interface.serialization import dumps_answer
 from carinsurance.interface.exceptions import (
     ReplaceEmptyByNullError, TransformPipelineError, PredictionError,
     FloatAlterationError, IntegerAlterationError, MissingValueError
 )
 
 
-def get_predictions(data, pipeline, model, threshold, logger):
+def _predict_probabilities(values, model):
+    '''Get probabilities of the positive class'''
+    if hasattr(model, 'predict_proba'):
+        return model.predict_proba(values)[:, 1]
+    return model.predict(values)
+
+
+def _call(metrics, name, function, data, *args):
+    '''Call function on data, recording it in metrics unless metrics is None'''
+    if metrics is None:
+        return function(data, *args)
+    return metrics.call(name, function, data, *args)
+
+
+def get_predictions(data, pipeline, model, threshold, logger, metrics=None, schema=None):
     '''Get predictions from data, a preprocessing pipeline, an inference model 
     and a threshold
     Since data is expected to have empty string to replace missing data, first step 
-    is to replace empty string with NaN values
+    is to replace empty string with NaN values and to check that missing values are
+    allowed (single pass per column, see schema.normalize), unless data was already decoded
 
     Parameters
     ----------
-    data : array-like of shape (n_samples, n_features)
-        data for which we want inference
-    pipeline : sklearn.pipeline.Pipeline
+    data : pd.DataFrame or dict
+        data for which we want inference, either as dataframe or as
+        mapping from column name to array decoded with schema.decode
+    pipeline : sklearn.pipeline.Pipeline or CompiledPipeline
         preprocessing pipeline for ML tasks
     model : sklearn model API
         model use to compute probabilities
@@ -34,11 +59,17 @@ def get_predictions(data, pipeline, model, threshold, logger):
         threshold for splitting classes
     logger : logging.Logger
         logger used to display inference errors
+    metrics : Metrics or NoneType, optional, default is None
+        metrics where each phase is recorded under inference.<phase>
+        (validate, transform, predict, threshold),
+        if None nothing is recorded
+    schema : dict or NoneType, optional, default is None
+        input schema telling which columns allow missing values, if None use get_schema
 
     Returns
     -------
-    list of float
-        probabilities for each instance present in data
+    np.ndarray of float, np.ndarray of int
+        probabilities and predictions for each instance present in data
 
     Raises
     ------
@@ -49,54 +80,54 @@ def get_predictions(data, pipeline, model, threshold, logger):
     PredictionError
         arises when an error occurs during the prediction step
     FloatAlterationError
-        arises when an error occurs during the transformation step of the 
-        probabilities into float type for json serialization during request
+        arises when an error occurs during the transformation step of the
+        probabilities into a float array for json serialization during request
     IntegerAlterationError
         arises when an error occurs during transformation from probabilities to predictions 
 
     '''
-    for c in data.columns:
-        has_missing = data[c].astype(object).replace({'': np.nan}).isna().any()
-        if has_missing and (c not in ('Job', 'Education', 'Communication', 'Outcome')):
-            raise MissingValueError(f'NaN value was found in {c}')
+    if isinstance(data, pd.DataFrame):
+        try:
+            _, columns = _call(metrics, 'inference.validate', normalize, data, schema or get_schema())
+        except Exception as e:
+            logger.exception(str(e))
+            message = "An error arised during replace method from data"
+            raise ReplaceEmptyByNullError(message)
+
+        if columns:
+            raise MissingValueError(f'NaN value was found in {columns[0]}')
 
     try:
-        data.replace({'': np.nan}, inplace=True)
-    except Exception as e:
-        logger.exception(str(e))
-        message = "An error arised during replace method from data"
-        raise ReplaceEmptyByNullError(message)
-    try:
-        values = pipeline.transform(data)
+        values = _call(metrics, 'inference.transform', pipeline.transform, data)
     except Exception as e:
         logger.exception(str(e))
         message = "An error arised during transform method from pipeline"
         raise TransformPipelineError(message)
 
     try:
-        if hasattr(model, 'predict_proba'):
-            probabilities = model.predict_proba(values)[:, 1]
-        else:
-            probabilities = model.predict(values)
+        probabilities = _call(metrics, 'inference.predict', _predict_probabilities, values, model)
     except Exception as e:
         logger.exception(str(e))
         message = "An error arised during prediction from model"
         raise PredictionError(message)
 
+    start = time.perf_counter()
     try:
-        probabilities = [float(p) for p in probabilities]
+        probabilities = np.asarray(probabilities, dtype=np.float64).reshape(-1)
     except Exception as e:
         logger.exception(str(e))
         message = "An error arised during float function on model prediction"
         raise FloatAlterationError(message)
 
     try:
-        predictions = [int(p > threshold) for p in probabilities]
+        predictions = (probabilities > threshold).astype(np.int64)
     except Exception as e:
         logger.exception(str(e))
         message = "An error arised during int function on probabilities"
         raise IntegerAlterationError(message)
 
+    if metrics is not None:
+        metrics.observe('inference.threshold', time.perf_counter() - start, len(probabilities), len(predictions))
     return probabilities, predictions
 
 
@@ -107,9 +138,9 @@ def get_answer_from(identifiers, probabilities, predictions=None, message=None):
     ----------
     identifiers : list of int
         identifiers from the probabilities
-    probabilities : list of float or NoneType
+    probabilities : list or np.ndarray of float, or NoneType
         probabilities computed by the API
-    predictions : list of int or NoneType, optional, default is None
+    predictions : list or np.ndarray of int, or NoneType, optional, default is None
         predictions associated with probabilities
     message : str or NoneType, optional, default is None
         message to return with the answer,
@@ -137,14 +168,13 @@ def get_answer_from(identifiers, probabilities, predictions=None, message=None):
     return answer
 
 
-def get_app_from(name, pipeline, model, threshold=.5, logger=None):
-    '''Get Flask App with the api POST route used to infer predictions
+def get_handler_from(pipeline, model, threshold=.5, logger=None, schema=None, batching=None, cache=None,
+                     metrics=None, registry=None, access=None):
+    '''Get the function answering a parsed JSON payload, shared by the WSGI and ASGI apps
 
     Parameters
     ----------
-    name : str
-        name of current process (should be __main__)
-    pipeline : sklearn.pipeline.Pipeline
+    pipeline : sklearn.pipeline.Pipeline or CompiledPipeline
         pipeline used to preprocess data
     model : sklearn model API
         model use to compute probabilities
@@ -152,30 +182,62 @@ def get_app_from(name, pipeline, model, threshold=.5, logger=None):
         threshold used to change probabilities into predictions
     logger : logging.Logger or NoneType, optional, default is None
         logger used to log message, if None use default logging logger
+    schema : dict or NoneType, optional, default is None
+        input schema used to decode request data, if None use get_schema
+    batching : dict or NoneType, optional, default is None
+        keyword arguments of MicroBatcher (window, max_batch_size) used to merge
+        concurrent requests into a single inference call, if None no batching is done
+    cache : PredictionCache or NoneType, optional, default is None
+        cache of predictions per row, rows found in it are not computed again,
+        if None every row is computed
+    metrics : Metrics or NoneType, optional, default is None
+        metrics where decoding, each pipeline step and each phase of get_predictions
+        are recorded, if None nothing is recorded
+    registry : ModelRegistry or NoneType, optional, default is None
+        versions of pipeline and model answering requests, which can be swapped
+        without restart, requests answered by a canary version are neither batched nor
+        cached, if None pipeline and model answer every request
+    access : AccessLogger or NoneType, optional, default is None
+        logger of one record per call with its status, number of identifiers and
+        timings of phases run by the calling thread (requires metrics), if None
+        no record is logged
 
     Returns
     -------
-    flask.App
-        flask API with POST route for inference
+    callable
+        function taking the parsed JSON payload of a request and
+        returning the json answer built with get_answer_from
 
     '''
-    app = Flask(name)
     logger = logger or logging.getLogger()
+    schema = schema or get_schema()
+    if (metrics is not None) and not isinstance(pipeline, CompiledPipeline):
+        pipeline = measure_pipeline(pipeline, metrics)
+
+    default = ModelVersion(None, None, pipeline, model)
+
+    def compute_with(version, columns):
+        if (metrics is not None) and isinstance(version.pipeline, CompiledPipeline):
+            version.pipeline.metrics = metrics # versions loaded by the registry after the handler was built
+        data = columns if isinstance(version.pipeline, CompiledPipeline) else pd.DataFrame(columns)
+        return get_predictions(data, version.pipeline, version.model, threshold=threshold, logger=logger,
+                               metrics=metrics, schema=schema)
+
+    def compute(columns):
+        return compute_with(default if registry is None else registry.current, columns)
+
+    batcher = None
+    if batching is not None:
+        batcher = MicroBatcher(compute, logger=logger, **batching)
+    infer = compute if batcher is None else batcher.submit
+
     expected_inference_exceptions = (
         AttributeError, MissingValueError, ReplaceEmptyByNullError, TransformPipelineError,
         PredictionError, FloatAlterationError, IntegerAlterationError,
     )
 
-    @app.route('/api/', methods=['POST'])
-    def predict():
+    def handle(data):
         try:
-            try:
-                data = request.get_json()
-            except BadRequest as e:
-                logger.exception(str(e))
-                message = "Data couldn't be parsed"
-                return get_answer_from(identifiers=None, probabilities=None, message=message)
-    
             try:
                 identifiers = data['Id']
             except KeyError as e:
@@ -189,14 +251,24 @@ def get_app_from(name, pipeline, model, threshold=.5, logger=None):
 
         try:
             try:
-                data = pd.DataFrame(data)
-            except (ValueError, TypeError) as e:
+                data = _call(metrics, 'request.decode', decode, data, schema)
+            except (ValueError, TypeError, AttributeError) as e:
                 logger.exception(str(e))
                 message = "Data couldn't be converted into a dataframe"
                 return get_answer_from(identifiers=identifiers, probabilities=None, message=message)
+            except MissingValueError as e:
+                logger.error(str(e))
+                message = "No predictions could be computed"
+                return get_answer_from(identifiers=identifiers, probabilities=None, message=message)
 
+            version, shadow = (default, None) if registry is None else registry.route()
             try:
-                probabilities, predictions = get_predictions(data, pipeline, model, threshold=.5, logger=logger)
+                if (registry is not None) and (version is not registry.current): # canary
+                    probabilities, predictions = compute_with(version, data)
+                elif cache is not None:
+                    probabilities, predictions = cache.get_or_compute(data, infer)
+                else:
+                    probabilities, predictions = infer(data)
             except expected_inference_exceptions as e:
                 logger.error(str(e))
                 message = "No predictions could be computed"
@@ -206,7 +278,166 @@ def get_app_from(name, pipeline, model, threshold=.5, logger=None):
             message = "Unexpected exception in inference?!"
             return get_answer_from(identifiers=identifiers, probabilities=None, message=message)
 
+        if shadow is not None:
+            registry.compare(shadow, lambda candidate: compute_with(candidate, data), probabilities, threshold=threshold)
         message = "Good answer"
         return get_answer_from(identifiers=identifiers, probabilities=probabilities, predictions=predictions, message=message)
 
+    def handle_logged(data):
+        start = time.perf_counter()
+        if metrics is not None:
+            metrics.start_tracking()
+        answer = handle(data)
+        timings = metrics.stop_tracking() if metrics is not None else None
+        access.log(answer['status'], answer['identifiers'], time.perf_counter() - start, timings=timings)
+        return answer
+
+    return handle if access is None else handle_logged
+
+
+def get_serializer_from(metrics=None, precision=None):
+    '''Get the function writing answers to JSON bytes, recorded under inference.serialize
+
+    Parameters
+    ----------
+    metrics : Metrics or NoneType, optional, default is None
+        metrics where each serialization is recorded, if None nothing is recorded
+    precision : int or NoneType, optional, default is None
+        number of decimals of answered probabilities, see serialization.dumps_answer
+
+    Returns
+    -------
+    callable
+        function taking an answer built with get_answer_from and returning its JSON bytes
+
+    '''
+    def serialize(answer):
+        start = time.perf_counter()
+        body = dumps_answer(answer, precision=precision)
+        if metrics is not None:
+            rows = len(answer['probabilities']) if answer.get('probabilities') is not None else 0
+            metrics.observe('inference.serialize', time.perf_counter() - start, rows, rows, len(body))
+        return body
+
+    return serialize
+
+
+def get_error_answer_from(message):
+    '''Get json answer of a call which failed before identifiers could be read
+
+    Parameters
+    ----------
+    message : str
+        error message to return with the answer
+
+    Returns
+    -------
+    dict
+        json answer throught the API, see get_answer_from
+
+    '''
+    return get_answer_from(identifiers=None, probabilities=None, message=message)
+
+
+def get_failure_from(access=None):
+    '''Get function answering calls which failed before identifiers could be read
+
+    Such calls never reach the handler, so they are logged here in access records
+
+    Parameters
+    ----------
+    access : AccessLogger or NoneType, optional, default is None
+        access logger where failed calls are recorded, if None nothing is logged
+
+    Returns
+    -------
+    callable
+        function taking an error message and the perf_counter time at which the call
+        started (None when unknown, the call being then logged with 0 seconds) and
+        returning its json answer, see get_error_answer_from
+
+    '''
+    def fail(message, start=None):
+        answer = get_error_answer_from(message)
+        if access is not None:
+            seconds = time.perf_counter() - start if start is not None else 0.
+            access.log(answer['status'], answer['identifiers'], seconds)
+        return answer
+
+    return fail
+
+
+def get_app_from(name, pipeline, model, threshold=.5, logger=None, schema=None, batching=None, cache=None,
+                 chunk_size=1000, metrics=None, registry=None, access=None, precision=None,
+                 max_line_size=MAX_LINE_SIZE):
+    '''Get Flask App with the api POST routes used to infer predictions
+    The /api/stream/ route scores newline-delimited JSON records or columnar blocks
+    by chunks of chunk_size rows and streams back one JSON answer line per chunk,
+    clients should read answers while sending so that both sides stay bounded
+    When metrics are given, the /metrics/ GET route returns their summary
+    (histograms of the process answering the call), and when a registry is
+    given, the /registry/ GET route returns its versions and counters
+
+    Parameters
+    ----------
+    name : str
+        name of current process (should be __main__)
+    pipeline, model, threshold, logger, schema, batching, cache, metrics, registry, access
+        see get_handler_from
+    chunk_size : int, optional, default is 1000
+        number of rows scored at once by the streaming route
+    precision : int or NoneType, optional, default is None
+        number of decimals of answered probabilities, if None they are written in full,
+        see serialization.dumps_answer
+    max_line_size : int, optional, default is streaming.MAX_LINE_SIZE
+        maximum length of a line sent to the streaming route, longer lines are
+        answered as lines which cannot be parsed without being kept in memory
+
+    Returns
+    -------
+    flask.App
+        flask API with POST route for inference
+
+    '''
+    app = Flask(name)
+    logger = logger or logging.getLogger()
+    handle = get_handler_from(pipeline, model, threshold=threshold, logger=logger,
+                              schema=schema, batching=batching, cache=cache, metrics=metrics,
+                              registry=registry, access=access)
+    serialize = get_serializer_from(metrics=metrics, precision=precision)
+    fail = get_failure_from(access=access)
+
+    def answer():
+        start = time.perf_counter()
+        try:
+            data = request.get_json()
+        except BadRequest as e:
+            logger.exception(str(e))
+            return fail("Data couldn't be parsed", start)
+        except Exception as e:
+            logger.exception(str(e))
+            return fail("Unexpected exception in parsing?!", start)
+
+        return handle(data)
+
+    @app.route('/api/', methods=['POST'])
+    def predict():
+        return Response(serialize(answer()), mimetype='application/json')
+
+    @app.route('/api/stream/', methods=['POST'])
+    def stream():
+        answers = iter_answers(iter_lines(request.stream, max_line_size), handle, fail,
+                               chunk_size=chunk_size, logger=logger, dumps=serialize, max_line_size=max_line_size)
+        return Response(stream_with_context(answers), mimetype='application/x-ndjson')
+
+    if metrics is not None:
+        @app.route('/metrics/', methods=['GET'])
+        def get_metrics():
+            return metrics.get_summary()
+
+    if registry is not None:
+        @app.route('/registry/', methods=['GET'])
+        def get_registry():
+            return registry.get_stats()
+
     return app
@@ -0,0 +1,154 @@
+'''Functions used to create the ASGI App served by the uvicorn command
+
+The App keeps the /api/ contract of the Flask App: request bodies are read without
+blocking the event loop, and parsing and inference run in a bounded pool of threads,
+so that slow clients only hold a coroutine instead of a worker.
+'''
+
+import json
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from carinsurance.interface.application import (
+    get_handler_from, get_failure_from, get_serializer_from
+)
+from carinsurance.interface.streaming import MAX_LINE_SIZE, ChunkAssembler, cut_lines, score_lines
+from carinsurance.interface.serialization import dumps_answer
+
+
+async def _read_body(receive):
+    '''Read the whole body of an http request from ASGI messages'''
+    chunks = list()
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            return None
+        chunks.append(message.get('body', b''))
+        if not message.get('more_body', False):
+            return b''.join(chunks)
+
+
+async def _send_json(send, status, answer):
+    '''Send a JSON answer through ASGI messages, answer being a dict or an already serialized body'''
+    body = answer if isinstance(answer, bytes) else json.dumps(answer).encode('utf-8')
+    headers = [(b'content-type', b'application/json'), (b'content-length', str(len(body)).encode('ascii'))]
+    await send({'type': 'http.response.start', 'status': status, 'headers': headers})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def get_asgi_app_from(pipeline, model, threshold=.5, logger=None, schema=None, batching=None, cache=None,
+                      chunk_size=1000, max_workers=4, example=None, metrics=None, registry=None,
+                      access=None, precision=None, max_line_size=MAX_LINE_SIZE):
+    '''Get ASGI App with the api POST routes used to infer predictions
+
+    Parameters
+    ----------
+    pipeline, model, threshold, logger, schema, batching, cache, metrics, registry, access
+        see application.get_handler_from, metrics and registry counters are also
+        returned by the /metrics/ and /registry/ GET routes
+    chunk_size, precision, max_line_size
+        see application.get_app_from
+    max_workers : int, optional, default is 4
+        number of threads computing predictions, requests beyond
+        wait in the event loop until a thread is available
+    example : dict or NoneType, optional, default is None
+        payload answered once at startup so that the App is warm before taking traffic,
+        if None no warm up is done
+
+    Returns
+    -------
+    callable
+        ASGI App with POST route for inference
+
+    '''
+    assert max_workers >= 1
+    logger = logger or logging.getLogger()
+    handle = get_handler_from(pipeline, model, threshold=threshold, logger=logger,
+                              schema=schema, batching=batching, cache=cache, metrics=metrics,
+                              registry=registry, access=access)
+    serialize = get_serializer_from(metrics=metrics, precision=precision)
+    fail = get_failure_from(access=access)
+    state = dict() # executor and semaphore are created in the serving process and loop
+
+    def answer(body):
+        start = time.perf_counter()
+        try:
+            data = json.loads(body)
+        except ValueError as e:
+            logger.exception(str(e))
+            return dumps_answer(fail("Data couldn't be parsed", start))
+        return serialize(handle(data))
+
+    async def run(function, *args):
+        if 'executor' not in state:
+            state['executor'] = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='inference')
+            state['semaphore'] = asyncio.Semaphore(max_workers)
+        async with state['semaphore']:
+            return await asyncio.get_running_loop().run_in_executor(state['executor'], function, *args)
+
+    async def stream(receive, send):
+        assembler, rest = ChunkAssembler(chunk_size=chunk_size, max_line_size=max_line_size), b''
+        headers = [(b'content-type', b'application/x-ndjson')]
+        await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            more_body = message.get('more_body', False)
+
+            lines, rest = cut_lines(rest, message.get('body', b''), max_line_size)
+            if not more_body:
+                lines.append(rest)
+            answers = await run(score_lines, assembler, lines, handle, fail, not more_body, logger,
+                                serialize)
+            if answers:
+                await send({'type': 'http.response.body', 'body': b''.join(answers), 'more_body': True})
+
+        await send({'type': 'http.response.body', 'body': b''})
+
+    async def lifespan(receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                if example is not None:
+                    await run(handle, example)
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                if 'executor' in state:
+                    state['executor'].shutdown(wait=True)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    async def app(scope, receive, send):
+        if scope['type'] == 'lifespan':
+            await lifespan(receive, send)
+            return
+
+        if (scope['path'] == '/metrics/') and (metrics is not None) and (scope['method'] == 'GET'):
+            await _send_json(send, 200, metrics.get_summary())
+            return
+        if (scope['path'] == '/registry/') and (registry is not None) and (scope['method'] == 'GET'):
+            await _send_json(send, 200, registry.get_stats())
+            return
+
+        if scope['path'] not in ('/api/', '/api/stream/'):
+            await _send_json(send, 404, {'message': 'Not Found'})
+            return
+        if scope['method'] != 'POST':
+            await _send_json(send, 405, {'message': 'Method Not Allowed'})
+            return
+
+        if scope['path'] == '/api/stream/':
+            await stream(receive, send)
+            return
+
+        body = await _read_body(receive)
+        if body is None: # client left before sending the whole body
+            return
+        await _send_json(send, 200, await run(answer, body))
+
+    return app
@@ -0,0 +1,148 @@
+'''Micro-batching of concurrent inference calls made on decoded columns'''
+
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+import numpy as np
+
+
+class MicroBatcher(object):
+    '''Class which merges inference calls arriving together into a single vectorized call
+
+    Calls are collected during window seconds after the first one, or until
+    max_batch_size rows are gathered, then the predict function is called once on
+    the concatenated columns and every caller gets back its own slice of results.
+    If the merged call fails, each call is computed alone so that only faulty
+    calls get an exception.
+
+    Parameters
+    ----------
+    predict : callable
+        function taking a mapping from column name to array and
+        returning a pair of probabilities and predictions arrays
+    window : float, optional, default is .005
+        number of seconds to wait for other calls after the first one
+    max_batch_size : int, optional, default is 32
+        number of rows after which calls stop being collected
+    logger : logging.Logger or NoneType, optional, default is None
+        logger used to log message, if None use default logging logger
+
+    Attributes
+    ----------
+    predict : callable
+        function used to compute probabilities and predictions
+    window : float
+        number of seconds to wait for other calls after the first one
+    max_batch_size : int
+        number of rows after which calls stop being collected
+    logger : logging.Logger
+        logger used to log message
+
+    '''
+    def __init__(self, predict, window=.005, max_batch_size=32, logger=None):
+        assert window >= 0
+        assert max_batch_size >= 1
+        self.predict = predict
+        self.window = window
+        self.max_batch_size = max_batch_size
+        self.logger = logger or logging.getLogger()
+
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._pid = None
+
+    def _start(self):
+        '''Start the batching thread once per process (threads do not survive a fork)'''
+        with self._lock:
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()
+                thread = threading.Thread(target=self._run, name='MicroBatcher', daemon=True)
+                thread.start()
+                self._pid = os.getpid()
+
+    def submit(self, columns):
+        '''Compute probabilities and predictions of columns within the next batch
+
+        Parameters
+        ----------
+        columns : dict
+            mapping from column name to array of values
+
+        Returns
+        -------
+        list of float, list of int
+            probabilities and predictions of the given rows
+
+        '''
+        if self._pid != os.getpid():
+            self._start()
+
+        future = Future()
+        self._queue.put((columns, future))
+        return future.result()
+
+    def _collect(self):
+        '''Get calls arriving during the window after the first one'''
+        columns, future = self._queue.get()
+        batch, rows = [(columns, future)], len(next(iter(columns.values()), ()))
+        deadline = time.monotonic() + self.window
+
+        while rows < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                columns, future = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append((columns, future))
+            rows += len(next(iter(columns.values()), ()))
+
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            groups = dict()
+            for columns, future in batch:
+                groups.setdefault(tuple(columns.keys()), list()).append((columns, future))
+
+            for calls in groups.values():
+                try:
+                    self._compute(calls)
+                except Exception as e: # never let the batching thread die
+                    self.logger.exception(str(e))
+                    for _, future in calls:
+                        if not future.done():
+                            future.set_exception(e)
+
+    def _compute(self, calls):
+        '''Compute calls sharing the same columns in a single predict call'''
+        if len(calls) == 1:
+            self._compute_alone(*calls[0])
+            return
+
+        names = calls[0][0].keys()
+        merged = {name: np.concatenate([columns[name] for columns, _ in calls]) for name in names}
+        try:
+            probabilities, predictions = self.predict(merged)
+        except Exception:
+            for columns, future in calls:
+                self._compute_alone(columns, future)
+            return
+
+        start = 0
+        for columns, future in calls:
+            end = start + len(next(iter(columns.values()), ()))
+            future.set_result((probabilities[start:end], predictions[start:end]))
+            start = end
+
+    def _compute_alone(self, columns, future):
+        try:
+            future.set_result(self.predict(columns))
+        except Exception as e:
+            future.set_exception(e)
@@ -0,0 +1,113 @@
+'''Serving bundle holding the compiled pipeline and the model of a directory in a single artifact
+
+The bundle is built once from model.artifact and pipeline.artifact (or the model.pkl and
+pipeline.pkl saved by former versions), with trees already
+flattened into TreeEnsemble arrays and the pipeline already compiled, so that loading
+it only memory-maps the file: every worker attaching to the same bundle shares its pages
+instead of unpickling its own copy of the model (scikit-learn trees copy their nodes
+into private memory when unpickled).
+'''
+
+import os
+import fcntl
+
+from carinsurance.domain.modelling.trees import TreeEnsemble
+from carinsurance.domain.preprocessing.compiled import CompiledPipeline
+from carinsurance.infrastructure.artifacts import (
+    save_artifact, load_artifact, load_object, load_metadata, get_fingerprint, get_artifact_path
+)
+
+
+BUNDLE = 'serving.artifact'
+
+
+def get_bundle_path(path):
+    return os.path.join(path, BUNDLE)
+
+
+def is_stale(path, native=False, fingerprint=None):
+    '''Check if the bundle of a directory is missing or was built from other artifacts
+
+    Parameters
+    ----------
+    path : str
+        directory of the artifacts
+    native : bool, optional, default is False
+        if True, the bundle is expected to hold a TreeEnsemble for tree-based models
+    fingerprint : str or NoneType, optional, default is None
+        fingerprint of model and pipeline artifacts, if None it is computed
+
+    Returns
+    -------
+    bool
+        True if the bundle should be built again
+
+    '''
+    fingerprint = fingerprint or get_fingerprint(get_artifact_path(path, 'model'), get_artifact_path(path, 'pipeline'))
+    try:
+        metadata = load_metadata(get_bundle_path(path))
+    except (FileNotFoundError, ValueError):
+        return True
+    return (metadata.get('fingerprint') != fingerprint) or (metadata.get('native') != native)
+
+
+def save_bundle(path, native=False):
+    '''Build the bundle of a directory from its model and pipeline artifacts
+
+    Parameters
+    ----------
+    path : str
+        directory of the artifacts, where the bundle is written
+    native : bool, optional, default is False
+        if True, tree-based models are flattened into a TreeEnsemble,
+        other models are kept as they are
+
+    Returns
+    -------
+    str
+        fingerprint of the artifacts the bundle was built from
+
+    '''
+    model_path, pipeline_path = get_artifact_path(path, 'model'), get_artifact_path(path, 'pipeline')
+    fingerprint = get_fingerprint(model_path, pipeline_path)
+
+    model = load_object(model_path, mmap_mode=False)
+    if native:
+        try:
+            model = TreeEnsemble.from_estimator(model)
+        except ValueError: # not a tree-based model
+            pass
+    bundle = {'pipeline': CompiledPipeline(load_object(pipeline_path, mmap_mode=False)), 'model': model}
+    save_artifact(bundle, get_bundle_path(path), metadata={'fingerprint': fingerprint, 'native': native})
+    return fingerprint
+
+
+def load_bundle(path, native=False, logger=None):
+    '''Load the compiled pipeline and model of a directory from its bundle, built first if stale
+
+    Concurrent processes (e.g. gunicorn workers reloading a new version) wait for
+    a single one of them to build the bundle, then all attach to the same file.
+
+    Parameters
+    ----------
+    path : str
+        directory of the artifacts
+    native : bool, optional, default is False
+        see save_bundle
+    logger : logging.Logger or NoneType, optional, default is None
+        logger used to log message, if None nothing is logged
+
+    Returns
+    -------
+    CompiledPipeline, sklearn model API or TreeEnsemble
+        compiled pipeline and model, arrays being read-only views on the memory-mapped bundle
+
+    '''
+    with open(f'{get_bundle_path(path)}.lock', 'a') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        if is_stale(path, native=native):
+            fingerprint = save_bundle(path, native=native)
+            if logger is not None:
+                logger.info(f'Serving bundle of version {fingerprint} built in {path}')
+    bundle = load_artifact(get_bundle_path(path))
+    return bundle['pipeline'], bundle['model']
@@ -0,0 +1,189 @@
+'''Cache of predictions keyed on canonicalized rows of decoded columns'''
+
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+def get_row_keys(columns, version=None):
+    '''Get a hash of each canonicalized row of decoded columns
+    Columns are sorted by name and missing values are all represented as None,
+    so that rows with the same values get the same key whatever the payload order
+
+    Parameters
+    ----------
+    columns : dict
+        mapping from column name to typed numpy array decoded with schema.decode
+    version : str or NoneType, optional, default is None
+        version of the model and pipeline, included in the keys
+
+    Returns
+    -------
+    list of bytes
+        keys of rows
+
+    '''
+    names = sorted(columns)
+    values = list()
+    for name in names:
+        array = columns[name]
+        if array.dtype.kind in 'fO':
+            values.append([None if v != v else v for v in array.tolist()]) # NaN != NaN
+        else:
+            values.append(array.tolist())
+
+    prefix = repr((version, names)).encode('utf-8')
+    return [hashlib.blake2b(prefix + repr(row).encode('utf-8'), digest_size=16).digest() for row in zip(*values)]
+
+
+class PredictionCache(object):
+    '''Class which keeps predictions of rows in a bounded LRU cache with time-to-live
+
+    Each row is cached on its own, so a batch can be partly served from the cache
+    while only rows never seen before are computed. Entries are bound to a version
+    of the model and pipeline and are dropped as soon as the version changes.
+
+    Parameters
+    ----------
+    max_size : int, optional, default is 100000
+        maximum number of rows kept, least recently used rows are evicted first
+    ttl : float or NoneType, optional, default is None
+        number of seconds during which a row is kept, if None rows never expire
+    version : str or NoneType, optional, default is None
+        version of the model and pipeline, see artifacts.get_fingerprint
+
+    Attributes
+    ----------
+    max_size : int
+        maximum number of rows kept
+    ttl : float or NoneType
+        number of seconds during which a row is kept
+    version : str or NoneType
+        version of the model and pipeline of cached rows
+    hits : int
+        number of rows served from the cache
+    misses : int
+        number of rows which had to be computed
+
+    '''
+    def __init__(self, max_size=100000, ttl=None, version=None):
+        assert max_size >= 1
+        assert (ttl is None) or (ttl > 0)
+        self.max_size = max_size
+        self.ttl = ttl
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def set_version(self, version):
+        '''Set the version of the model and pipeline, clearing the cache if it changed
+
+        Parameters
+        ----------
+        version : str or NoneType
+            new version of the model and pipeline
+
+        '''
+        with self._lock:
+            if version != self.version:
+                self._entries.clear()
+                self.version = version
+
+    def clear(self):
+        '''Remove all cached rows and reset counters'''
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def get_stats(self):
+        '''Get counters of the cache
+
+        Returns
+        -------
+        dict
+            hits, misses, hit ratio, current size and version of the cache
+
+        '''
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'ratio': self.hits / total if total else 0.,
+                'size': len(self._entries),
+                'version': self.version,
+            }
+
+    def _get(self, keys, now):
+        found = dict()
+        with self._lock:
+            for position, key in enumerate(keys):
+                entry = self._entries.get(key)
+                if entry is None:
+                    continue
+                expiry, value = entry
+                if (expiry is not None) and (expiry <= now):
+                    del self._entries[key]
+                    continue
+                self._entries.move_to_end(key)
+                found[position] = value
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def _put(self, keys, values, now, version):
+        expiry = None if self.ttl is None else now + self.ttl
+        with self._lock:
+            if version != self.version: # model changed while computing
+                return
+            for key, value in zip(keys, values):
+                self._entries[key] = (expiry, value)
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_or_compute(self, columns, compute):
+        '''Get probabilities and predictions of rows, computing only rows not cached
+
+        Parameters
+        ----------
+        columns : dict
+            mapping from column name to typed numpy array decoded with schema.decode
+        compute : callable
+            function taking a mapping from column name to array and
+            returning a pair of probabilities and predictions arrays
+
+        Returns
+        -------
+        np.ndarray of float, np.ndarray of int
+            probabilities and predictions of the given rows
+
+        '''
+        version = self.version
+        keys = get_row_keys(columns, version=version)
+        found = self._get(keys, time.monotonic())
+
+        missing = [position for position in range(len(keys)) if position not in found]
+        if missing:
+            if len(missing) == len(keys):
+                probabilities, predictions = compute(columns)
+            else:
+                positions = np.array(missing)
+                probabilities, predictions = compute({name: array[positions] for name, array in columns.items()})
+
+            computed = list(zip(np.asarray(probabilities).tolist(), np.asarray(predictions).tolist()))
+            self._put([keys[position] for position in missing], computed, time.monotonic(), version)
+            found.update(zip(missing, computed))
+
+        rows = [found[position] for position in range(len(keys))]
+        return np.array([p for p, _ in rows], dtype=np.float64), np.array([p for _, p in rows], dtype=np.int64)
@@ -0,0 +1,353 @@
+'''Registry of versions of the (pipeline, model) pair served by the API, reloaded without restart'''
+
+import os
+import time
+import random
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from carinsurance.infrastructure.artifacts import get_artifact_path
+
+
+class ModelVersion(object):
+    '''Class holding a fitted pipeline and model loaded from a directory of artifacts
+
+    Parameters
+    ----------
+    name : str
+        version of the artifacts, usually their fingerprint
+    path : str
+        directory of the artifacts
+    pipeline : sklearn.pipeline.Pipeline or CompiledPipeline
+        fitted preprocessing pipeline
+    model : sklearn model API
+        fitted model
+
+    Attributes
+    ----------
+    name, path, pipeline, model
+        see parameters
+
+    '''
+    def __init__(self, name, path, pipeline, model):
+        self.name = name
+        self.path = path
+        self.pipeline = pipeline
+        self.model = model
+
+
+class ModelRegistry(object):
+    '''Class serving a current version of the pipeline and model, and optionally a candidate one
+
+    New versions are loaded and warmed up before being swapped in with a single
+    attribute assignment: requests hold the version they started with, thus in-flight
+    requests finish on the old version while new ones get the new version. When a
+    watched directory changes, it is reloaded in a background thread once its
+    artifacts did not change for one interval (so that a pipeline and a model written
+    one after the other are loaded together). A candidate version can be served to a
+    fraction of requests (canary) or computed after each request without being
+    answered (shadow), disagreements with the current version being counted.
+
+    Parameters
+    ----------
+    loader : callable
+        function taking a directory and returning a pair of fitted pipeline and model
+    fingerprint : callable
+        function taking a directory and returning the version name of its artifacts
+    warm_up : callable or NoneType, optional, default is None
+        function taking a ModelVersion and raising an exception if it cannot serve,
+        called before a version is swapped in, if None versions are not warmed up
+    interval : float or NoneType, optional, default is None
+        seconds between checks of watched directories, if None directories are not watched
+    logger : logging.Logger or NoneType, optional, default is None
+        logger used to log message, if None use default logging logger
+
+    Attributes
+    ----------
+    current : ModelVersion or NoneType
+        version answering requests
+    candidate : ModelVersion or NoneType
+        version compared with the current one, if any
+    mode : str or NoneType
+        "canary" (candidate answers a fraction of requests) or "shadow"
+        (candidate is computed after each request but never answers)
+    fraction : float
+        fraction of requests answered by the candidate in canary mode
+    on_swap : list of callable
+        functions called with the new current version after each swap
+
+    '''
+    ARTIFACTS = ('model', 'pipeline')
+    MODES = ('canary', 'shadow')
+
+    def __init__(self, loader, fingerprint, warm_up=None, interval=None, logger=None):
+        self.loader = loader
+        self.fingerprint = fingerprint
+        self.warm_up = warm_up
+        self.interval = interval
+        self.logger = logger or logging.getLogger()
+
+        self.current = None
+        self.candidate = None
+        self.mode = None
+        self.fraction = 0.
+        self.on_swap = list()
+
+        self._lock = threading.Lock()
+        self._paths = {'current': None, 'candidate': None}
+        self._signatures = dict()
+        self._served = dict()
+        self._shadow = {'requests': 0, 'disagreements': 0, 'max_difference': 0., 'errors': 0, 'dropped': 0}
+        self._pid = None
+        self._executor = None
+        self._pending = 0
+
+    def _get_signature(self, path):
+        '''Get sizes and modification times of the artifacts of a directory, None if one is missing'''
+        try:
+            stats = [os.stat(get_artifact_path(path, name)) for name in self.ARTIFACTS]
+        except FileNotFoundError:
+            return None
+        return tuple((stat.st_size, stat.st_mtime_ns) for stat in stats)
+
+    def load(self, path):
+        '''Load and warm up the artifacts of a directory
+
+        Parameters
+        ----------
+        path : str
+            directory of the artifacts
+
+        Returns
+        -------
+        ModelVersion
+            loaded version
+
+        '''
+        signature = self._get_signature(path)
+        pipeline, model = self.loader(path)
+        version = ModelVersion(self.fingerprint(path), path, pipeline, model)
+        if self.warm_up is not None:
+            self.warm_up(version)
+        self._signatures[path] = signature
+        return version
+
+    def deploy(self, path):
+        '''Load a directory of artifacts and swap it in as the current version
+
+        Parameters
+        ----------
+        path : str
+            directory of the artifacts
+
+        Returns
+        -------
+        ModelVersion
+            new current version
+
+        '''
+        return self.set_current(self.load(path))
+
+    def set_current(self, version):
+        '''Swap a loaded version in as the current version, its directory being watched
+
+        Parameters
+        ----------
+        version : ModelVersion
+            version to serve
+
+        Returns
+        -------
+        ModelVersion
+            new current version
+
+        '''
+        if version.path not in self._signatures:
+            self._signatures[version.path] = self._get_signature(version.path)
+        with self._lock:
+            previous, self.current = self.current, version
+            self._paths['current'] = version.path
+        for function in self.on_swap:
+            function(version)
+        if previous is not None:
+            self.logger.info(f'Version {version.name} replaced version {previous.name}')
+        return version
+
+    def set_candidate(self, path, mode='canary', fraction=.1):
+        '''Load a directory of artifacts as candidate version
+
+        Parameters
+        ----------
+        path : str
+            directory of the artifacts
+        mode : str, optional, default is "canary"
+            either "canary" or "shadow"
+        fraction : float, optional, default is .1
+            fraction of requests answered by the candidate, only used in canary mode
+
+        Returns
+        -------
+        ModelVersion
+            candidate version
+
+        '''
+        assert mode in self.MODES
+        assert 0 <= fraction <= 1
+        version = self.load(path)
+        with self._lock:
+            self.candidate, self.mode, self.fraction = version, mode, fraction
+            self._paths['candidate'] = path
+        self.logger.info(f'Version {version.name} is {mode} candidate')
+        return version
+
+    def remove_candidate(self):
+        '''Stop serving and comparing the candidate version'''
+        with self._lock:
+            self.candidate, self.mode = None, None
+            self._paths['candidate'] = None
+
+    def promote(self):
+        '''Swap the candidate version in as the current version
+
+        Returns
+        -------
+        ModelVersion
+            new current version
+
+        '''
+        with self._lock:
+            if self.candidate is None:
+                raise ValueError('There is no candidate version to promote')
+            previous, self.current = self.current, self.candidate
+            self.candidate, self.mode = None, None
+            self._paths['current'], self._paths['candidate'] = self._paths['candidate'], None
+        for function in self.on_swap:
+            function(self.current)
+        self.logger.info(f'Version {self.current.name} promoted, replacing version {previous.name}')
+        return self.current
+
+    def route(self):
+        '''Get the version answering a request and the version to compute in shadow
+
+        Returns
+        -------
+        ModelVersion, ModelVersion or NoneType
+            version answering the request and shadow version if any
+
+        '''
+        if (self.interval is not None) and (self._pid != os.getpid()):
+            self._start()
+
+        current, candidate, mode = self.current, self.candidate, self.mode
+        version, shadow = current, None
+        if (candidate is not None) and (mode == 'canary') and (random.random() < self.fraction):
+            version = candidate
+        elif (candidate is not None) and (mode == 'shadow'):
+            shadow = candidate
+
+        with self._lock:
+            self._served[version.name] = self._served.get(version.name, 0) + 1
+        return version, shadow
+
+    def compare(self, shadow, compute, probabilities, threshold=.5, max_pending=16):
+        '''Compute the shadow version in background and count disagreements with answered probabilities
+
+        Parameters
+        ----------
+        shadow : ModelVersion
+            version to compute
+        compute : callable
+            function taking a version and returning its probabilities and predictions
+        probabilities : list of float
+            probabilities answered by the current version
+        threshold : float, optional, default is .5
+            threshold telling if both versions predict the same class
+        max_pending : int, optional, default is 16
+            number of comparisons waiting for computation beyond which new ones are dropped,
+            so that shadow traffic never delays answers
+
+        '''
+        with self._lock:
+            if self._pending >= max_pending:
+                self._shadow['dropped'] += 1
+                return
+            self._pending += 1
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='shadow')
+
+        def run():
+            try:
+                candidates, _ = compute(shadow)
+                differences = np.abs(np.asarray(candidates) - np.asarray(probabilities))
+                disagreements = int(np.sum((np.asarray(candidates) > threshold) != (np.asarray(probabilities) > threshold)))
+                with self._lock:
+                    self._shadow['requests'] += 1
+                    self._shadow['disagreements'] += disagreements
+                    self._shadow['max_difference'] = max(self._shadow['max_difference'], float(differences.max(initial=0.)))
+            except Exception as e: # shadow failures never reach clients
+                self.logger.error(f'Shadow version {shadow.name} failed: {e}')
+                with self._lock:
+                    self._shadow['errors'] += 1
+            finally:
+                with self._lock:
+                    self._pending -= 1
+
+        self._executor.submit(run)
+
+    def get_stats(self):
+        '''Get versions served and comparisons of the candidate version
+
+        Returns
+        -------
+        dict
+            current and candidate versions, mode, fraction, number of requests
+            answered per version and shadow comparison counters
+
+        '''
+        with self._lock:
+            return {
+                'current': None if self.current is None else self.current.name,
+                'candidate': None if self.candidate is None else self.candidate.name,
+                'mode': self.mode,
+                'fraction': self.fraction,
+                'served': dict(self._served),
+                'shadow': dict(self._shadow),
+            }
+
+    def _start(self):
+        '''Start the watching thread once per process (threads do not survive a fork)'''
+        with self._lock:
+            if self._pid != os.getpid():
+                self._executor = None
+                self._pending = 0
+                thread = threading.Thread(target=self._watch, name='ModelRegistry', daemon=True)
+                thread.start()
+                self._pid = os.getpid()
+
+    def _watch(self):
+        changes = dict() # signatures seen changed at the previous check
+        while True:
+            time.sleep(self.interval)
+            for role, path in list(self._paths.items()):
+                if path is None:
+                    continue
+                signature = self._get_signature(path)
+                if (signature is None) or (signature == self._signatures.get(path)):
+                    changes.pop(path, None)
+                    continue
+                if changes.get(path) != signature: # wait until artifacts stop changing
+                    changes[path] = signature
+                    continue
+
+                changes.pop(path, None)
+                try:
+                    if role == 'current':
+                        self.deploy(path)
+                    else:
+                        self.set_candidate(path, mode=self.mode, fraction=self.fraction)
+                except Exception as e: # a faulty version never replaces a working one
+                    self._signatures[path] = signature
+                    self.logger.error(f'Artifacts of {path} could not be loaded: {e}')
@@ -0,0 +1,135 @@
+'''Functions used to decode columnar JSON payloads into typed numpy arrays'''
+
+import numpy as np
+import pandas as pd
+
+from carinsurance.interface.exceptions import MissingValueError
+
+
+def decode_column(values, dtype=object):
+    '''Decode a list of JSON values into a typed numpy array and its missing values mask
+    Empty strings and null values are considered as missing values and replaced by NaN
+
+    Parameters
+    ----------
+    values : list or np.ndarray
+        JSON values of a column, or values of a dataframe column,
+        an array is only copied if it has missing values to replace
+    dtype : type, optional, default is object
+        numpy dtype expected for the column
+
+    Returns
+    -------
+    np.ndarray of shape (n_samples,), np.ndarray of shape (n_samples,)
+        pair of typed values and boolean mask of missing values
+
+    Raises
+    ------
+    ValueError
+        arises when values are not a list of scalars
+
+    '''
+    array = np.asarray(values)
+    if array.ndim != 1:
+        raise ValueError('Column values must be a list of scalars')
+
+    kind = array.dtype.kind
+    if kind in 'iub':
+        if np.issubdtype(dtype, np.number):
+            array = array.astype(dtype, copy=False)
+        return array, np.zeros(len(array), dtype=bool)
+
+    if kind == 'f':
+        return array, np.isnan(array)
+
+    if kind == 'U':
+        array = array.astype(object) if dtype is object else np.array(values, dtype=object)
+        missing = array == ''
+    else:
+        missing = pd.isna(array) | (array == '')
+
+    if missing.any():
+        if array is values: # never change the caller data
+            array = array.copy()
+        array[missing] = np.nan
+    return array, missing
+
+
+def normalize(data, schema=None):
+    '''Replace empty strings of a dataframe by NaN values in place and find missing values
+    which are not allowed, with a single vectorized pass per column (see decode_column)
+
+    Parameters
+    ----------
+    data : pd.DataFrame
+        data to normalize, columns with empty strings are replaced by their decoded values
+    schema : dict or NoneType, optional, default is None
+        expected columns, see decode
+
+    Returns
+    -------
+    np.ndarray of shape (n_samples,), list of str
+        pair of boolean mask of rows having a missing value where it is not allowed
+        and names of the columns where such missing values were found
+
+    '''
+    schema = schema or dict()
+    invalid, columns = np.zeros(len(data), dtype=bool), list()
+    for column in data.columns:
+        dtype, nullable = schema.get(column, (object, False))
+        array, missing = decode_column(data[column].to_numpy(), dtype=dtype)
+        if not missing.any():
+            continue
+        if not nullable:
+            invalid |= missing
+            columns.append(column)
+        if array.dtype.kind == 'O':
+            data[column] = array
+    return invalid, columns
+
+
+def decode(data, schema=None):
+    '''Decode a columnar JSON payload into typed numpy arrays in a single pass per column
+
+    Parameters
+    ----------
+    data : dict
+        mapping from column name to list of JSON values,
+        scalar values are repeated along the length of lists
+    schema : dict or NoneType, optional, default is None
+        expected columns where keys are column names and values are pairs of numpy
+        dtype and a boolean telling whether null values are allowed, columns not
+        present in schema are decoded as objects where null values are not allowed
+
+    Returns
+    -------
+    dict
+        mapping from column name to typed numpy array where missing values are NaN
+
+    Raises
+    ------
+    ValueError
+        arises when columns are not lists of scalars with the same length
+        or when no column is a list
+    MissingValueError
+        arises when a missing value is found in a column where it is not allowed
+
+    '''
+    schema = schema or dict()
+    lengths = set(len(values) for values in data.values() if isinstance(values, (list, tuple)))
+    if len(lengths) != 1:
+        raise ValueError('All columns must be lists with the same length')
+    length = lengths.pop()
+
+    columns = dict()
+    for column, values in data.items():
+        if not isinstance(values, (list, tuple)): # scalars are broadcasted as pandas does
+            values = [values] * length
+
+        dtype, nullable = schema.get(column, (object, False))
+        array, missing = decode_column(values, dtype=dtype)
+        if (not nullable) and missing.any():
+            raise MissingValueError(f'NaN value was found in {column}')
+        columns[column] = array
+
+    return columns
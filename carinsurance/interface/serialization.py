@@ -0,0 +1,100 @@
+'''Serialization of API answers holding numpy arrays straight to JSON bytes'''
+
+import json
+import functools
+
+import numpy as np
+
+
+MAX_TABLE_PRECISION = 4 # tables hold 10 ** precision + 1 strings
+_BITS = np.array([b'0', b'1'], dtype=object)
+
+
+@functools.lru_cache(maxsize=None)
+def _get_table(precision):
+    '''Get the JSON text of every multiple of 10 ** -precision from 0 to 1, as written once rounded'''
+    scale = 10 ** precision
+    return np.array([repr(round(i / scale, precision)).encode('ascii') for i in range(scale + 1)], dtype=object)
+
+
+def _dumps(value):
+    return json.dumps(value, separators=(',', ':')).encode('utf-8')
+
+
+def dumps_floats(values, precision=None):
+    '''Get the JSON array of float values
+
+    With a precision up to MAX_TABLE_PRECISION and values between 0 and 1 (such as
+    probabilities), each value is looked up in a table of preformatted texts instead
+    of being formatted, which is about 15 times faster than json.dumps.
+
+    Parameters
+    ----------
+    values : array-like of float
+        values to serialize
+    precision : int or NoneType, optional, default is None
+        number of decimals values are rounded to, if None values are written in full
+
+    Returns
+    -------
+    bytes
+        JSON array, where values are written as repr writes rounded values
+
+    '''
+    values = np.asarray(values, dtype=np.float64).reshape(-1)
+    if precision is None:
+        return _dumps(values.tolist())
+
+    assert precision >= 0
+    if (precision <= MAX_TABLE_PRECISION) and len(values) and (values.min() >= 0) and (values.max() <= 1):
+        positions = np.rint(values * 10 ** precision).astype(np.intp) # NaN never gets here
+        return b'[' + b','.join(_get_table(precision).take(positions).tolist()) + b']'
+    return _dumps(np.round(values, precision).tolist())
+
+
+def dumps_integers(values):
+    '''Get the JSON array of integer values, 0 and 1 being written without formatting
+
+    Parameters
+    ----------
+    values : array-like of int
+        values to serialize
+
+    Returns
+    -------
+    bytes
+        JSON array
+
+    '''
+    values = np.asarray(values).reshape(-1)
+    if len(values) and (values.dtype.kind in 'biu') and (values.min() >= 0) and (values.max() <= 1):
+        return b'[' + b','.join(_BITS.take(values.astype(np.intp)).tolist()) + b']'
+    return _dumps(values.tolist())
+
+
+def dumps_answer(answer, precision=None):
+    '''Get the JSON body of an answer built with application.get_answer_from
+
+    Parameters
+    ----------
+    answer : dict
+        answer whose probabilities and predictions may be lists or numpy arrays
+    precision : int or NoneType, optional, default is None
+        number of decimals of probabilities, if None they are written in full
+
+    Returns
+    -------
+    bytes
+        JSON object with the same keys as answer
+
+    '''
+    parts = list()
+    for key, value in answer.items():
+        if (key == 'probabilities') and (value is not None):
+            text = dumps_floats(value, precision=precision)
+        elif (key == 'predictions') and (value is not None):
+            text = dumps_integers(value)
+        else:
+            text = _dumps(value)
+        parts.append(_dumps(key) + b':' + text)
+    return b'{' + b','.join(parts) + b'}'
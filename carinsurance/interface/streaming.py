@@ -0,0 +1,246 @@
+'''Functions used to score newline-delimited JSON streams chunk by chunk
+
+Each line of a stream is either a record, mapping column names to scalar values,
+or a columnar block, mapping column names to lists of values (scalars being
+repeated along lists). Rows are gathered into chunks of a fixed number of rows,
+each chunk is scored on its own and its answer is written as a line of the
+answer stream, so that memory does not grow with the length of the stream.
+Lines longer than a maximum size are not buffered: they are answered as lines
+which cannot be parsed.
+'''
+
+import json
+
+from carinsurance.interface.serialization import dumps_answer
+
+
+MAX_LINE_SIZE = 1 << 24 # bytes of a stream line, longer lines are answered as errors
+
+
+class ChunkAssembler(object):
+    '''Class which gathers records and blocks of a stream into columnar chunks
+
+    Parameters
+    ----------
+    chunk_size : int, optional, default is 1000
+        maximum number of rows in a chunk
+    max_line_size : int, optional, default is MAX_LINE_SIZE
+        maximum length of a line
+
+    Attributes
+    ----------
+    chunk_size : int
+        maximum number of rows in a chunk
+    max_line_size : int
+        maximum length of a line
+
+    '''
+    def __init__(self, chunk_size=1000, max_line_size=MAX_LINE_SIZE):
+        assert chunk_size >= 1
+        assert max_line_size >= 1
+        self.chunk_size = chunk_size
+        self.max_line_size = max_line_size
+        self._columns = None
+        self._rows = 0
+
+    def _flush(self):
+        if not self._rows:
+            return list()
+        chunk, self._columns, self._rows = self._columns, None, 0
+        return [chunk]
+
+    def _add_record(self, record):
+        chunks = list()
+        if (self._columns is not None) and (self._columns.keys() != record.keys()):
+            chunks += self._flush()
+        if self._columns is None:
+            self._columns = {column: list() for column in record}
+
+        for column, value in record.items():
+            self._columns[column].append(value)
+        self._rows += 1
+
+        if self._rows >= self.chunk_size:
+            chunks += self._flush()
+        return chunks
+
+    def _split_block(self, block):
+        lengths = set(len(values) for values in block.values() if isinstance(values, list))
+        if len(lengths) != 1:
+            raise ValueError('All columns of a block must be lists with the same length')
+        length = lengths.pop()
+
+        chunks = list()
+        for start in range(0, length, self.chunk_size):
+            end = start + self.chunk_size
+            chunks.append({c: v[start:end] if isinstance(v, list) else v for c, v in block.items()})
+        return chunks
+
+    def feed(self, line):
+        '''Add a line of the stream, getting back the chunks which are complete
+
+        Parameters
+        ----------
+        line : str or bytes
+            JSON record or columnar block, blank lines are ignored
+
+        Returns
+        -------
+        list of dict
+            complete chunks, as columnar mappings from column name to list of values
+
+        Raises
+        ------
+        ValueError
+            arises when the line is longer than max_line_size, is not a JSON object
+            or when lists of a block have different lengths
+
+        '''
+        if len(line) > self.max_line_size:
+            raise ValueError(f'Lines must not be longer than {self.max_line_size}')
+        if not line.strip():
+            return list()
+
+        data = json.loads(line)
+        if not isinstance(data, dict):
+            raise ValueError('Lines must be JSON objects')
+
+        if any(isinstance(values, list) for values in data.values()):
+            return self._flush() + self._split_block(data)
+        return self._add_record(data)
+
+    def flush(self):
+        '''Get the last chunk, made of the remaining records of the stream
+
+        Returns
+        -------
+        list of dict
+            remaining chunk if any
+
+        '''
+        return self._flush()
+
+
+def iter_lines(stream, max_line_size=MAX_LINE_SIZE):
+    '''Read lines of a binary stream without buffering more than max_line_size bytes
+
+    Lines longer than max_line_size are cut after max_line_size + 1 bytes, so that
+    ChunkAssembler.feed rejects them, the rest of the line being read and dropped
+
+    Parameters
+    ----------
+    stream : file-like object
+        binary stream with a readline method taking a size
+    max_line_size : int, optional, default is MAX_LINE_SIZE
+        maximum length of a line
+
+    Returns
+    -------
+    generator of bytes
+        lines of the stream, without their newline
+
+    '''
+    while True:
+        line = stream.readline(max_line_size + 1)
+        if not line:
+            return
+        part = line
+        while (len(part) > max_line_size) and not part.endswith(b'\n'): # drops the rest of a longer line
+            part = stream.readline(max_line_size + 1)
+        yield line[:-1] if line.endswith(b'\n') else line
+
+
+def cut_lines(rest, data, max_line_size=MAX_LINE_SIZE):
+    '''Split buffered bytes of a stream into complete lines and the start of the next line
+
+    The start of the next line is cut after max_line_size + 1 bytes, so that
+    ChunkAssembler.feed rejects it once complete and the buffer stays bounded
+
+    Parameters
+    ----------
+    rest : bytes
+        start of the current line, returned by the previous call
+    data : bytes
+        bytes received since the previous call
+    max_line_size : int, optional, default is MAX_LINE_SIZE
+        maximum length of a line
+
+    Returns
+    -------
+    tuple of (list of bytes, bytes)
+        complete lines, without their newline, and start of the next line
+
+    '''
+    *lines, rest = (rest + data).split(b'\n')
+    return lines, rest[:max_line_size + 1]
+
+
+def score_lines(assembler, lines, handle, fail, final=False, logger=None, dumps=dumps_answer):
+    '''Feed lines of a stream to an assembler and score the chunks which are complete
+
+    Parameters
+    ----------
+    assembler : ChunkAssembler
+        assembler gathering rows of the stream
+    lines : iterable of str or bytes
+        next lines of the NDJSON stream
+    handle : callable
+        function taking a columnar payload and returning its json answer,
+        see application.get_handler_from
+    fail : callable
+        function taking an error message and returning the json answer of a
+        line which cannot be parsed, see application.get_failure_from
+    final : bool, optional, default is False
+        if True, the stream is over and remaining rows are scored as well
+    logger : logging.Logger or NoneType, optional, default is None
+        logger used to log lines which cannot be parsed
+    dumps : callable, optional, default is serialization.dumps_answer
+        function writing an answer to JSON bytes, see application.get_serializer_from
+
+    Returns
+    -------
+    list of bytes
+        JSON answers of complete chunks, each followed by a newline
+
+    '''
+    answers = list()
+    for line in lines:
+        try:
+            chunks = assembler.feed(line)
+        except ValueError as e:
+            if logger is not None:
+                logger.exception(str(e))
+            answers.append(fail("Data couldn't be parsed"))
+            continue
+        answers += [handle(chunk) for chunk in chunks]
+
+    if final:
+        answers += [handle(chunk) for chunk in assembler.flush()]
+    return [dumps(answer) + b'\n' for answer in answers]
+
+
+def iter_answers(lines, handle, fail, chunk_size=1000, logger=None, dumps=dumps_answer,
+                 max_line_size=MAX_LINE_SIZE):
+    '''Score lines of a stream chunk by chunk, yielding one JSON answer line per chunk
+
+    Parameters
+    ----------
+    lines : iterable of str or bytes
+        lines of the NDJSON stream
+    handle, fail, logger, dumps
+        see score_lines
+    chunk_size : int, optional, default is 1000
+        maximum number of rows scored at once
+    max_line_size : int, optional, default is MAX_LINE_SIZE
+        maximum length of a line, longer lines are answered as errors
+
+    Returns
+    -------
+    generator of bytes
+        JSON answers, each followed by a newline
+
+    '''
+    assembler = ChunkAssembler(chunk_size=chunk_size, max_line_size=max_line_size)
+    for line in lines:
+        yield from score_lines(assembler, [line], handle, fail, logger=logger, dumps=dumps)
+    yield from score_lines(assembler, [], handle, fail, final=True, logger=logger, dumps=dumps)
@@ -8,6 +8,8 @@ import form.frontend as frontend
 
 gcp_project = os.environ.get('FORM_GCP_PROJECT')
 url = 'http://0.0.0.0:8080' if gcp_project is None else f'https://{gcp_project}.ew.r.appspot.com'
+window = os.environ.get('FORM_API_WINDOW') # seconds during which form submissions are merged into one API call
+window = float(window) if window else None
 
 app = dash.Dash(__name__,
     external_stylesheets=[dbc.themes.BOOTSTRAP],
@@ -18,7 +20,7 @@ app = dash.Dash(__name__,
 )
 server = app.server
 app.layout = frontend._get_layout()
-callbacks = frontend._get_callbacks_from(app, url=url)
+callbacks = frontend._get_callbacks_from(app, url=url, window=window)
 
 
 if __name__ == '__main__':
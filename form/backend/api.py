@@ -1,21 +1,134 @@
 import json
+import threading
+from concurrent.futures import Future
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 from flask import jsonify
 
 
+def _get_retry(retries, backoff_factor):
+    # inference has no side effect, so POST requests can be retried safely
+    kwargs = dict(total=retries, backoff_factor=backoff_factor, status_forcelist=(500, 502, 503, 504),
+                  raise_on_status=False)
+    try:
+        return Retry(allowed_methods=frozenset(['POST']), **kwargs)
+    except TypeError: # urllib3 < 1.26
+        return Retry(method_whitelist=frozenset(['POST']), **kwargs)
+
+
+def _get_length(inputs):
+    return max((len(values) for values in inputs.values() if isinstance(values, (list, tuple))), default=1)
+
+
 class API(object):
+    '''Client of the model API keeping connections alive in a pooled session
+
+    With a batching window, submissions arriving within window seconds (up to
+    max_batch_size of them) are merged into a single columnar call and every caller
+    gets back the slice of the answer for its own rows. When the merged call fails
+    (a single invalid form makes the whole call fail), each submission is sent alone
+    so that only invalid forms get an error.
+    '''
     HEADERS = {'content-type': 'application/json', 'Accept-Charset': 'UTF-8'}
 
-    def __init__(self, url='http://0.0.0.0:8080', route='api'):
+    def __init__(self, url='http://0.0.0.0:8080', route='api', timeout=(3.05, 10.), retries=3,
+                 backoff_factor=.1, pool_size=10, window=None, max_batch_size=32):
         self.url = url
         self.route = route
+        self.timeout = timeout # (connect, read) seconds
+        self.window = window
+        self.max_batch_size = max_batch_size
+
+        self.session = requests.Session()
+        self.session.headers.update(self.HEADERS)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              max_retries=_get_retry(retries, backoff_factor))
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._pending = list()
+        self._lock = threading.Lock()
+        self._timer = None
 
     @property
     def api_route(self):
         return f'{self.url}/{self.route}/'
 
-    def post(self, inputs):
+    def _post(self, inputs):
         values = json.dumps(inputs)
-        results = requests.post(self.api_route, data=values, headers=self.HEADERS)
+        results = self.session.post(self.api_route, data=values, timeout=self.timeout)
         return json.loads(results.text)
+
+    def post(self, inputs):
+        if self.window is None:
+            return self._post(inputs)
+        return self.submit(inputs).result()
+
+    def post_many(self, submissions):
+        '''Get the answers of several columnar submissions through a single call'''
+        if len(submissions) == 1:
+            return [self._post(submissions[0])]
+
+        lengths = [_get_length(inputs) for inputs in submissions]
+        columns = list(dict.fromkeys(column for inputs in submissions for column in inputs))
+        merged = dict()
+        for column in columns:
+            merged[column] = list()
+            for inputs, length in zip(submissions, lengths):
+                values = inputs.get(column, [''] * length)
+                merged[column] += list(values) if isinstance(values, (list, tuple)) else [values] * length
+
+        answer = self._post(merged)
+        if answer['status'] != 0:
+            return [self._post(inputs) for inputs in submissions]
+
+        answers, start = list(), 0
+        for length in lengths:
+            answers.append({
+                key: value[start:start + length] if key in ('identifiers', 'predictions', 'probabilities') else value
+                for key, value in answer.items()
+            })
+            start += length
+        return answers
+
+    def submit(self, inputs):
+        '''Get a future of the answer, sent along with submissions of the same batching window'''
+        future, batch = Future(), None
+        with self._lock:
+            self._pending.append((inputs, future))
+            if len(self._pending) >= self.max_batch_size:
+                batch = self._take()
+            elif self._timer is None:
+                self._timer = threading.Timer(self.window or 0., self._flush)
+                self._timer.daemon = True
+                self._timer.start()
+        if batch is not None:
+            self._send(batch)
+        return future
+
+    def _take(self):
+        batch, self._pending = self._pending, list()
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return batch
+
+    def _flush(self):
+        with self._lock:
+            batch = self._take()
+        if batch:
+            self._send(batch)
+
+    def _send(self, batch):
+        submissions, futures = zip(*batch)
+        try:
+            answers = self.post_many(list(submissions))
+        except Exception as e: # every caller gets the connection error
+            for future in futures:
+                future.set_exception(e)
+            return
+        for future, answer in zip(futures, answers):
+            future.set_result(answer)
@@ -9,7 +9,7 @@ import form.frontend.pages.form as form
 import form.frontend.pages.introduction as introduction
 
 
-def _get_callbacks_from(app, url='http://0.0.0.0:8080'):
+def _get_callbacks_from(app, url='http://0.0.0.0:8080', window=None):
 
     @app.callback(Output('page-content', 'children'), [Input('url', 'pathname')])
     def render_page_content(pathname):
@@ -38,7 +38,7 @@ def _get_callbacks_from(app, url='http://0.0.0.0:8080'):
         return [pathname == 'introduction-link', pathname == 'form-link']
 
     sidebar_callbacks = sidebar._get_callbacks_from(app)
-    form_callbacks = form._get_callbacks_from(app, url=url)
+    form_callbacks = form._get_callbacks_from(app, url=url, window=window)
     callbacks = (render_page_content, toggle_active_links) + sidebar_callbacks + form_callbacks
 
     return callbacks
@@ -31,8 +31,8 @@ MAPPING = dict(
 )
 
 
-def _get_callbacks_from(app, url='http://0.0.0.0:8080'):
-    api = API(url=url)
+def _get_callbacks_from(app, url='http://0.0.0.0:8080', window=None):
+    api = API(url=url, window=window) # shared by callbacks so that connections are kept alive
 
     outputs = Output('results', 'children')
     inputs = [Input('post', 'n_clicks')]
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from carinsurance.domain.preprocessing.pipeline import get_pipeline
+from carinsurance.domain.preprocessing.transformers import TargetSplitter
+from carinsurance.infrastructure.synthetic import get_synthetic_dataset
+
+
+TRAIN_ROWS = 1000
+
+
+@pytest.fixture(scope='session')
+def train():
+    splitter = TargetSplitter(column='CarInsurance', copy=False)
+    data, target = splitter.transform(get_synthetic_dataset(TRAIN_ROWS, random_state=0))
+    return data, np.asarray(target).reshape(-1)
+
+
+@pytest.fixture(scope='session')
+def pipeline(train):
+    pipeline = get_pipeline()
+    pipeline.fit_transform(train[0])
+    return pipeline
+
+
+@pytest.fixture(scope='session')
+def values(train, pipeline):
+    return pipeline.transform(train[0]).to_numpy()
+
+
+@pytest.fixture
+def dataset():
+    return get_synthetic_dataset(50, random_state=1, target=False)
@@ -0,0 +1,48 @@
+import json
+import asyncio
+import logging
+
+from sklearn.ensemble import RandomForestClassifier
+
+from carinsurance.interface.access import AccessLogger
+from carinsurance.interface.application import get_app_from
+from carinsurance.interface.asgi import get_asgi_app_from
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.records = list()
+
+    def emit(self, record):
+        self.records.append(json.loads(record.getMessage()))
+
+
+def get_access():
+    handler = ListHandler()
+    logger = logging.getLogger('tests.access')
+    logger.handlers, logger.propagate = [handler], False
+    logger.setLevel(logging.INFO)
+    return AccessLogger(logger=logger), handler
+
+
+def test_unparsed_calls_are_logged(pipeline, train, values):
+    model = RandomForestClassifier(n_estimators=5, max_depth=4, random_state=0).fit(values, train[1])
+    body = b'{"Id": [1'
+
+    access, handler = get_access()
+    app = get_app_from(__name__, pipeline, model, access=access)
+    response = app.test_client().post('/api/', data=body, content_type='application/json')
+    assert response.get_json()['status'] == 1
+
+    async def receive():
+        return {'type': 'http.request', 'body': body, 'more_body': False}
+
+    async def send(message):
+        pass
+
+    app = get_asgi_app_from(pipeline, model, access=access)
+    asyncio.run(app({'type': 'http', 'path': '/api/', 'method': 'POST'}, receive, send))
+
+    assert access.get_stats()['logged'] == 2
+    assert [(record['status'], record['rows']) for record in handler.records] == [(1, 0), (1, 0)]
@@ -0,0 +1,25 @@
+import pickle
+
+import numpy as np
+
+from carinsurance.infrastructure.artifacts import save_artifact, load_object, get_artifact_path
+
+
+def test_artifact_is_preferred_to_former_pickle(tmp_path):
+    assert get_artifact_path(str(tmp_path), 'model') == str(tmp_path / 'model.artifact')
+
+    with open(tmp_path / 'model.pkl', 'wb') as f:
+        pickle.dump({'values': np.arange(3)}, f)
+    assert get_artifact_path(str(tmp_path), 'model') == str(tmp_path / 'model.pkl')
+
+    save_artifact({'values': np.arange(4)}, str(tmp_path / 'model.artifact'))
+    assert get_artifact_path(str(tmp_path), 'model') == str(tmp_path / 'model.artifact')
+
+
+def test_objects_are_loaded_from_artifacts_and_pickles(tmp_path):
+    with open(tmp_path / 'model.pkl', 'wb') as f:
+        pickle.dump({'values': np.arange(3)}, f)
+    save_artifact({'values': np.arange(4)}, str(tmp_path / 'model.artifact'))
+
+    np.testing.assert_array_equal(load_object(str(tmp_path / 'model.pkl'))['values'], np.arange(3))
+    np.testing.assert_array_equal(load_object(str(tmp_path / 'model.artifact'))['values'], np.arange(4))
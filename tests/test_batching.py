@@ -0,0 +1,35 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from carinsurance.interface.batching import MicroBatcher
+
+
+def predict(columns):
+    ages = columns['Age']
+    if (ages < 0).any():
+        raise ValueError('Negative age')
+    return ages / 100, (ages > 50).astype(np.int64)
+
+
+def test_calls_get_their_own_rows():
+    batcher = MicroBatcher(predict, window=.05, max_batch_size=100)
+    calls = [{'Age': np.array([age, age + 1])} for age in range(0, 80, 10)]
+    with ThreadPoolExecutor(len(calls)) as executor:
+        results = list(executor.map(batcher.submit, calls))
+    for columns, (probabilities, predictions) in zip(calls, results):
+        np.testing.assert_array_equal(probabilities, columns['Age'] / 100)
+        np.testing.assert_array_equal(predictions, (columns['Age'] > 50).astype(np.int64))
+
+
+def test_faulty_call_is_isolated():
+    batcher = MicroBatcher(predict, window=.05, max_batch_size=100)
+    calls = [{'Age': np.array([20])}, {'Age': np.array([-1])}, {'Age': np.array([60])}]
+    with ThreadPoolExecutor(len(calls)) as executor:
+        futures = [executor.submit(batcher.submit, columns) for columns in calls]
+
+    np.testing.assert_array_equal(futures[0].result()[0], [.2])
+    np.testing.assert_array_equal(futures[2].result()[1], [1])
+    with pytest.raises(ValueError):
+        futures[1].result()
@@ -0,0 +1,49 @@
+import numpy as np
+
+from carinsurance.interface.cache import PredictionCache
+
+
+class Model(object):
+    '''Predict function counting the rows it computes'''
+    def __init__(self):
+        self.rows = 0
+
+    def __call__(self, columns):
+        self.rows += len(columns['Age'])
+        return columns['Age'] / 100, (columns['Age'] > 50).astype(np.int64)
+
+
+def test_partial_hit_computes_missing_rows_only():
+    cache, model = PredictionCache(version='a'), Model()
+    cache.get_or_compute({'Age': np.array([10, 20])}, model)
+    probabilities, predictions = cache.get_or_compute({'Age': np.array([20, 60, 10])}, model)
+
+    assert model.rows == 3
+    np.testing.assert_array_equal(probabilities, [.2, .6, .1])
+    np.testing.assert_array_equal(predictions, [0, 1, 0])
+    assert cache.get_stats()['hits'] == 2
+
+
+def test_rows_are_canonicalized():
+    cache, model = PredictionCache(), Model()
+    cache.get_or_compute({'Age': np.array([10.]), 'Job': np.array([np.nan], dtype=object)}, model)
+    cache.get_or_compute({'Job': np.array([None], dtype=object), 'Age': np.array([10.])}, model)
+    assert model.rows == 1
+
+
+def test_version_change_resets_cache():
+    cache, model = PredictionCache(version='a'), Model()
+    cache.get_or_compute({'Age': np.array([10, 20])}, model)
+    cache.set_version('b')
+    assert len(cache) == 0
+
+    cache.get_or_compute({'Age': np.array([10, 20])}, model)
+    assert model.rows == 4
+
+
+def test_least_recently_used_rows_are_evicted():
+    cache, model = PredictionCache(max_size=2), Model()
+    for age in (10, 20, 10, 30):
+        cache.get_or_compute({'Age': np.array([age])}, model)
+    cache.get_or_compute({'Age': np.array([10])}, model)
+    assert (len(cache), model.rows) == (2, 3)
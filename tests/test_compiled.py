@@ -0,0 +1,32 @@
+import numpy as np
+import pandas as pd
+
+from carinsurance.domain.preprocessing.compiled import CompiledPipeline
+from carinsurance.domain.preprocessing.pipeline import get_schema
+from carinsurance.infrastructure.synthetic import get_payload
+from carinsurance.interface.schema import decode
+
+
+def test_dataframe_matches_pipeline(pipeline, dataset):
+    expected = pipeline.transform(dataset)
+    compiled = CompiledPipeline(pipeline)
+    np.testing.assert_array_equal(compiled.transform(dataset), expected.to_numpy())
+    assert list(compiled.get_index(dataset)) == list(expected.index)
+
+
+def test_decoded_payload_matches_pipeline(pipeline, dataset):
+    expected = pipeline.transform(dataset).to_numpy()
+    columns = decode(get_payload(dataset), get_schema())
+    np.testing.assert_array_equal(CompiledPipeline(pipeline).transform(columns), expected)
+
+
+def test_unseen_modality_matches_pipeline(pipeline, dataset):
+    dataset.loc[dataset.index[:3], 'Job'] = 'astronaut'
+    dataset.loc[dataset.index[3], 'LastContactMonth'] = 'never'
+    expected = pipeline.transform(dataset).to_numpy()
+    np.testing.assert_array_equal(CompiledPipeline(pipeline).transform(dataset), expected)
+
+
+def test_single_row_matches_pipeline(pipeline, dataset):
+    row = dataset.iloc[[0]]
+    np.testing.assert_array_equal(CompiledPipeline(pipeline).transform(row), pipeline.transform(row).to_numpy())
@@ -0,0 +1,52 @@
+import os
+
+import numpy as np
+from sklearn.ensemble import RandomForestClassifier
+
+from carinsurance.domain.preprocessing.compiled import CompiledPipeline
+from carinsurance.helpers.metrics import Metrics
+from carinsurance.infrastructure.artifacts import save_artifact, load_artifact
+from carinsurance.infrastructure.synthetic import get_payload
+from carinsurance.interface.application import get_handler_from
+from carinsurance.interface.registry import ModelRegistry
+
+
+def load(path):
+    return CompiledPipeline(load_artifact(os.path.join(path, 'pipeline.artifact'))), \
+        load_artifact(os.path.join(path, 'model.artifact'))
+
+
+def save_version(path, pipeline, train, values, random_state):
+    os.makedirs(path)
+    model = RandomForestClassifier(n_estimators=5, max_depth=4, random_state=random_state).fit(values, train[1])
+    save_artifact(model, os.path.join(path, 'model.artifact'))
+    save_artifact(pipeline, os.path.join(path, 'pipeline.artifact'))
+
+
+def test_metrics_keep_recording_after_swap(tmp_path, pipeline, train, values, dataset):
+    first, second = str(tmp_path / 'first'), str(tmp_path / 'second')
+    save_version(first, pipeline, train, values, 0)
+    save_version(second, pipeline, train, values, 1)
+
+    metrics = Metrics()
+    registry = ModelRegistry(load, lambda path: os.path.basename(path))
+    registry.deploy(first)
+    handle = get_handler_from(registry.current.pipeline, registry.current.model, metrics=metrics, registry=registry)
+    payload = get_payload(dataset)
+
+    def get_calls():
+        summary = metrics.get_summary()
+        return {name: summary[name]['seconds']['count'] for name in summary if name.startswith('pipeline.')}
+
+    assert handle(payload)['status'] == 0
+    before = get_calls()
+    assert before and all(count == 1 for count in before.values())
+
+    registry.deploy(second)
+    assert registry.current.name == 'second'
+    answer = handle(payload)
+    assert answer['status'] == 0
+    assert get_calls() == {name: 2 for name in before}
+    assert metrics.get_summary()['inference.threshold']['seconds']['count'] == 2
+    np.testing.assert_allclose(answer['probabilities'], registry.current.model.predict_proba(
+        registry.current.pipeline.transform(dataset))[:, 1])
@@ -0,0 +1,50 @@
+import pickle
+import logging
+
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import RandomForestClassifier
+
+from carinsurance.application.score.score_dataset import score_dataset
+from carinsurance.infrastructure.artifacts import save_artifact
+from carinsurance.infrastructure.synthetic import get_synthetic_dataset
+
+
+def test_parquet_file_is_scored_row_by_row_on_failure(tmp_path, pipeline, train, values):
+    (tmp_path / 'models').mkdir()
+    model = RandomForestClassifier(n_estimators=5, max_depth=4, random_state=0).fit(values, train[1])
+    save_artifact(model, str(tmp_path / 'models' / 'model.artifact'))
+    save_artifact(pipeline, str(tmp_path / 'models' / 'pipeline.artifact'))
+
+    dataset = get_synthetic_dataset(50, random_state=2, target=False)
+    dataset.loc[7, 'CallStart'] = 'not a time'
+    dataset.to_parquet(tmp_path / 'input.parquet', index=False)
+
+    config = {'project': str(tmp_path), 'models': 'models'}
+    score_dataset(config, logging.getLogger(), str(tmp_path / 'input.parquet'), str(tmp_path / 'output.parquet'),
+                  chunk_size=20, workers=1, threshold=.5)
+
+    scores = pd.read_parquet(tmp_path / 'output.parquet')
+    assert list(scores['Id']) == list(dataset['Id'])
+    assert scores['probability'].isna().tolist() == [position == 7 for position in range(50)]
+    valid = dataset.drop(index=7)
+    expected = model.predict_proba(pipeline.transform(valid).to_numpy())[:, 1]
+    np.testing.assert_allclose(scores['probability'].dropna().to_numpy(), expected)
+    assert scores['prediction'].isna().sum() == 1
+
+
+def test_pickles_of_former_versions_are_scored(tmp_path, pipeline, train, values):
+    (tmp_path / 'models').mkdir()
+    model = RandomForestClassifier(n_estimators=5, max_depth=4, random_state=0).fit(values, train[1])
+    for name, obj in (('model', model), ('pipeline', pipeline)):
+        with open(tmp_path / 'models' / f'{name}.pkl', 'wb') as f:
+            pickle.dump(obj, f)
+
+    dataset = get_synthetic_dataset(30, random_state=3, target=False)
+    dataset.to_csv(tmp_path / 'input.csv', index=False)
+    config = {'project': str(tmp_path), 'models': 'models'}
+    score_dataset(config, logging.getLogger(), str(tmp_path / 'input.csv'), str(tmp_path / 'output.csv'), workers=1)
+
+    scores = pd.read_csv(tmp_path / 'output.csv')
+    expected = model.predict_proba(pipeline.transform(dataset).to_numpy())[:, 1]
+    np.testing.assert_allclose(scores['probability'].to_numpy(), expected)
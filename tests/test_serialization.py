@@ -0,0 +1,43 @@
+import json
+
+import numpy as np
+import pytest
+
+from carinsurance.interface.application import get_answer_from
+from carinsurance.interface.serialization import dumps_floats, dumps_integers, dumps_answer
+
+
+VALUES = np.random.default_rng(0).random(1000)
+
+
+def test_floats_match_json():
+    assert json.loads(dumps_floats(VALUES)) == VALUES.tolist()
+    assert dumps_floats([]) == b'[]'
+
+
+@pytest.mark.parametrize('precision', [0, 2, 4, 6])
+def test_rounded_floats_match_json(precision):
+    values = np.concatenate([VALUES, [0., 1., .5, .125, .99995]])
+    assert dumps_floats(values, precision=precision) == json.dumps(np.round(values, precision).tolist(),
+                                                                   separators=(',', ':')).encode()
+
+
+def test_floats_outside_table_match_json():
+    values = np.array([-.5, 1.5, 1e-20])
+    assert json.loads(dumps_floats(values, precision=3)) == np.round(values, 3).tolist()
+
+
+def test_integers_match_json():
+    for values in (np.array([0, 1, 1, 0]), np.array([3, -2]), np.array([], dtype=np.int64)):
+        assert json.loads(dumps_integers(values)) == values.tolist()
+
+
+def test_answer_matches_json():
+    probabilities = VALUES[:10]
+    predictions = (probabilities > .5).astype(np.int64)
+    answer = get_answer_from(list(range(10)), probabilities, predictions=predictions, message='Good answer')
+    expected = dict(answer, probabilities=probabilities.tolist(), predictions=predictions.tolist())
+    assert json.loads(dumps_answer(answer)) == expected
+
+    error = get_answer_from(identifiers=None, probabilities=None, message='No identifiers were found')
+    assert json.loads(dumps_answer(error)) == error
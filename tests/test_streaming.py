@@ -0,0 +1,68 @@
+import io
+import json
+import asyncio
+
+from sklearn.ensemble import RandomForestClassifier
+
+from carinsurance.infrastructure.synthetic import get_payload
+from carinsurance.interface.application import get_app_from
+from carinsurance.interface.asgi import get_asgi_app_from
+from carinsurance.interface.streaming import ChunkAssembler, cut_lines, iter_lines
+
+
+MAX_LINE_SIZE = 1000
+
+
+def get_stream(dataset):
+    payload = get_payload(dataset)
+    records = [{column: values[row] for column, values in payload.items()} for row in range(2)]
+    too_long = dict(records[0], Id='x' * MAX_LINE_SIZE)
+    return b'\n'.join(json.dumps(record).encode('utf-8') for record in [records[0], too_long, records[1]])
+
+
+def test_longer_lines_are_cut():
+    lines = list(iter_lines(io.BytesIO(b'a' * 10 + b'\n' + b'b' * 25 + b'\nc'), max_line_size=10))
+    assert lines == [b'a' * 10, b'b' * 11, b'c']
+
+    rest = b''
+    for _ in range(5):
+        lines, rest = cut_lines(rest, b'b' * 25, max_line_size=10)
+        assert (lines == []) and (len(rest) == 11)
+    lines, rest = cut_lines(rest, b'\nc', max_line_size=10)
+    assert (lines == [b'b' * 11]) and (rest == b'c')
+
+    assembler = ChunkAssembler(max_line_size=10)
+    try:
+        assembler.feed(b'b' * 11)
+        raise AssertionError('A line longer than max_line_size was fed')
+    except ValueError:
+        pass
+
+
+def test_stream_answers_longer_lines_as_errors(pipeline, train, values, dataset):
+    model = RandomForestClassifier(n_estimators=5, max_depth=4, random_state=0).fit(values, train[1])
+    stream = get_stream(dataset)
+
+    app = get_app_from(__name__, pipeline, model, chunk_size=1, max_line_size=MAX_LINE_SIZE)
+    response = app.test_client().post('/api/stream/', data=stream)
+    flask_answers = [json.loads(line) for line in response.data.splitlines()]
+
+    messages = list()
+    async def receive():
+        if not messages:
+            messages.extend({'type': 'http.request', 'body': stream[start:start + 100], 'more_body': True}
+                            for start in range(0, len(stream), 100))
+            messages.append({'type': 'http.request', 'body': b'', 'more_body': False})
+        return messages.pop(0)
+
+    body = list()
+    async def send(message):
+        body.append(message.get('body', b''))
+
+    app = get_asgi_app_from(pipeline, model, chunk_size=1, max_line_size=MAX_LINE_SIZE)
+    asyncio.run(app({'type': 'http', 'path': '/api/stream/', 'method': 'POST'}, receive, send))
+    asgi_answers = [json.loads(line) for line in b''.join(body).splitlines()]
+
+    for answers in (flask_answers, asgi_answers):
+        assert [answer['status'] for answer in answers] == [0, 1, 0]
+        assert answers[1]['identifiers'] is None
@@ -0,0 +1,38 @@
+import pickle
+
+import numpy as np
+import pandas as pd
+
+from carinsurance.domain.preprocessing.compiled import CompiledPipeline
+from carinsurance.domain.preprocessing.pipeline import get_pipeline
+from carinsurance.helpers.preprocessing import set_inplace
+
+
+ADDED = ('copy', 'format', 'representation', 'formats', 'lookups') # attributes pickles may lack
+
+
+def test_pipelines_pickled_without_new_attributes_still_transform(pipeline, dataset):
+    former = pickle.loads(pickle.dumps(pipeline))
+    for _, step in former.steps:
+        if type(step).__name__ != 'DurationTransformer': # representation existed before
+            for name in ADDED:
+                step.__dict__.pop(name, None)
+
+    loaded = pickle.loads(pickle.dumps(former))
+    expected = pipeline.transform(dataset).to_numpy()
+    np.testing.assert_array_equal(loaded.transform(dataset).to_numpy(), expected)
+    np.testing.assert_array_equal(CompiledPipeline(loaded).transform(dataset), expected)
+
+
+def test_inplace_mode_reaches_the_wrapped_scaler(train, pipeline, dataset):
+    inplace = get_pipeline(inplace=True)
+    inplace.fit_transform(train[0])
+    scaler = inplace.named_steps['StandardScaler']
+    assert (scaler.get_params()['copy'] is False) and (scaler.scaler.copy is False)
+
+    expected, original = pipeline.transform(dataset).to_numpy(), dataset.copy()
+    np.testing.assert_allclose(inplace.transform(dataset).to_numpy(), expected)
+    pd.testing.assert_frame_equal(dataset, original)
+
+    set_inplace(inplace, inplace=False)
+    assert scaler.scaler.copy is True
@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+from sklearn.tree import DecisionTreeClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.ensemble import RandomForestClassifier, GradientBoostingClassifier
+
+from carinsurance.domain.modelling.trees import TreeEnsemble
+
+
+generator = np.random.default_rng(0)
+VALUES = generator.random((1000, 10))
+TARGET = ((VALUES[:, 0] + VALUES[:, 1] * VALUES[:, 2] + generator.normal(0, .2, 1000)) > .8).astype(int)
+
+
+@pytest.mark.parametrize('estimator', [
+    DecisionTreeClassifier(max_depth=8, random_state=0),
+    RandomForestClassifier(n_estimators=20, max_depth=8, random_state=0),
+    GradientBoostingClassifier(n_estimators=20, max_depth=3, random_state=0),
+])
+def test_probabilities_match_estimator(estimator):
+    estimator.fit(VALUES, TARGET)
+    native = TreeEnsemble.from_estimator(estimator)
+    for data in (VALUES, VALUES[:1]):
+        np.testing.assert_allclose(native.predict_proba(data), estimator.predict_proba(data), rtol=1e-7, atol=1e-10)
+        np.testing.assert_array_equal(native.predict(data), estimator.predict(data))
+
+
+def test_other_models_are_refused():
+    with pytest.raises(ValueError):
+        TreeEnsemble.from_estimator(LogisticRegression().fit(VALUES, TARGET))